@@ -7,9 +7,12 @@ The main file where MIND is started from
 
 from sys import argv
 
-from backend.db import setup_db, setup_db_location
+from backend.db import (close_pools, finish_db_import, setup_db,
+                        setup_db_location)
 from backend.helpers import check_python_version
 from backend.logging import LOGGER, setup_logging
+from backend.maintenance import MaintenanceHandler
+from backend.outbox import DeliveryHandler
 from backend.reminders import ReminderHandler
 from backend.server import SERVER, handle_flags
 from backend.settings import get_setting
@@ -39,7 +42,9 @@ def MIND() -> None:
 	setup_db_location()
 
 	SERVER.create_app()
+	delivery_handler = DeliveryHandler(SERVER.app.app_context)
 	reminder_handler = ReminderHandler(SERVER.app.app_context)
+	maintenance_handler = MaintenanceHandler(SERVER.app.app_context)
 	with SERVER.app.app_context():
 		setup_db()
 
@@ -48,15 +53,23 @@ def MIND() -> None:
 		url_prefix = get_setting("url_prefix")
 		SERVER.set_url_prefix(url_prefix)
 
-		reminder_handler.find_next_reminder()
+		delivery_handler.start_handling()
+		reminder_handler.start_handling()
+		maintenance_handler.start_handling()
 
 	# =================
 	SERVER.run(host, port)
 	# =================
 
+	maintenance_handler.stop_handling()
 	reminder_handler.stop_handling()
+	delivery_handler.stop_handling()
+	close_pools()
 
 	if SERVER.do_restart:
+		if not finish_db_import():
+			# Restart with the current database instead
+			SERVER.restart_args = []
 		SERVER.handle_restart(flag)
 
 	return
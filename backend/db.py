@@ -4,44 +4,231 @@
 Setting up and interacting with the database.
 """
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
 from datetime import datetime
+from functools import lru_cache
+from json import JSONDecodeError, dumps, loads
 from os import makedirs, remove
-from os.path import dirname, isfile, join
+from os.path import dirname, getsize, isfile, join
+from pathlib import Path
+from re import compile
 from shutil import move
-from sqlite3 import Connection, OperationalError, ProgrammingError, Row
-from threading import current_thread, main_thread
-from time import time
-from typing import Type, Union
+from sqlite3 import (Connection, Cursor, DatabaseError, OperationalError,
+                     ProgrammingError, Row, complete_statement)
+from sys import _getframe
+from threading import Condition, Lock, Thread, current_thread
+from time import monotonic, perf_counter, time
+from types import FrameType
+from typing import Any, Callable, Dict, List, Tuple, Type, Union
 
-from flask import g
+from flask import g, has_request_context, request
 
 from backend.custom_exceptions import (AccessUnauthorized, InvalidDatabaseFile,
-                                       UserNotFound)
-from backend.helpers import RestartVars, folder_path
+                                       InvalidKeyValue, UserNotFound)
+from backend.helpers import (DatabaseProfile, RestartVars, SortingMethod,
+                             TimelessSortingMethod, folder_path)
 from backend.logging import LOGGER, set_log_level
+from backend.metrics import (DB_POOL_CONNECTIONS, DB_POOL_TIMEOUTS,
+                             DB_POOL_WAIT, QUERY_STATS)
 
 DB_FILENAME = 'db', 'MIND.db'
-__DATABASE_VERSION__ = 10
+__DATABASE_VERSION__ = 16
 __DATEBASE_NAME_ORIGINAL__ = "MIND_original.db"
 
-class DB_Singleton(type):
-	_instances = {}
-	def __call__(cls, *args, **kwargs):
-		i = f'{cls}{current_thread()}'
-		if (i not in cls._instances
-		or cls._instances[i].closed):
-			cls._instances[i] = super(DB_Singleton, cls).__call__(*args, **kwargs)
+DB_TIMEOUT = 20.0
+"Seconds to wait for a lock on the database, and for a connection of the pool"
+DEFAULT_POOL_SIZE = 15
+"Max amount of connections in the pool until the setting has been read"
+MAX_CONNECTION_AGE = 3600.0
+"Seconds after which a connection is closed and replaced by a new one"
+HEALTH_CHECK_INTERVAL = 60.0
+"Seconds a connection can be idle before it's checked when taken from the pool"
+
+DATABASE_PROFILES: Dict[str, Dict[str, Union[int, str]]] = {
+	DatabaseProfile.DURABLE.value: {
+		'synchronous': 'FULL',
+		'cache_size': -2048,
+		'mmap_size': 0,
+		'temp_store': 'DEFAULT',
+		'busy_timeout': 20000,
+		'wal_autocheckpoint': 1000
+	},
+	DatabaseProfile.BALANCED.value: {
+		'synchronous': 'NORMAL',
+		'cache_size': -16384,
+		'mmap_size': 64 * 1024 * 1024,
+		'temp_store': 'MEMORY',
+		'busy_timeout': 20000,
+		'wal_autocheckpoint': 1000
+	},
+	DatabaseProfile.FAST.value: {
+		'synchronous': 'OFF',
+		'cache_size': -65536,
+		'mmap_size': 256 * 1024 * 1024,
+		'temp_store': 'MEMORY',
+		'busy_timeout': 20000,
+		'wal_autocheckpoint': 4000
+	}
+}
+"""The PRAGMA's set on every connection, per performance profile. 'Durable'
+doesn't lose committed data on a power loss, 'balanced' can lose the last
+transactions and 'fast' can corrupt the database."""
+
+MAX_IMPORT_SIZE = 4 * 1024 ** 3
+"Max size of an imported database file in bytes"
+
+MAINTENANCE_ANALYSIS_LIMIT = 1000
+"Max amount of rows per index that ANALYZE looks at during maintenance"
+VACUUM_FREE_RATIO = 0.25
+"""Share of free pages above which maintenance rebuilds a database that
+doesn't support incremental vacuum yet"""
+
+SLOW_QUERY_THRESHOLD = 0.1
+"Seconds after which a query is logged as slow, with its query plan"
+PLACEHOLDER_LIST = compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+"A list of placeholders, e.g. `(?, ?, ?)`"
+
+MIGRATION_BATCH_SIZE = 10_000
+"Amount of rows that a migration step changes at once when done in Python"
+
+MIGRATIONS: Dict[int, Tuple[Callable[[Cursor], None], bool]] = {}
+"""The migration steps, by the database version that they migrate from.
+Filled using the `migration()` decorator."""
+
+@lru_cache(maxsize=1024)
+def _normalise_statement(sql: str) -> str:
+	"""Put a statement on one line, for grouping and logging. Lists of
+	placeholders are shortened, so that e.g. `IN (?, ?)` and `IN (?, ?, ?)`
+	are grouped together.
 
-		return cls._instances[i]
+	Args:
+		sql (str): The statement.
+
+	Returns:
+		str: The statement with all whitespace collapsed and lists of
+		placeholders replaced by `(?, ...)`.
+	"""
+	return PLACEHOLDER_LIST.sub('(?, ...)', ' '.join(sql.split()))
+
+def _get_caller(frame: FrameType) -> str:
+	"""Get the name of the function of a frame, including its class if it's a
+	method, e.g. `Reminders.fetchall`.
+
+	Args:
+		frame (FrameType): The frame.
 
-class DBConnection(Connection, metaclass=DB_Singleton):
+	Returns:
+		str: The name.
+	"""
+	code = frame.f_code
+	if hasattr(code, 'co_qualname'):
+		return code.co_qualname
+
+	# Python 3.10 and lower
+	instance = frame.f_locals.get('self')
+	if instance is None:
+		return code.co_name
+	return f'{type(instance).__name__}.{code.co_name}'
+
+class DBCursor(Cursor):
+	"""Cursor that measures how long each statement takes. The durations are
+	grouped by statement and by the function that ran it, e.g.
+	`Reminders.fetchall`. Slow statements are logged with their query plan.
+	"""
+	def __measure(
+		self,
+		sql: str,
+		duration: float,
+		parameters: Union[tuple, dict, None]
+	) -> None:
+		"""Record the duration of a statement. Must be called directly from
+		the `execute*` method, so that the caller of that method can be found.
+
+		Args:
+			sql (str): The statement.
+			duration (float): How long the statement took, in seconds.
+			parameters (Union[tuple, dict, None]): The parameters of the
+			statement, or `None` when its query plan can't be determined.
+		"""
+		caller = _get_caller(_getframe(2))
+		statement = _normalise_statement(sql)
+		QUERY_STATS.observe(caller, statement, duration)
+
+		if duration < SLOW_QUERY_THRESHOLD:
+			return
+
+		plan = None
+		if parameters is not None:
+			try:
+				plan = [
+					r[3]
+					for r in self.connection.execute(
+						"EXPLAIN QUERY PLAN " + sql,
+						parameters
+					)
+				]
+			except (OperationalError, ProgrammingError):
+				pass
+
+		QUERY_STATS.add_slow_query(caller, statement, duration, plan)
+		LOGGER.warning(
+			f'Slow query ({duration * 1000:.0f}ms) in {caller}: {statement}'
+			+ (f' | Plan: {"; ".join(plan)}' if plan else '')
+		)
+		return
+
+	def execute(self, sql: str, parameters=(), /) -> Cursor:
+		start = perf_counter()
+		try:
+			return super().execute(sql, parameters)
+		finally:
+			self.__measure(sql, perf_counter() - start, parameters)
+
+	def executemany(self, sql: str, seq_of_parameters, /) -> Cursor:
+		start = perf_counter()
+		try:
+			return super().executemany(sql, seq_of_parameters)
+		finally:
+			self.__measure(sql, perf_counter() - start, None)
+
+	def executescript(self, sql_script: str, /) -> Cursor:
+		start = perf_counter()
+		try:
+			return super().executescript(sql_script)
+		finally:
+			self.__measure(sql_script, perf_counter() - start, None)
+
+class DBConnection(Connection):
 	file = ''
+	pragmas = DATABASE_PROFILES[DatabaseProfile.DURABLE.value]
+
+	def __init__(self, timeout: float, read_only: bool = False) -> None:
+		LOGGER.debug(f'Creating connection {self}; {read_only=}')
+		if read_only:
+			# With WAL, readers don't wait for writers and vice versa.
+			# 'mode=ro' is enforced when opening the file, unlike
+			# 'PRAGMA query_only', which any statement could turn off again
+			# on a connection that's handed out by the pool.
+			super().__init__(
+				Path(self.file).absolute().as_uri() + '?mode=ro',
+				timeout=timeout,
+				check_same_thread=False,
+				uri=True
+			)
+		else:
+			super().__init__(self.file, timeout=timeout, check_same_thread=False)
+			super().cursor().execute("PRAGMA foreign_keys = ON;")
+
+		cursor = super().cursor()
+		for name, value in self.pragmas.items():
+			cursor.execute(f"PRAGMA {name} = {value};")
 
-	def __init__(self, timeout: float) -> None:
-		LOGGER.debug(f'Creating connection {self}')
-		super().__init__(self.file, timeout=timeout)
-		super().cursor().execute("PRAGMA foreign_keys = ON;")
 		self.closed = False
+		self.read_only = read_only
+		self.db_file = self.file
+		self.db_pragmas = self.pragmas
+		self.created = self.last_used = monotonic()
 		return
 
 	def close(self) -> None:
@@ -53,6 +240,236 @@ class DBConnection(Connection, metaclass=DB_Singleton):
 	def __repr__(self) -> str:
 		return f'<{self.__class__.__name__}; {current_thread().name}; {id(self)}>'
 
+class ConnectionPool:
+	"""A bounded pool of database connections that are shared by all threads.
+	A connection is taken from the pool for the duration of an app context
+	(see `get_db` and `close_db`).
+	"""
+	def __init__(
+		self,
+		name: str,
+		size: int,
+		timeout: float,
+		read_only: bool = False
+	) -> None:
+		"""Create the pool. Connections are created when needed.
+
+		Args:
+			name (str): The name of the pool, used in the metrics.
+			size (int): The max amount of connections.
+			timeout (float): The max amount of seconds to wait for a
+			connection when all of them are in use.
+			read_only (bool, optional): Open the connections read-only.
+				Defaults to False.
+		"""
+		self.name = name
+		self.size = size
+		self.timeout = timeout
+		self.read_only = read_only
+		self.condition = Condition()
+		self.idle: List[DBConnection] = []
+		self.in_use = 0
+		self.__update_gauge()
+		return
+
+	def __update_gauge(self) -> None:
+		"""Export the state of the pool. Lock must be held.
+		"""
+		DB_POOL_CONNECTIONS.set(self.in_use, self.name, 'in_use')
+		DB_POOL_CONNECTIONS.set(len(self.idle), self.name, 'idle')
+		DB_POOL_CONNECTIONS.set(self.size, self.name, 'max')
+		return
+
+	@staticmethod
+	def __is_usable(db: DBConnection) -> bool:
+		"""Check if a connection can be (re)used.
+
+		Args:
+			db (DBConnection): The connection to check.
+
+		Returns:
+			bool: Whether or not it's usable.
+		"""
+		return (
+			not db.closed
+			and db.db_file == DBConnection.file
+			and db.db_pragmas is DBConnection.pragmas
+			and monotonic() - db.created < MAX_CONNECTION_AGE
+		)
+
+	@staticmethod
+	def __is_healthy(db: DBConnection) -> bool:
+		"""Check if a connection that was idle for a while still works.
+
+		Args:
+			db (DBConnection): The connection to check.
+
+		Returns:
+			bool: Whether or not it works.
+		"""
+		if monotonic() - db.last_used < HEALTH_CHECK_INTERVAL:
+			return True
+
+		try:
+			db.execute("SELECT 1;").fetchone()
+			return True
+
+		except (OperationalError, ProgrammingError):
+			return False
+
+	def resize(self, size: int) -> None:
+		"""Change the max amount of connections. Surplus idle connections are
+		closed directly, surplus connections in use when they're returned.
+
+		Args:
+			size (int): The new max amount of connections.
+		"""
+		with self.condition:
+			self.size = size
+			while self.idle and len(self.idle) + self.in_use > size:
+				self.idle.pop(0).close()
+			self.__update_gauge()
+			self.condition.notify_all()
+		return
+
+	def acquire(self) -> DBConnection:
+		"""Take a connection from the pool, waiting for one to be returned
+		if needed.
+
+		Raises:
+			OperationalError: No connection became available within the
+			timeout.
+
+		Returns:
+			DBConnection: The connection. Give it back using `release()`.
+		"""
+		start = monotonic()
+		with self.condition:
+			while not self.idle and self.in_use >= self.size:
+				remaining = self.timeout - (monotonic() - start)
+				if remaining <= 0:
+					DB_POOL_TIMEOUTS.increase(self.name)
+					LOGGER.error(
+						f'All {self.size} {self.name} database connections are in use'
+					)
+					raise OperationalError('No database connection available')
+				self.condition.wait(remaining)
+
+			db = self.idle.pop() if self.idle else None
+			self.in_use += 1
+			self.__update_gauge()
+		DB_POOL_WAIT.observe(monotonic() - start, self.name)
+
+		try:
+			if db is not None and not (
+				self.__is_usable(db) and self.__is_healthy(db)
+			):
+				db.close()
+				db = None
+
+			if db is None:
+				db = DBConnection(
+					timeout=self.timeout,
+					read_only=self.read_only
+				)
+
+		except BaseException:
+			with self.condition:
+				self.in_use -= 1
+				self.__update_gauge()
+				self.condition.notify()
+			raise
+
+		return db
+
+	def release(self, db: DBConnection) -> None:
+		"""Give a connection back to the pool. Uncommitted changes are rolled
+		back.
+
+		Args:
+			db (DBConnection): The connection taken using `acquire()`.
+		"""
+		try:
+			if not db.closed and db.in_transaction:
+				db.rollback()
+		except ProgrammingError:
+			pass
+
+		db.last_used = monotonic()
+		with self.condition:
+			self.in_use -= 1
+			if (
+				self.__is_usable(db)
+				and len(self.idle) + self.in_use < self.size
+			):
+				# Most recently used connection is handed out first
+				self.idle.append(db)
+			elif not db.closed:
+				db.close()
+			self.__update_gauge()
+			self.condition.notify()
+		return
+
+	def close_all(self) -> None:
+		"""Close all idle connections.
+		"""
+		with self.condition:
+			for db in self.idle:
+				db.close()
+			self.idle.clear()
+			self.__update_gauge()
+		return
+
+POOL = ConnectionPool('read_write', DEFAULT_POOL_SIZE, DB_TIMEOUT)
+READ_POOL = ConnectionPool(
+	'read_only', DEFAULT_POOL_SIZE, DB_TIMEOUT, read_only=True
+)
+
+def set_pool_size(size: int) -> None:
+	"""Change the max amount of connections of both connection pools.
+
+	Args:
+		size (int): The new max amount of connections per pool.
+	"""
+	POOL.resize(size)
+	READ_POOL.resize(size)
+	return
+
+def close_pools() -> None:
+	"""Close the idle connections of both connection pools.
+	"""
+	POOL.close_all()
+	READ_POOL.close_all()
+	return
+
+def set_connection_pragmas(pragmas: Dict[str, Union[int, str]]) -> None:
+	"""Change the PRAGMA's that are set on connections. Connections of the
+	pools that were opened with other values are replaced.
+
+	Args:
+		pragmas (Dict[str, Union[int, str]]): The name and value of each
+		PRAGMA. See `DATABASE_PROFILES`.
+	"""
+	if pragmas != DBConnection.pragmas:
+		LOGGER.debug(f'Setting database PRAGMA\'s: {pragmas}')
+		DBConnection.pragmas = pragmas
+		close_pools()
+	return
+
+def _is_read_only_request() -> bool:
+	"""Check if the current request only reads from the database. That's
+	the case for GET requests.
+
+	Returns:
+		bool: Whether or not a read-only connection can be used.
+	"""
+	return has_request_context() and request.method in ('GET', 'HEAD')
+
+_import_lock = Lock()
+_import_status: Dict[str, Union[str, None]] = {'state': 'idle', 'error': None}
+_pending_import: Union[str, None] = None
+"The checked database file that is swapped in when MIND restarts"
+
 def setup_db_location() -> None:
 	"""Create folder for database and link file to DBConnection class
 	"""
@@ -66,7 +483,8 @@ def setup_db_location() -> None:
 	return
 
 def get_db(output_type: Union[Type[dict], Type[tuple]]=tuple):
-	"""Get a database cursor instance. Coupled to Flask's g.
+	"""Get a database cursor instance. Coupled to Flask's g. GET requests get
+	a read-only connection, so that they don't wait for writes.
 
 	Args:
 		output_type (Union[Type[dict], Type[tuple]], optional):
@@ -79,8 +497,13 @@ def get_db(output_type: Union[Type[dict], Type[tuple]]=tuple):
 	try:
 		cursor = g.cursor
 	except AttributeError:
-		db = DBConnection(timeout=20.0)
-		cursor = g.cursor = db.cursor()
+		pool = READ_POOL if _is_read_only_request() else POOL
+		db = pool.acquire()
+		try:
+			cursor = g.cursor = db.cursor(DBCursor)
+		except BaseException:
+			pool.release(db)
+			raise
 
 	if output_type is dict:
 		cursor.row_factory = Row
@@ -90,226 +513,649 @@ def get_db(output_type: Union[Type[dict], Type[tuple]]=tuple):
 	return g.cursor
 
 def close_db(e=None) -> None:
-	"""Savely closes the database connection
+	"""Savely commits and gives the database connection back to the pool
 	"""	
 	try:
 		cursor = g.cursor
-		db: DBConnection = cursor.connection
+	except AttributeError:
+		return
+
+	delattr(g, 'cursor')
+	db: DBConnection = cursor.connection
+	try:
 		cursor.close()
-		delattr(g, 'cursor')
 		db.commit()
-		if current_thread() is main_thread():
-			db.close()
-	except (AttributeError, ProgrammingError):
+	except ProgrammingError:
 		pass
+	finally:
+		(READ_POOL if db.read_only else POOL).release(db)
 	return
 
-def migrate_db(current_db_version: int) -> None:
+def get_page_sql(
+	sort_by: Union[SortingMethod, TimelessSortingMethod],
+	cursor: Union[str, None] = None
+) -> Tuple[str, str, List[Any]]:
+	"""Get the SQL that sorts a library, and that continues after the entry
+	of a cursor (keyset pagination).
+
+	Args:
+		sort_by (Union[SortingMethod, TimelessSortingMethod]): How to sort.
+		cursor (Union[str, None], optional): The cursor from
+			`get_page_cursor()`, or `None` to start at the beginning.
+			Defaults to None.
+
+	Raises:
+		InvalidKeyValue: The cursor is invalid or made for another sorting
+		method.
+
+	Returns:
+		Tuple[str, str, List[Any]]: The condition to add to the WHERE clause
+		(empty without a cursor), the ORDER BY clause and the parameters of
+		the condition.
 	"""
-	Migrate a MIND database from it's current version 
-	to the newest version supported by the MIND version installed.
+	columns, reverse = sort_by.value
+	direction = 'DESC' if reverse else 'ASC'
+	order_by = 'ORDER BY ' + ', '.join(f'{c} {direction}' for c in columns)
+	if cursor is None:
+		return '', order_by, []
+
+	try:
+		values = loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+	except (BinasciiError, JSONDecodeError, UnicodeDecodeError, ValueError):
+		raise InvalidKeyValue('cursor', cursor)
+
+	if not (
+		isinstance(values, list)
+		and len(values) == len(columns) + 1
+		and values[0] == sort_by.name
+		and all(isinstance(v, (int, str)) for v in values[1:])
+	):
+		raise InvalidKeyValue('cursor', cursor)
+
+	condition = 'AND ({c}) {o} ({p})'.format(
+		c=', '.join(columns),
+		o='<' if reverse else '>',
+		p=', '.join('?' * len(columns))
+	)
+	return condition, order_by, values[1:]
+
+def get_page_cursor(
+	sort_by: Union[SortingMethod, TimelessSortingMethod],
+	entry: dict
+) -> str:
+	"""Get the cursor that continues a library after an entry.
+
+	Args:
+		sort_by (Union[SortingMethod, TimelessSortingMethod]): How the
+		library is sorted.
+		entry (dict): The last entry of the page.
+
+	Returns:
+		str: The cursor.
 	"""
-	LOGGER.info('Migrating database to newer version...')
-	cursor = get_db()
-	if current_db_version == 1:
-		# V1 -> V2
-		t = time()
-		utc_offset = datetime.fromtimestamp(t) - datetime.utcfromtimestamp(t)
-		cursor.execute("SELECT time, id FROM reminders;")
-		new_reminders = []
-		new_reminders_append = new_reminders.append
-		for reminder in cursor:
-			new_reminders_append([round((datetime.fromtimestamp(reminder[0]) - utc_offset).timestamp()), reminder[1]])
-		cursor.executemany("UPDATE reminders SET time = ? WHERE id = ?;", new_reminders)
-		current_db_version = 2
+	values = [sort_by.name, *(entry[c] for c in sort_by.value[0])]
+	return urlsafe_b64encode(
+		dumps(values, separators=(',', ':')).encode()
+	).decode().rstrip('=')
+
+def _execute_script(cursor: Cursor, script: str) -> None:
+	"""Run the statements of an SQL script one by one. Unlike
+	`Cursor.executescript()`, this doesn't commit the current transaction
+	first.
+
+	Args:
+		cursor (Cursor): The cursor to run the statements with.
+		script (str): The SQL script.
+	"""
+	statement = ''
+	for line in script.splitlines(keepends=True):
+		statement += line
+		if complete_statement(statement):
+			cursor.execute(statement)
+			statement = ''
+	return
+
+def migration(
+	from_version: int,
+	foreign_keys: bool = True
+) -> Callable[[Callable[[Cursor], None]], Callable[[Cursor], None]]:
+	"""Register a function as the migration of the database from a version to
+	the next version.
+
+	Args:
+		from_version (int): The version that the function migrates from.
+		foreign_keys (bool, optional): Whether foreign keys are enforced while
+			the migration runs. Disable this when tables are rebuilt.
+			Defaults to True.
+
+	Returns:
+		Callable[[Callable[[Cursor], None]], Callable[[Cursor], None]]:
+		The decorator.
+	"""
+	def decorator(
+		func: Callable[[Cursor], None]
+	) -> Callable[[Cursor], None]:
+		MIGRATIONS[from_version] = (func, foreign_keys)
+		return func
+	return decorator
+
+@migration(1)
+def _migrate_1_to_2(cursor: Cursor) -> None:
+	# Reminder times were stored in local time instead of UTC
+	t = time()
+	utc_offset = datetime.fromtimestamp(t) - datetime.utcfromtimestamp(t)
+	total = cursor.execute("SELECT COUNT(*) FROM reminders;").fetchone()[0]
+	done, last_id = 0, 0
+	while True:
+		reminders = cursor.execute("""
+			SELECT id, time
+			FROM reminders
+			WHERE id > ?
+			ORDER BY id
+			LIMIT ?;
+			""",
+			(last_id, MIGRATION_BATCH_SIZE)
+		).fetchall()
+		if not reminders:
+			break
+
+		cursor.executemany(
+			"UPDATE reminders SET time = ? WHERE id = ?;",
+			(
+				(
+					round((datetime.fromtimestamp(r_time) - utc_offset).timestamp()),
+					r_id
+				)
+				for r_id, r_time in reminders
+			)
+		)
+		done += len(reminders)
+		last_id = reminders[-1][0]
+		LOGGER.info(f'Migrated {done}/{total} reminders')
+	return
+
+@migration(2)
+def _migrate_2_to_3(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		ALTER TABLE reminders
+		ADD color VARCHAR(7);
+		ALTER TABLE templates
+		ADD color VARCHAR(7);
+	""")
+	return
+
+@migration(3)
+def _migrate_3_to_4(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		UPDATE reminders
+		SET repeat_quantity = repeat_quantity || 's'
+		WHERE repeat_quantity NOT LIKE '%s';
+	""")
+	return
+
+@migration(4)
+def _migrate_4_to_5(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		PRAGMA defer_foreign_keys = ON;
+
+		CREATE TEMPORARY TABLE temp_reminder_services(
+			reminder_id,
+			static_reminder_id,
+			template_id,
+			notification_service_id
+		);
 		
-	if current_db_version == 2:
-		# V2 -> V3
-		cursor.executescript("""
-			ALTER TABLE reminders
-			ADD color VARCHAR(7);
-			ALTER TABLE templates
-			ADD color VARCHAR(7);
-		""")
-		current_db_version = 3
+		-- Reminders
+		INSERT INTO temp_reminder_services(reminder_id, notification_service_id)
+		SELECT id, notification_service
+		FROM reminders;
 		
-	if current_db_version == 3:
-		# V3 -> V4
-		cursor.executescript("""
-			UPDATE reminders
-			SET repeat_quantity = repeat_quantity || 's'
-			WHERE repeat_quantity NOT LIKE '%s';
-		""")
-		current_db_version = 4
-
-	if current_db_version == 4:
-		# V4 -> V5
-		cursor.executescript("""
-			BEGIN TRANSACTION;
-			PRAGMA defer_foreign_keys = ON;
-
-			CREATE TEMPORARY TABLE temp_reminder_services(
-				reminder_id,
-				static_reminder_id,
-				template_id,
-				notification_service_id
-			);
-			
-			-- Reminders
-			INSERT INTO temp_reminder_services(reminder_id, notification_service_id)
-			SELECT id, notification_service
+		CREATE TEMPORARY TABLE temp_reminders AS
+			SELECT id, user_id, title, text, time, repeat_quantity, repeat_interval, original_time, color
 			FROM reminders;
+		DROP TABLE reminders;
+		CREATE TABLE reminders(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+			time INTEGER NOT NULL,
+
+			repeat_quantity VARCHAR(15),
+			repeat_interval INTEGER,
+			original_time INTEGER,
 			
-			CREATE TEMPORARY TABLE temp_reminders AS
-				SELECT id, user_id, title, text, time, repeat_quantity, repeat_interval, original_time, color
-				FROM reminders;
-			DROP TABLE reminders;
-			CREATE TABLE reminders(
-				id INTEGER PRIMARY KEY,
-				user_id INTEGER NOT NULL,
-				title VARCHAR(255) NOT NULL,
-				text TEXT,
-				time INTEGER NOT NULL,
-
-				repeat_quantity VARCHAR(15),
-				repeat_interval INTEGER,
-				original_time INTEGER,
-				
-				color VARCHAR(7),
-				
-				FOREIGN KEY (user_id) REFERENCES users(id)
-			);
-			INSERT INTO reminders
-				SELECT * FROM temp_reminders;
-
-			-- Templates
-			INSERT INTO temp_reminder_services(template_id, notification_service_id)
-			SELECT id, notification_service
+			color VARCHAR(7),
+			
+			FOREIGN KEY (user_id) REFERENCES users(id)
+		);
+		INSERT INTO reminders
+			SELECT * FROM temp_reminders;
+
+		-- Templates
+		INSERT INTO temp_reminder_services(template_id, notification_service_id)
+		SELECT id, notification_service
+		FROM templates;
+
+		CREATE TEMPORARY TABLE temp_templates AS
+			SELECT id, user_id, title, text, color
 			FROM templates;
+		DROP TABLE templates;
+		CREATE TABLE templates(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+			
+			color VARCHAR(7),
 
-			CREATE TEMPORARY TABLE temp_templates AS
-				SELECT id, user_id, title, text, color
-				FROM templates;
-			DROP TABLE templates;
-			CREATE TABLE templates(
-				id INTEGER PRIMARY KEY,
-				user_id INTEGER NOT NULL,
-				title VARCHAR(255) NOT NULL,
-				text TEXT,
-				
-				color VARCHAR(7),
-
-				FOREIGN KEY (user_id) REFERENCES users(id)
-			);
-			INSERT INTO templates
-				SELECT * FROM temp_templates;
-
-			INSERT INTO reminder_services
-				SELECT * FROM temp_reminder_services;
-
-			COMMIT;
-		""")
-		current_db_version = 5
+			FOREIGN KEY (user_id) REFERENCES users(id)
+		);
+		INSERT INTO templates
+			SELECT * FROM temp_templates;
 
-	if current_db_version == 5:
-		# V5 -> V6
-		from backend.users import User
-		try:
-			User('User1', 'Password1').delete()
-		except (UserNotFound, AccessUnauthorized):
-			pass
-		
-		current_db_version = 6
+		INSERT INTO reminder_services
+			SELECT * FROM temp_reminder_services;
 
-	if current_db_version == 6:
-		# V6 -> V7
-		cursor.executescript("""
-			ALTER TABLE reminders
-			ADD weekdays VARCHAR(13);
-		""")
-		current_db_version = 7
-
-	if current_db_version == 7:
-		# V7 -> V8
-		from backend.settings import _format_setting, default_settings
-		from backend.users import Users
-
-		cursor.executescript("""
-			DROP TABLE config;
-			CREATE TABLE IF NOT EXISTS config(
-				key VARCHAR(255) PRIMARY KEY,
-				value BLOB NOT NULL
-			);
-			"""
+		DROP TABLE temp_reminder_services;
+		DROP TABLE temp_reminders;
+		DROP TABLE temp_templates;
+	""")
+	return
+
+@migration(5)
+def _migrate_5_to_6(cursor: Cursor) -> None:
+	from backend.users import Users
+	try:
+		user_id = Users().login('User1', 'Password1').user_id
+	except (UserNotFound, AccessUnauthorized):
+		return
+
+	# Deleting the user doesn't cascade yet in this version
+	for table in (
+		'reminders', 'templates', 'static_reminders', 'notification_services'
+	):
+		cursor.execute(f"DELETE FROM {table} WHERE user_id = ?;", (user_id,))
+	cursor.execute("DELETE FROM users WHERE id = ?;", (user_id,))
+	return
+
+@migration(6)
+def _migrate_6_to_7(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		ALTER TABLE reminders
+		ADD weekdays VARCHAR(13);
+	""")
+	return
+
+@migration(7)
+def _migrate_7_to_8(cursor: Cursor) -> None:
+	from backend.settings import _format_setting, default_settings
+	from backend.users import Users
+
+	_execute_script(cursor, """
+		DROP TABLE config;
+		CREATE TABLE IF NOT EXISTS config(
+			key VARCHAR(255) PRIMARY KEY,
+			value BLOB NOT NULL
+		);
+		"""
+	)
+	cursor.executemany("""
+		INSERT OR IGNORE INTO config(key, value)
+		VALUES (?, ?);
+		""",
+		map(
+			lambda kv: (kv[0], _format_setting(*kv)),
+			default_settings.items()
 		)
-		cursor.executemany("""
-			INSERT OR IGNORE INTO config(key, value)
-			VALUES (?, ?);
-			""",
-			map(
-				lambda kv: (kv[0], _format_setting(*kv)),
-				default_settings.items()
+	)
+
+	_execute_script(cursor, """
+		ALTER TABLE users
+		ADD admin BOOL NOT NULL DEFAULT 0;
+				   
+		UPDATE users
+		SET username = 'admin_old'
+		WHERE username = 'admin';
+	""")
+
+	Users().add('admin', 'admin', True)
+
+	cursor.execute("""
+		UPDATE users
+		SET admin = 1
+		WHERE username = 'admin';
+	""")
+	return
+
+@migration(8)
+def _migrate_8_to_9(cursor: Cursor) -> None:
+	# Not using set_setting(), because that also changes the settings of the
+	# running instance, and imported databases are migrated while it runs
+	from backend.settings import _format_setting
+	from MIND import HOST, PORT, URL_PREFIX
+
+	cursor.executemany(
+		"UPDATE config SET value = ? WHERE key = ?;",
+		(
+			(_format_setting(key, value), key)
+			for key, value in (
+				('host', HOST),
+				('port', int(PORT)),
+				('url_prefix', URL_PREFIX)
 			)
 		)
+	)
+	return
 
-		cursor.executescript("""
-			ALTER TABLE users
-			ADD admin BOOL NOT NULL DEFAULT 0;
-					   
-			UPDATE users
-			SET username = 'admin_old'
-			WHERE username = 'admin';
-		""")
+@migration(9)
+def _migrate_9_to_10(cursor: Cursor) -> None:
+	# This used to update the manifest once. setup_db() now does that after
+	# migrating, so that migrating an imported database doesn't change the
+	# manifest of the running instance.
+	return
+
+@migration(10)
+def _migrate_10_to_11(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		CREATE INDEX IF NOT EXISTS reminders_time_index
+			ON reminders(time);
+		CREATE INDEX IF NOT EXISTS reminders_user_time_index
+			ON reminders(user_id, time);
+		CREATE INDEX IF NOT EXISTS reminder_services_reminder_index
+			ON reminder_services(reminder_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_static_reminder_index
+			ON reminder_services(static_reminder_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_template_index
+			ON reminder_services(template_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_service_index
+			ON reminder_services(notification_service_id);
+	""")
+	return
 
-		Users().add('admin', 'admin', True)
+@migration(11)
+def _migrate_11_to_12(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		CREATE TABLE IF NOT EXISTS outbox(
+			id INTEGER PRIMARY KEY,
+			reminder_id INTEGER,
+			notification_service_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
 
-		cursor.execute("""
-			UPDATE users
-			SET admin = 1
-			WHERE username = 'admin';
-		""")
+			attempts INTEGER NOT NULL DEFAULT 0,
+			failed BOOL NOT NULL DEFAULT 0,
+			next_attempt INTEGER NOT NULL,
+			last_attempt INTEGER,
+			last_error TEXT,
+			created INTEGER NOT NULL,
+
+			FOREIGN KEY (notification_service_id) REFERENCES notification_services(id)
+				ON DELETE CASCADE
+		);
+		CREATE INDEX IF NOT EXISTS outbox_next_attempt_index
+			ON outbox(failed, next_attempt);
+	""")
+	return
+
+@migration(12, foreign_keys=False)
+def _migrate_12_to_13(cursor: Cursor) -> None:
+	# Store weekdays as a bitmask instead of a comma separated string.
+	# Rebuild the table because the type of the column changes.
+	_execute_script(cursor, """
+		CREATE TABLE reminders_new(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+			time INTEGER NOT NULL,
+
+			repeat_quantity VARCHAR(15),
+			repeat_interval INTEGER,
+			original_time INTEGER,
+			weekdays INTEGER,
 
-		current_db_version = 8
+			color VARCHAR(7),
 
-	if current_db_version == 8:
-		# V8 -> V9
-		from backend.settings import set_setting
-		from MIND import HOST, PORT, URL_PREFIX
+			FOREIGN KEY (user_id) REFERENCES users(id)
+		);
+		INSERT INTO reminders_new(
+			id, user_id,
+			title, text,
+			time,
+			repeat_quantity, repeat_interval,
+			original_time,
+			weekdays,
+			color
+		)
+			SELECT
+				id, user_id,
+				title, text,
+				time,
+				repeat_quantity, repeat_interval,
+				original_time,
+				CASE WHEN weekdays IS NULL OR weekdays = '' THEN NULL ELSE
+					(instr(',' || weekdays || ',', ',0,') > 0) * 1 +
+					(instr(',' || weekdays || ',', ',1,') > 0) * 2 +
+					(instr(',' || weekdays || ',', ',2,') > 0) * 4 +
+					(instr(',' || weekdays || ',', ',3,') > 0) * 8 +
+					(instr(',' || weekdays || ',', ',4,') > 0) * 16 +
+					(instr(',' || weekdays || ',', ',5,') > 0) * 32 +
+					(instr(',' || weekdays || ',', ',6,') > 0) * 64
+				END,
+				color
+			FROM reminders;
+		DROP TABLE reminders;
+		ALTER TABLE reminders_new RENAME TO reminders;
 
-		set_setting('host', HOST)
-		set_setting('port', int(PORT))
-		set_setting('url_prefix', URL_PREFIX)
+		CREATE INDEX IF NOT EXISTS reminders_time_index
+			ON reminders(time);
+		CREATE INDEX IF NOT EXISTS reminders_user_time_index
+			ON reminders(user_id, time);
+	""")
+	return
 
-		current_db_version = 9
+@migration(13)
+def _migrate_13_to_14(cursor: Cursor) -> None:
+	_execute_script(cursor, """
+		ALTER TABLE notification_services
+		ADD rate_limit INTEGER NOT NULL DEFAULT 0;
+	""")
+	return
 
-	if current_db_version == 9:
-		# V9 -> V10
+@migration(14, foreign_keys=False)
+def _migrate_14_to_15(cursor: Cursor) -> None:
+	# Delete everything of a user when the user is deleted, and index the
+	# user_id columns. Rebuild the tables because foreign keys can't be
+	# changed.
+	_execute_script(cursor, """
+		CREATE TABLE notification_services_new(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255),
+			url TEXT,
+			rate_limit INTEGER NOT NULL DEFAULT 0,
 
-		# Nothing is changed in the database
-		# It's just that this code needs to run once
-		# and the DB migration system does exactly that:
-		# run pieces of code once.
-		from backend.settings import update_manifest
+			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
+		);
+		INSERT INTO notification_services_new(
+			id, user_id, title, url, rate_limit
+		)
+			SELECT id, user_id, title, url, rate_limit
+			FROM notification_services;
+		DROP TABLE notification_services;
+		ALTER TABLE notification_services_new RENAME TO notification_services;
 
-		url_prefix: str = cursor.execute(
-			"SELECT value FROM config WHERE key = 'url_prefix' LIMIT 1;"
-		).fetchone()[0]
-		update_manifest(url_prefix)
+		CREATE TABLE reminders_new(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+			time INTEGER NOT NULL,
+
+			repeat_quantity VARCHAR(15),
+			repeat_interval INTEGER,
+			original_time INTEGER,
+			weekdays INTEGER,
 
-		current_db_version = 10
+			color VARCHAR(7),
+
+			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
+		);
+		INSERT INTO reminders_new(
+			id, user_id,
+			title, text,
+			time,
+			repeat_quantity, repeat_interval,
+			original_time,
+			weekdays,
+			color
+		)
+			SELECT
+				id, user_id,
+				title, text,
+				time,
+				repeat_quantity, repeat_interval,
+				original_time,
+				weekdays,
+				color
+			FROM reminders;
+		DROP TABLE reminders;
+		ALTER TABLE reminders_new RENAME TO reminders;
+
+		CREATE TABLE templates_new(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+
+			color VARCHAR(7),
+
+			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
+		);
+		INSERT INTO templates_new(id, user_id, title, text, color)
+			SELECT id, user_id, title, text, color
+			FROM templates;
+		DROP TABLE templates;
+		ALTER TABLE templates_new RENAME TO templates;
+
+		CREATE TABLE static_reminders_new(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+
+			color VARCHAR(7),
+
+			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
+		);
+		INSERT INTO static_reminders_new(id, user_id, title, text, color)
+			SELECT id, user_id, title, text, color
+			FROM static_reminders;
+		DROP TABLE static_reminders;
+		ALTER TABLE static_reminders_new RENAME TO static_reminders;
+
+		CREATE INDEX IF NOT EXISTS reminders_time_index
+			ON reminders(time);
+		CREATE INDEX IF NOT EXISTS reminders_user_time_index
+			ON reminders(user_id, time);
+		CREATE INDEX IF NOT EXISTS templates_user_index
+			ON templates(user_id);
+		CREATE INDEX IF NOT EXISTS static_reminders_user_index
+			ON static_reminders(user_id);
+		CREATE INDEX IF NOT EXISTS notification_services_user_index
+			ON notification_services(user_id);
+	""")
+	return
 
+@migration(15)
+def _migrate_15_to_16(cursor: Cursor) -> None:
+	# Indexes in the sorting orders of the libraries, for pagination
+	_execute_script(cursor, """
+		DROP INDEX IF EXISTS reminders_user_time_index;
+		CREATE INDEX IF NOT EXISTS reminders_user_time_index
+			ON reminders(user_id, time, title);
+		CREATE INDEX IF NOT EXISTS reminders_user_title_index
+			ON reminders(user_id, title, time);
+		CREATE INDEX IF NOT EXISTS reminders_user_index
+			ON reminders(user_id);
+		CREATE INDEX IF NOT EXISTS templates_user_title_index
+			ON templates(user_id, title);
+		CREATE INDEX IF NOT EXISTS static_reminders_user_title_index
+			ON static_reminders(user_id, title);
+	""")
 	return
 
-def setup_db() -> None:
-	"""Setup the database
+def migrate_db(current_db_version: int) -> None:
 	"""
-	from backend.settings import (_format_setting, default_settings, get_setting,
-	                              set_setting, update_manifest)
-	from backend.users import Users
+	Migrate a MIND database from it's current version 
+	to the newest version supported by the MIND version installed.
 
+	Every step runs in it's own transaction, which also stores the new
+	database version. So when MIND stops during a migration, it continues
+	from the last finished step the next time.
+	"""
+	LOGGER.info('Migrating database to newer version...')
 	cursor = get_db()
-	cursor.execute("PRAGMA journal_mode = wal;")
+	cursor.connection.commit()
+	cursor.execute("""
+		CREATE TABLE IF NOT EXISTS migrations(
+			version INTEGER PRIMARY KEY,
+			completed INTEGER NOT NULL,
+			duration REAL NOT NULL
+		);
+	""")
+
+	for version in range(current_db_version, __DATABASE_VERSION__):
+		step, foreign_keys = MIGRATIONS[version]
+		LOGGER.info(f'Migrating database: V{version} -> V{version + 1}')
+		start = perf_counter()
+
+		if not foreign_keys:
+			cursor.execute("PRAGMA foreign_keys = OFF;")
+		cursor.connection.isolation_level = None
+		cursor.execute("BEGIN TRANSACTION;")
+		try:
+			step(cursor)
+			duration = perf_counter() - start
+			cursor.execute(
+				"UPDATE config SET value = ? WHERE key = 'database_version';",
+				(version + 1,)
+			)
+			cursor.execute("""
+				INSERT OR REPLACE INTO migrations(version, completed, duration)
+				VALUES (?, ?, ?);
+				""",
+				(version + 1, round(time()), duration)
+			)
+			cursor.execute("COMMIT;")
+
+		except BaseException:
+			cursor.execute("ROLLBACK;")
+			raise
+
+		finally:
+			cursor.connection.isolation_level = ""
+			if not foreign_keys:
+				cursor.execute("PRAGMA foreign_keys = ON;")
+
+		LOGGER.info(
+			f'Migrated database to V{version + 1} in {duration:.3f}s'
+		)
+
+	return
+
+def _create_tables(cursor: Cursor) -> None:
+	"""Create the tables and indexes that don't exist yet. The migrations
+	expect that this has run on the database first.
 
+	Args:
+		cursor (Cursor): The cursor of the database.
+	"""
 	cursor.executescript("""
 		CREATE TABLE IF NOT EXISTS users(
 			id INTEGER PRIMARY KEY,
@@ -323,8 +1169,10 @@ def setup_db() -> None:
 			user_id INTEGER NOT NULL,
 			title VARCHAR(255),
 			url TEXT,
+			rate_limit INTEGER NOT NULL DEFAULT 0,
 			
 			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
 		);
 		CREATE TABLE IF NOT EXISTS reminders(
 			id INTEGER PRIMARY KEY,
@@ -336,11 +1184,12 @@ def setup_db() -> None:
 			repeat_quantity VARCHAR(15),
 			repeat_interval INTEGER,
 			original_time INTEGER,
-			weekdays VARCHAR(13),
+			weekdays INTEGER,
 			
 			color VARCHAR(7),
 			
 			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
 		);
 		CREATE TABLE IF NOT EXISTS templates(
 			id INTEGER PRIMARY KEY,
@@ -351,6 +1200,7 @@ def setup_db() -> None:
 			color VARCHAR(7),
 
 			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
 		);
 		CREATE TABLE IF NOT EXISTS static_reminders(
 			id INTEGER PRIMARY KEY,
@@ -361,6 +1211,7 @@ def setup_db() -> None:
 			color VARCHAR(7),
 			
 			FOREIGN KEY (user_id) REFERENCES users(id)
+				ON DELETE CASCADE
 		);
 		CREATE TABLE IF NOT EXISTS reminder_services(
 			reminder_id INTEGER,
@@ -380,7 +1231,69 @@ def setup_db() -> None:
 			key VARCHAR(255) PRIMARY KEY,
 			value BLOB NOT NULL
 		);
+		CREATE TABLE IF NOT EXISTS outbox(
+			id INTEGER PRIMARY KEY,
+			reminder_id INTEGER,
+			notification_service_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+
+			attempts INTEGER NOT NULL DEFAULT 0,
+			failed BOOL NOT NULL DEFAULT 0,
+			next_attempt INTEGER NOT NULL,
+			last_attempt INTEGER,
+			last_error TEXT,
+			created INTEGER NOT NULL,
+
+			FOREIGN KEY (notification_service_id) REFERENCES notification_services(id)
+				ON DELETE CASCADE
+		);
+
+		CREATE INDEX IF NOT EXISTS reminders_time_index
+			ON reminders(time);
+		CREATE INDEX IF NOT EXISTS reminders_user_time_index
+			ON reminders(user_id, time, title);
+		CREATE INDEX IF NOT EXISTS reminders_user_title_index
+			ON reminders(user_id, title, time);
+		CREATE INDEX IF NOT EXISTS reminders_user_index
+			ON reminders(user_id);
+		CREATE INDEX IF NOT EXISTS templates_user_index
+			ON templates(user_id);
+		CREATE INDEX IF NOT EXISTS templates_user_title_index
+			ON templates(user_id, title);
+		CREATE INDEX IF NOT EXISTS static_reminders_user_index
+			ON static_reminders(user_id);
+		CREATE INDEX IF NOT EXISTS static_reminders_user_title_index
+			ON static_reminders(user_id, title);
+		CREATE INDEX IF NOT EXISTS notification_services_user_index
+			ON notification_services(user_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_reminder_index
+			ON reminder_services(reminder_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_static_reminder_index
+			ON reminder_services(static_reminder_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_template_index
+			ON reminder_services(template_id);
+		CREATE INDEX IF NOT EXISTS reminder_services_service_index
+			ON reminder_services(notification_service_id);
+		CREATE INDEX IF NOT EXISTS outbox_next_attempt_index
+			ON outbox(failed, next_attempt);
 	""")
+	return
+
+def setup_db() -> None:
+	"""Setup the database
+	"""
+	from backend.settings import (_format_setting, apply_database_profile,
+	                              default_settings, get_setting, load_settings,
+	                              update_manifest)
+	from backend.users import Users
+
+	cursor = get_db()
+	# Only has effect on a new database, before the tables are created
+	cursor.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+	cursor.execute("PRAGMA journal_mode = wal;")
+
+	_create_tables(cursor)
 
 	cursor.executemany("""
 		INSERT OR IGNORE INTO config(key, value)
@@ -391,9 +1304,11 @@ def setup_db() -> None:
 			default_settings.items()
 		)
 	)
+	load_settings()
 
 	set_log_level(get_setting('log_level'), clear_file=False)
-	update_manifest(get_setting('url_prefix'))
+	set_pool_size(get_setting('database_pool_size'))
+	apply_database_profile()
 
 	current_db_version = get_setting('database_version')
 	if current_db_version < __DATABASE_VERSION__:
@@ -401,7 +1316,10 @@ def setup_db() -> None:
 			f'Database migration: {current_db_version} -> {__DATABASE_VERSION__}'
 		)
 		migrate_db(current_db_version)
-		set_setting('database_version', __DATABASE_VERSION__)
+		# Migrations can change the config directly
+		load_settings()
+
+	update_manifest(get_setting('url_prefix'))
 
 	users = Users()
 	if not 'admin' in users:
@@ -412,8 +1330,104 @@ def setup_db() -> None:
 			WHERE username = 'admin';
 		""")
 
+	# Connections of other threads come from the pool, so make the setup
+	# visible to them
+	cursor.connection.commit()
 	return
 
+def backup_db(filename: str) -> None:
+	"""Write a copy of the database to a file using the SQLite backup API.
+	The copy is made in one step, from a separate read-only connection. In
+	WAL mode, other connections can keep writing while it's being made. When
+	copying in multiple steps, every write in between would make the copy
+	start over.
+
+	Args:
+		filename (str): The file to write the copy to.
+	"""
+	LOGGER.info(f'Backing up database to {filename}')
+	start = perf_counter()
+	source = DBConnection(DB_TIMEOUT, read_only=True)
+	target = Connection(filename)
+	try:
+		source.backup(target)
+	finally:
+		target.close()
+		source.close()
+
+	LOGGER.info(f'Backed up database in {perf_counter() - start:.1f}s')
+	return
+
+def get_db_size() -> Dict[str, int]:
+	"""Get the size of the database and its write-ahead log.
+
+	Returns:
+		Dict[str, int]: The size of the database file and of the WAL file in
+		bytes, and the amount of pages in the database that are unused.
+	"""
+	wal_file = DBConnection.file + '-wal'
+	return {
+		'database_size': getsize(DBConnection.file),
+		'wal_size': getsize(wal_file) if isfile(wal_file) else 0,
+		'free_pages': get_db().execute("PRAGMA freelist_count;").fetchone()[0]
+	}
+
+def maintain_db() -> Dict[str, Any]:
+	"""Update the statistics that the query planner uses, give unused pages
+	back to the file system and empty the write-ahead log.
+
+	Returns:
+		Dict[str, Any]: When the maintenance started, how long it took in
+		seconds, and the output of `get_db_size()` before and after.
+	"""
+	LOGGER.info('Running database maintenance')
+	started = round(time())
+	start = perf_counter()
+	cursor = get_db()
+	# VACUUM can't run inside a transaction
+	cursor.connection.commit()
+	before = get_db_size()
+
+	cursor.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT};")
+	cursor.execute("ANALYZE;")
+	cursor.execute("PRAGMA optimize;")
+
+	if cursor.execute("PRAGMA auto_vacuum;").fetchone()[0] == 2:
+		# Frees one page per step, and executescript() runs all steps
+		cursor.executescript("PRAGMA incremental_vacuum;")
+
+	else:
+		page_count = cursor.execute("PRAGMA page_count;").fetchone()[0]
+		if before['free_pages'] > page_count * VACUUM_FREE_RATIO:
+			# Database was made before incremental vacuum was used.
+			# Rebuilding it once makes the setting take effect.
+			LOGGER.info('Rebuilding database to enable incremental vacuum')
+			cursor.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+			cursor.execute("VACUUM;")
+
+	busy = cursor.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone()[0]
+	if busy:
+		LOGGER.warning(
+			'Could not empty the write-ahead log because the database is in use'
+		)
+
+	after = get_db_size()
+	result = {
+		'started': started,
+		'duration': round(perf_counter() - start, 3),
+		'before': before,
+		'after': after
+	}
+	LOGGER.info(
+		'Finished database maintenance in {d}s: database {b} -> {a} bytes, '
+		'write-ahead log {bw} -> {aw} bytes'.format(
+			d=result['duration'],
+			b=before['database_size'], a=after['database_size'],
+			bw=before['wal_size'], aw=after['wal_size']
+		)
+	)
+	return result
+
 def revert_db_import(
 	swap: bool,
 	imported_db_file: str = ''
@@ -432,22 +1446,60 @@ def revert_db_import(
 		imported_db_file = join(dirname(DBConnection.file), __DATEBASE_NAME_ORIGINAL__)
 	
 	if swap:
-		remove(original_db_file)
-		move(
-			imported_db_file,
-			original_db_file
-		)
+		_move_db_file(imported_db_file, original_db_file)
 
 	else:
-		remove(imported_db_file)
+		_remove_db_file(imported_db_file)
 
 	return
 
+def _move_db_file(source: str, target: str) -> None:
+	"""Move a database file, together with its write-ahead log and shared
+	memory file. Those of the target are removed, so that they are never
+	applied to the moved database.
+
+	Args:
+		source (str): The database file to move.
+		target (str): The filepath to move it to.
+	"""
+	for suffix in ('-wal', '-shm'):
+		if isfile(target + suffix):
+			remove(target + suffix)
+
+	for suffix in ('', '-wal', '-shm'):
+		if isfile(source + suffix):
+			move(source + suffix, target + suffix)
+	return
+
+def _remove_db_file(filename: str) -> None:
+	"""Remove a database file, together with its write-ahead log and shared
+	memory file.
+
+	Args:
+		filename (str): The database file to remove.
+	"""
+	for suffix in ('', '-wal', '-shm'):
+		if isfile(filename + suffix):
+			remove(filename + suffix)
+	return
+
+def get_import_status() -> Dict[str, Union[str, None]]:
+	"""Get the status of the last database import.
+
+	Returns:
+		Dict[str, Union[str, None]]: The state (`idle`, `checking`,
+		`migrating`, `restarting` or `failed`) and the error if it failed.
+	"""
+	with _import_lock:
+		return dict(_import_status)
+
 def import_db(
 	new_db_file: str,
 	copy_hosting_settings: bool
 ) -> None:
-	"""Replace the current database with a new one.
+	"""Start replacing the current database with a new one. The new database
+	is checked and migrated in the background, after which MIND restarts to
+	use it. Follow the progress with `get_import_status()`.
 
 	Args:
 		new_db_file (str): The path to the new database file.
@@ -455,35 +1507,20 @@ def import_db(
 		database.
 
 	Raises:
-		InvalidDatabaseFile: The new database file is invalid or unsupported.
+		InvalidDatabaseFile: Another database is already being imported.
 	"""
-	LOGGER.info(f'Importing new database; {copy_hosting_settings=}')
-	try:
-		cursor = Connection(new_db_file, timeout=20.0).cursor()
-
-		database_version = cursor.execute(
-			"SELECT value FROM config WHERE key = 'database_version' LIMIT 1;"
-		).fetchone()[0]
-		if not isinstance(database_version, int):
+	with _import_lock:
+		if _import_status['state'] in ('checking', 'migrating', 'restarting'):
+			revert_db_import(
+				swap=False,
+				imported_db_file=new_db_file
+			)
 			raise InvalidDatabaseFile
+		_import_status.update(state='checking', error=None)
 
-	except (OperationalError, InvalidDatabaseFile):
-		LOGGER.error('Uploaded database is not a MIND database file')
-		cursor.connection.close()
-		revert_db_import(
-			swap=False,
-			imported_db_file=new_db_file
-		)
-		raise InvalidDatabaseFile
-
-	if database_version > __DATABASE_VERSION__:
-		LOGGER.error('Uploaded database is higher version than this MIND installation can support')
-		revert_db_import(
-			swap=False,
-			imported_db_file=new_db_file
-		)
-		raise InvalidDatabaseFile
+	LOGGER.info(f'Importing new database; {copy_hosting_settings=}')
 
+	hosting_settings = None
 	if copy_hosting_settings:
 		hosting_settings = get_db().execute("""
 			SELECT key, value, value
@@ -493,29 +1530,158 @@ def import_db(
 				OR key = 'url_prefix'
 			LIMIT 3;
 			"""
-		)
-		cursor.executemany("""
-			INSERT INTO config(key, value)
-			VALUES (?, ?)
-			ON CONFLICT(key) DO
-			UPDATE
-			SET value = ?;
-			""",
-			hosting_settings
-		)
-	cursor.connection.commit()
-	cursor.connection.close()
+		).fetchall()
+
+	Thread(
+		target=_import_db,
+		args=(new_db_file, hosting_settings),
+		name='DatabaseImporter',
+		daemon=True
+	).start()
+	return
 
-	move(
-		DBConnection.file,
-		join(dirname(DBConnection.file), __DATEBASE_NAME_ORIGINAL__)
-	)
-	move(
-		new_db_file,
-		DBConnection.file
-	)
+def _import_db(
+	new_db_file: str,
+	hosting_settings: Union[List[tuple], None]
+) -> None:
+	"""Check and migrate the new database, then restart to swap it in.
+	Intended to be run in a thread.
 
+	Args:
+		new_db_file (str): The path to the new database file.
+		hosting_settings (Union[List[tuple], None]): The hosting settings to
+		copy into the new database, or `None` to keep its own.
+	"""
 	from backend.server import SERVER
+
+	db = Connection(new_db_file, timeout=DB_TIMEOUT)
+	try:
+		try:
+			check = db.execute("PRAGMA integrity_check;").fetchall()
+			database_version = db.execute(
+				"SELECT value FROM config WHERE key = 'database_version' LIMIT 1;"
+			).fetchone()[0]
+
+		except (DatabaseError, TypeError):
+			raise InvalidDatabaseFile('Not a MIND database file')
+
+		if check != [('ok',)]:
+			raise InvalidDatabaseFile(
+				'Database file is corrupted: '
+				+ '; '.join(r[0] for r in check[:10])
+			)
+
+		if not isinstance(database_version, int):
+			raise InvalidDatabaseFile('Not a MIND database file')
+
+		if database_version > __DATABASE_VERSION__:
+			raise InvalidDatabaseFile(
+				'Database is of a newer version than this MIND installation supports'
+			)
+
+		if database_version < __DATABASE_VERSION__:
+			# Migrate now, so that it doesn't hold up the restart
+			with _import_lock:
+				_import_status['state'] = 'migrating'
+			LOGGER.info(
+				f'Migrating imported database: {database_version} -> {__DATABASE_VERSION__}'
+			)
+			db.execute("PRAGMA foreign_keys = ON;")
+			_create_tables(db.cursor())
+			with SERVER.app.app_context():
+				g.cursor = db.cursor(DBCursor)
+				try:
+					migrate_db(database_version)
+				finally:
+					delattr(g, 'cursor')
+
+		if hosting_settings is not None:
+			db.executemany("""
+				INSERT INTO config(key, value)
+				VALUES (?, ?)
+				ON CONFLICT(key) DO
+				UPDATE
+				SET value = ?;
+				""",
+				hosting_settings
+			)
+		db.commit()
+		db.close()
+
+	except Exception as e:
+		if isinstance(e, InvalidDatabaseFile):
+			error = str(e)
+			LOGGER.error(f'Failed to import database: {error}')
+		else:
+			error = 'Failed to import database'
+			LOGGER.exception('Failed to import database')
+
+		db.close()
+		revert_db_import(
+			swap=False,
+			imported_db_file=new_db_file
+		)
+
+		with _import_lock:
+			_import_status.update(state='failed', error=error)
+		return
+
+	# The files are swapped by finish_db_import() once the server, the
+	# handlers and the connection pools have stopped
+	global _pending_import
+	with _import_lock:
+		_import_status['state'] = 'restarting'
+		_pending_import = new_db_file
+
 	SERVER.restart([RestartVars.DB_IMPORT.value])
 
 	return
+
+def finish_db_import() -> bool:
+	"""Swap in the imported database, if there is one. Nothing may use the
+	database while this runs, so the handlers have to be stopped and the
+	connection pools closed first.
+
+	Returns:
+		bool: Whether the imported database is now in place. Also `True`
+		when nothing was imported.
+	"""
+	global _pending_import
+	with _import_lock:
+		new_db_file, _pending_import = _pending_import, None
+
+	if new_db_file is None:
+		return True
+
+	LOGGER.info('Swapping in imported database')
+	original_db_file = join(
+		dirname(DBConnection.file), __DATEBASE_NAME_ORIGINAL__
+	)
+	moved_original = False
+	try:
+		# Put everything in the database file itself, so that the original
+		# database is complete without its write-ahead log
+		db = Connection(DBConnection.file, timeout=DB_TIMEOUT)
+		try:
+			db.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+		finally:
+			db.close()
+
+		_move_db_file(DBConnection.file, original_db_file)
+		moved_original = True
+		_move_db_file(new_db_file, DBConnection.file)
+
+	except Exception:
+		LOGGER.exception('Failed to swap in imported database')
+		if moved_original:
+			revert_db_import(swap=True)
+		_remove_db_file(new_db_file)
+
+		with _import_lock:
+			_import_status.update(
+				state='failed',
+				error='Failed to swap in imported database'
+			)
+		return False
+
+	return True
@@ -7,7 +7,7 @@ General functions
 from enum import Enum
 from os.path import abspath, dirname, join
 from sys import version_info
-from typing import Callable, TypeVar, Union
+from typing import Callable, Iterable, List, TypeVar, Union
 
 T = TypeVar('T')
 U = TypeVar('U')
@@ -55,6 +55,21 @@ def search_filter(query: str, result: dict) -> bool:
 	)
 
 
+def ids_from_concat(ids: Union[str, None]) -> List[int]:
+	"""Turn the result of `group_concat()` on a column of ID's into a list.
+
+	Args:
+		ids (Union[str, None]): The comma separated ID's, or `None` when
+		there are none.
+
+	Returns:
+		List[int]: The ID's.
+	"""
+	if not ids:
+		return []
+	return [int(i) for i in ids.split(',')]
+
+
 def when_not_none(value: Union[T, None], to_run: Callable[[T], U]) -> Union[U, None]:
 	"""Run `to_run` with argument `value` iff `value is not None`. Else return
 	`None`.
@@ -72,6 +87,33 @@ def when_not_none(value: Union[T, None], to_run: Callable[[T], U]) -> Union[U, N
 		return to_run(value)
 
 
+def weekdays_to_mask(weekdays: Iterable[int]) -> int:
+	"""Turn a list of weekdays into a bitmask.
+
+	Args:
+		weekdays (Iterable[int]): The weekdays. Monday is 0, Sunday is 6.
+
+	Returns:
+		int: The bitmask, where bit n is set when weekday n is selected.
+	"""
+	mask = 0
+	for weekday in weekdays:
+		mask |= 1 << weekday
+	return mask
+
+
+def mask_to_weekdays(mask: int) -> List[int]:
+	"""Turn a bitmask into a sorted list of weekdays.
+
+	Args:
+		mask (int): The bitmask, where bit n is set when weekday n is selected.
+
+	Returns:
+		List[int]: The weekdays. Monday is 0, Sunday is 6.
+	"""
+	return [weekday for weekday in range(7) if mask >> weekday & 1]
+
+
 class Singleton(type):
 	_instances = {}
 	def __call__(cls, *args, **kwargs):
@@ -88,19 +130,23 @@ class BaseEnum(Enum):
 
 
 class TimelessSortingMethod(BaseEnum):
-	TITLE = (lambda r: (r['title'], r['text'], r['color']), False)
-	TITLE_REVERSED = (lambda r: (r['title'], r['text'], r['color']), True)
-	DATE_ADDED = (lambda r: r['id'], False)
-	DATE_ADDED_REVERSED = (lambda r: r['id'], True)
+	"""The columns to sort on, ending with a unique one, and whether to sort
+	descending"""
+	TITLE = (('title', 'id'), False)
+	TITLE_REVERSED = (('title', 'id'), True)
+	DATE_ADDED = (('id',), False)
+	DATE_ADDED_REVERSED = (('id',), True)
 
 
 class SortingMethod(BaseEnum):
-	TIME = (lambda r: (r['time'], r['title'], r['text'], r['color']), False)
-	TIME_REVERSED = (lambda r: (r['time'], r['title'], r['text'], r['color']), True)
-	TITLE = (lambda r: (r['title'], r['time'], r['text'], r['color']), False)
-	TITLE_REVERSED = (lambda r: (r['title'], r['time'], r['text'], r['color']), True)
-	DATE_ADDED = (lambda r: r['id'], False)
-	DATE_ADDED_REVERSED = (lambda r: r['id'], True)
+	"""The columns to sort on, ending with a unique one, and whether to sort
+	descending"""
+	TIME = (('time', 'title', 'id'), False)
+	TIME_REVERSED = (('time', 'title', 'id'), True)
+	TITLE = (('title', 'time', 'id'), False)
+	TITLE_REVERSED = (('title', 'time', 'id'), True)
+	DATE_ADDED = (('id',), False)
+	DATE_ADDED_REVERSED = (('id',), True)
 
 
 class RepeatQuantity(BaseEnum):
@@ -111,6 +157,17 @@ class RepeatQuantity(BaseEnum):
 	HOURS = "hours"
 	MINUTES = "minutes"
 
+class MissedReminderPolicy(BaseEnum):
+	EACH = "each"
+	COLLAPSE = "collapse"
+	SKIP = "skip"
+
+class DatabaseProfile(BaseEnum):
+	DURABLE = "durable"
+	BALANCED = "balanced"
+	FAST = "fast"
+	CUSTOM = "custom"
+
 class RestartVars(BaseEnum):
 	DB_IMPORT = "db_import"
 	HOST_CHANGE = "host_change"
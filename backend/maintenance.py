@@ -0,0 +1,165 @@
+#-*- coding: utf-8 -*-
+
+"""
+Regular maintenance of the database
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, time as dt_time, timedelta
+from threading import Condition, Lock, Thread
+from time import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Union
+
+from backend.db import maintain_db
+from backend.helpers import Singleton
+from backend.logging import LOGGER
+from backend.settings import get_setting
+
+if TYPE_CHECKING:
+	from flask.ctx import AppContext
+
+MAX_MAINTENANCE_WAIT = 900.0
+"Max seconds to wait before checking the clock again, in case it jumped"
+
+
+def _next_run(hour: int, now: float) -> float:
+	"""Get the next time that it's the start of the given hour in the local
+	time of the server.
+
+	On the day that the clock is set forward over the hour, it's the same
+	amount of time after the switch instead (e.g. 03:00 for 02:00). On the
+	day that the hour happens twice, it's the first time.
+
+	Args:
+		hour (int): The hour of the day.
+		now (float): The UTC epoch timestamp to start from.
+
+	Returns:
+		float: The UTC epoch timestamp of the start of the hour after `now`.
+	"""
+	day = datetime.fromtimestamp(now).date()
+	while True:
+		run = datetime.combine(day, dt_time(hour)).timestamp()
+		if run > now:
+			return run
+		day += timedelta(days=1)
+
+
+class MaintenanceHandler(metaclass=Singleton):
+	"""Run the database maintenance every day, at the hour of the
+	`database_maintenance_hour` setting in the local time of the server.
+
+	Note: Singleton.
+	"""
+	def __init__(
+		self,
+		context: Callable[[], AppContext]
+	) -> None:
+		"""Create instance of handler.
+
+		Args:
+			context (Callable[[], AppContext]): `Flask.app_context`.
+		"""
+		self.context = context
+		self.condition = Condition()
+		self.lock = Lock()
+		self.thread: Union[Thread, None] = None
+		self.running = False
+		self.woken = False
+
+		self.hour: Union[int, None] = None
+		self.next_run: Union[float, None] = None
+		self.last_run: Union[Dict[str, Any], None] = None
+		"The result of the last maintenance"
+		return
+
+	def run(self) -> Dict[str, Any]:
+		"""Run the maintenance now. Requires app context.
+
+		Returns:
+			Dict[str, Any]: The result of `backend.db.maintain_db()`.
+		"""
+		with self.lock:
+			self.last_run = maintain_db()
+		return self.last_run
+
+	def get_status(self) -> Dict[str, Any]:
+		"""Get when the maintenance runs next and the result of the last time
+		that it ran.
+
+		Returns:
+			Dict[str, Any]: The next time as a UTC epoch timestamp, and the
+			result of the last maintenance, or `None` if it hasn't run yet.
+		"""
+		return {
+			'next_run': self.next_run and round(self.next_run),
+			'last_run': self.last_run
+		}
+
+	def wake(self) -> None:
+		"""Let the handler read the maintenance hour setting again.
+		"""
+		with self.condition:
+			self.woken = True
+			self.condition.notify()
+		return
+
+	def __dispatch(self) -> None:
+		"""Wait for the maintenance hour and run the maintenance, until
+		stopped. Intended to be run in a thread.
+		"""
+		while True:
+			with self.context():
+				hour = get_setting('database_maintenance_hour')
+
+			now = time()
+			if hour != self.hour or self.next_run is None:
+				self.hour = hour
+				self.next_run = _next_run(hour, now)
+
+			if now >= self.next_run:
+				try:
+					with self.context():
+						self.run()
+				except Exception:
+					LOGGER.exception('Failed to run database maintenance')
+				self.next_run = _next_run(hour, time())
+
+			with self.condition:
+				if not self.running:
+					return
+
+				delay = self.next_run - time()
+				if delay > 0 and not self.woken:
+					self.condition.wait(min(delay, MAX_MAINTENANCE_WAIT))
+				self.woken = False
+
+				if not self.running:
+					return
+
+	def start_handling(self) -> None:
+		"""Start the thread that runs the maintenance
+		"""
+		with self.condition:
+			self.running = True
+
+		self.thread = Thread(
+			target=self.__dispatch,
+			name="MaintenanceHandler",
+			daemon=True
+		)
+		self.thread.start()
+		return
+
+	def stop_handling(self) -> None:
+		"""Stop the thread that runs the maintenance
+		"""
+		with self.condition:
+			self.running = False
+			self.condition.notify()
+
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+		return
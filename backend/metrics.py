@@ -0,0 +1,383 @@
+#-*- coding: utf-8 -*-
+
+"""
+In-memory counters and histograms about the performance of MIND
+"""
+
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from typing import Deque, Dict, List, Tuple, Union
+
+
+class Counter:
+	"""A value per combination of labels that only goes up
+	"""
+	type = 'counter'
+
+	def __init__(
+		self,
+		name: str,
+		description: str,
+		labels: Tuple[str, ...] = ()
+	) -> None:
+		"""Create a counter.
+
+		Args:
+			name (str): The name of the counter.
+			description (str): What the counter counts.
+			labels (Tuple[str, ...], optional): The names of the labels.
+				Defaults to ().
+		"""
+		self.name = name
+		self.description = description
+		self.labels = labels
+		self.lock = Lock()
+		self.values: Dict[Tuple[str, ...], int] = {}
+		METRICS.append(self)
+		return
+
+	def increase(self, *labels: str, amount: int = 1) -> None:
+		"""Increase the counter.
+
+		Args:
+			*labels (str): The value of each label.
+			amount (int, optional): How much to increase the counter by.
+				Defaults to 1.
+		"""
+		with self.lock:
+			self.values[labels] = self.values.get(labels, 0) + amount
+		return
+
+	def get(self) -> List[dict]:
+		"""Get the values of the counter.
+
+		Returns:
+			List[dict]: The value per combination of labels.
+		"""
+		with self.lock:
+			return [
+				{
+					'labels': dict(zip(self.labels, labels)),
+					'value': value
+				}
+				for labels, value in self.values.items()
+			]
+
+
+class Gauge:
+	"""A value per combination of labels that can go up and down
+	"""
+	type = 'gauge'
+
+	def __init__(
+		self,
+		name: str,
+		description: str,
+		labels: Tuple[str, ...] = ()
+	) -> None:
+		"""Create a gauge.
+
+		Args:
+			name (str): The name of the gauge.
+			description (str): What the gauge measures.
+			labels (Tuple[str, ...], optional): The names of the labels.
+				Defaults to ().
+		"""
+		self.name = name
+		self.description = description
+		self.labels = labels
+		self.lock = Lock()
+		self.values: Dict[Tuple[str, ...], float] = {}
+		METRICS.append(self)
+		return
+
+	def set(self, value: float, *labels: str) -> None:
+		"""Set the value of the gauge.
+
+		Args:
+			value (float): The new value.
+			*labels (str): The value of each label.
+		"""
+		with self.lock:
+			self.values[labels] = value
+		return
+
+	def get(self) -> List[dict]:
+		"""Get the values of the gauge.
+
+		Returns:
+			List[dict]: The value per combination of labels.
+		"""
+		with self.lock:
+			return [
+				{
+					'labels': dict(zip(self.labels, labels)),
+					'value': value
+				}
+				for labels, value in self.values.items()
+			]
+
+
+class Histogram:
+	"""The distribution of observed values per combination of labels
+	"""
+	type = 'histogram'
+
+	def __init__(
+		self,
+		name: str,
+		description: str,
+		buckets: Tuple[float, ...],
+		labels: Tuple[str, ...] = ()
+	) -> None:
+		"""Create a histogram.
+
+		Args:
+			name (str): The name of the histogram.
+			description (str): What the histogram measures.
+			buckets (Tuple[float, ...]): The upper bounds of the buckets,
+			sorted ascending. A bucket for everything above is added.
+			labels (Tuple[str, ...], optional): The names of the labels.
+				Defaults to ().
+		"""
+		self.name = name
+		self.description = description
+		self.buckets = buckets
+		self.labels = labels
+		self.lock = Lock()
+		self.values: Dict[Tuple[str, ...], dict] = {}
+		METRICS.append(self)
+		return
+
+	def observe(self, value: float, *labels: str) -> None:
+		"""Add a value to the histogram.
+
+		Args:
+			value (float): The observed value.
+			*labels (str): The value of each label.
+		"""
+		bucket = bisect_left(self.buckets, value)
+		with self.lock:
+			entry = self.values.get(labels)
+			if entry is None:
+				entry = self.values[labels] = {
+					'buckets': [0] * (len(self.buckets) + 1),
+					'count': 0,
+					'sum': 0.0,
+					'max': value
+				}
+			entry['buckets'][bucket] += 1
+			entry['count'] += 1
+			entry['sum'] += value
+			entry['max'] = max(entry['max'], value)
+		return
+
+	def get(self) -> List[dict]:
+		"""Get the values of the histogram.
+
+		Returns:
+			List[dict]: The distribution per combination of labels. The
+			buckets are cumulative, like in Prometheus: the count is the
+			amount of values less than or equal to the upper bound ('le').
+		"""
+		bounds = [*self.buckets, '+Inf']
+		result = []
+		with self.lock:
+			for labels, entry in self.values.items():
+				buckets = []
+				total = 0
+				for bound, count in zip(bounds, entry['buckets']):
+					total += count
+					buckets.append({'le': bound, 'count': total})
+
+				result.append({
+					'labels': dict(zip(self.labels, labels)),
+					'buckets': buckets,
+					'count': entry['count'],
+					'sum': entry['sum'],
+					'max': entry['max']
+				})
+		return result
+
+
+class QueryStats:
+	"""The duration of database queries, per calling function and statement,
+	and the most recent slow queries
+	"""
+	OTHER = ('', 'Other statements')
+	"Where statements are counted once the max amount of statements is reached"
+
+	def __init__(self, slow_query_count: int, max_statements: int) -> None:
+		"""Create the statistics.
+
+		Args:
+			slow_query_count (int): The amount of slow queries to remember.
+			max_statements (int): The max amount of statements to keep stats
+			of separately.
+		"""
+		self.max_statements = max_statements
+		self.lock = Lock()
+		self.statements: Dict[Tuple[str, str], List[float]] = {}
+		self.slow_queries: Deque[dict] = deque(maxlen=slow_query_count)
+		self.since = datetime.utcnow().timestamp()
+		return
+
+	def observe(self, caller: str, sql: str, duration: float) -> None:
+		"""Add the duration of a query.
+
+		Args:
+			caller (str): The function that ran the query.
+			sql (str): The statement.
+			duration (float): How long the query took, in seconds.
+		"""
+		with self.lock:
+			key = (caller, sql)
+			entry = self.statements.get(key)
+			if entry is None and len(self.statements) >= self.max_statements:
+				key = self.OTHER
+				entry = self.statements.get(key)
+
+			if entry is None:
+				self.statements[key] = [1, duration, duration]
+			else:
+				entry[0] += 1
+				entry[1] += duration
+				if duration > entry[2]:
+					entry[2] = duration
+		return
+
+	def add_slow_query(
+		self,
+		caller: str,
+		sql: str,
+		duration: float,
+		plan: Union[List[str], None]
+	) -> None:
+		"""Remember a slow query.
+
+		Args:
+			caller (str): The function that ran the query.
+			sql (str): The statement.
+			duration (float): How long the query took, in seconds.
+			plan (Union[List[str], None]): The steps of the query plan, if
+			known.
+		"""
+		with self.lock:
+			self.slow_queries.append({
+				'time': datetime.utcnow().timestamp(),
+				'caller': caller,
+				'statement': sql,
+				'duration': duration,
+				'plan': plan
+			})
+		return
+
+	def get(self) -> dict:
+		"""Get the statistics.
+
+		Returns:
+			dict: The stats per statement, sorted on total duration, and the
+			most recent slow queries, newest first.
+		"""
+		with self.lock:
+			statements = [
+				{
+					'caller': caller,
+					'statement': sql,
+					'count': count,
+					'total': total,
+					'average': total / count,
+					'max': max_duration
+				}
+				for (caller, sql), (count, total, max_duration)
+					in self.statements.items()
+			]
+			slow_queries = list(reversed(self.slow_queries))
+
+		statements.sort(key=lambda s: s['total'], reverse=True)
+		return {
+			'since': self.since,
+			'statements': statements,
+			'slow_queries': slow_queries
+		}
+
+	def clear(self) -> None:
+		"""Reset the statistics.
+		"""
+		with self.lock:
+			self.statements.clear()
+			self.slow_queries.clear()
+			self.since = datetime.utcnow().timestamp()
+		return
+
+
+METRICS: List[Union[Counter, Gauge, Histogram]] = []
+STARTED = datetime.utcnow().timestamp()
+
+REMINDER_FIRE_LAG = Histogram(
+	'reminder_fire_lag_seconds',
+	'How late reminders are triggered compared to their time',
+	(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 3600)
+)
+REMINDER_BATCH_SIZE = Histogram(
+	'reminder_batch_size',
+	'The amount of reminders that are triggered at once',
+	(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+REMINDER_TRIGGER_DURATION = Histogram(
+	'reminder_trigger_duration_seconds',
+	'How long it takes to trigger a batch of reminders',
+	(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+NOTIFICATION_SEND_DURATION = Histogram(
+	'notification_send_duration_seconds',
+	'How long it takes to send a notification, per type of service',
+	(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+	('service',)
+)
+NOTIFICATIONS_SENT = Counter(
+	'notifications_sent_total',
+	'The amount of notifications sent, per type of service and outcome',
+	('service', 'outcome')
+)
+
+DB_POOL_WAIT = Histogram(
+	'db_pool_wait_seconds',
+	'How long it takes to get a database connection from a pool',
+	(0.0001, 0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 20),
+	('pool',)
+)
+DB_POOL_CONNECTIONS = Gauge(
+	'db_pool_connections',
+	'The amount of database connections per pool and state (in use or '
+	+ 'idle), and the max amount',
+	('pool', 'state')
+)
+DB_POOL_TIMEOUTS = Counter(
+	'db_pool_timeouts_total',
+	'The amount of times no database connection became available in time',
+	('pool',)
+)
+
+QUERY_STATS = QueryStats(100, 1000)
+
+
+def get_metrics() -> dict:
+	"""Get the values of all metrics.
+
+	Returns:
+		dict: The metrics, and since when they're measured.
+	"""
+	return {
+		'since': STARTED,
+		'metrics': {
+			m.name: {
+				'type': m.type,
+				'description': m.description,
+				'values': m.get()
+			}
+			for m in METRICS
+		}
+	}
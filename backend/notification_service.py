@@ -196,7 +196,7 @@ class NotificationService:
 			dict: The info about the notification service
 		"""		
 		result = dict(get_db(dict).execute("""
-			SELECT id, title, url
+			SELECT id, title, url, rate_limit
 			FROM notification_services
 			WHERE id = ?
 			LIMIT 1
@@ -209,24 +209,27 @@ class NotificationService:
 	def update(
 		self,
 		title: Optional[str] = None,
-		url: Optional[str] = None
+		url: Optional[str] = None,
+		rate_limit: Optional[int] = None
 	) -> dict:
 		"""Edit the notification service
 
 		Args:
 			title (Optional[str], optional): The new title of the service. Defaults to None.
 			url (Optional[str], optional): The new url of the service. Defaults to None.
+			rate_limit (Optional[int], optional): The new max amount of notifications per minute. 0 for no limit. Defaults to None.
 
 		Returns:
 			dict: The new info about the service
 		"""	
-		LOGGER.info(f'Updating notification service {self.id}: {title=}, {url=}')
+		LOGGER.info(f'Updating notification service {self.id}: {title=}, {url=}, {rate_limit=}')
 
 		# Get current data and update it with new values
 		data = self.get()
 		new_values = {
 			'title': title,
-			'url': url
+			'url': url,
+			'rate_limit': rate_limit
 		}
 		for k, v in new_values.items():
 			if v is not None:
@@ -235,12 +238,13 @@ class NotificationService:
 		# Update database
 		get_db().execute("""
 			UPDATE notification_services
-			SET title = ?, url = ?
+			SET title = ?, url = ?, rate_limit = ?
 			WHERE id = ?;
 			""",
 			(
 				data["title"],
 				data["url"],
+				data["rate_limit"],
 				self.id
 			)
 		)
@@ -346,7 +350,7 @@ class NotificationServices:
 		"""		
 		result = list(map(dict, get_db(dict).execute("""
 			SELECT
-				id, title, url
+				id, title, url, rate_limit
 			FROM notification_services
 			WHERE user_id = ?
 			ORDER BY title, id;
@@ -367,23 +371,29 @@ class NotificationServices:
 		"""		
 		return NotificationService(self.user_id, notification_service_id)
 		
-	def add(self, title: str, url: str) -> NotificationService:
+	def add(
+		self,
+		title: str,
+		url: str,
+		rate_limit: int = 0
+	) -> NotificationService:
 		"""Add a notification service
 
 		Args:
 			title (str): The title of the service
 			url (str): The apprise url of the service
+			rate_limit (int, optional): The max amount of notifications per minute. 0 for no limit. Defaults to 0.
 
 		Returns:
 			NotificationService: The instance representing the new service
 		"""	
-		LOGGER.info(f'Adding notification service with {title=}, {url=}')
+		LOGGER.info(f'Adding notification service with {title=}, {url=}, {rate_limit=}')
 
 		new_id = get_db().execute("""
-			INSERT INTO notification_services(user_id, title, url)
-			VALUES (?,?,?)
+			INSERT INTO notification_services(user_id, title, url, rate_limit)
+			VALUES (?,?,?,?)
 			""",
-			(self.user_id, title, url)
+			(self.user_id, title, url, rate_limit)
 		).lastrowid
 
 		return self.fetchone(new_id)
@@ -0,0 +1,570 @@
+#-*- coding: utf-8 -*-
+
+"""
+Persistent queue of notifications that still need to be delivered
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from threading import Condition, Thread
+from time import monotonic, perf_counter
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Tuple, Union
+
+from apprise import Apprise
+
+from backend.db import get_db
+from backend.helpers import Singleton
+from backend.logging import LOGGER
+from backend.metrics import NOTIFICATION_SEND_DURATION, NOTIFICATIONS_SENT
+from backend.settings import get_setting
+
+if TYPE_CHECKING:
+	from flask.ctx import AppContext
+
+MAX_ATTEMPTS = 5
+"How often sending a notification is tried before giving up"
+BACKOFF_BASE = 30
+"Seconds to wait before the first retry. Doubles with every next retry."
+BACKOFF_MAX = 3600
+"Max seconds to wait before retrying"
+RATE_LIMIT_BURST = 5
+"How many notifications a rate limited service may send in quick succession"
+
+
+def send_notification(
+	url: str,
+	title: str,
+	text: str,
+	timeout: int
+) -> bool:
+	"""Send a notification to an Apprise URL.
+
+	Args:
+		url (str): The Apprise URL to send the notification to.
+		title (str): The title of the notification.
+		text (str): The body of the notification.
+		timeout (int): The connect and read timeout, in seconds.
+
+	Returns:
+		bool: Whether or not sending the notification succeeded.
+	"""
+	a = Apprise()
+	a.add(url)
+	for service in a:
+		service.socket_connect_timeout = timeout
+		service.socket_read_timeout = timeout
+	return a.notify(title=title, body=text or '\u200B')
+
+
+def get_deliveries() -> List[dict]:
+	"""Get all deliveries that have failed at least once.
+
+	Returns:
+		List[dict]: The info about the deliveries.
+	"""
+	result = [
+		dict(d)
+		for d in get_db(dict).execute("""
+			SELECT
+				o.id, o.reminder_id,
+				u.username,
+				ns.title AS notification_service,
+				o.title,
+				o.attempts, o.failed,
+				o.last_attempt, o.last_error,
+				o.next_attempt,
+				o.created
+			FROM outbox o
+			INNER JOIN notification_services ns
+			ON o.notification_service_id = ns.id
+			INNER JOIN users u
+			ON ns.user_id = u.id
+			WHERE o.attempts > 0
+			ORDER BY o.created, o.id;
+		""")
+	]
+	for d in result:
+		d['failed'] = d['failed'] == 1
+	return result
+
+
+def retry_failed_deliveries() -> None:
+	"""Try sending all deliveries again that have exceeded the max amount of
+	attempts.
+	"""
+	LOGGER.info('Retrying failed deliveries')
+	cursor = get_db()
+	cursor.execute("""
+		UPDATE outbox
+		SET
+			failed = 0,
+			attempts = 0,
+			next_attempt = ?
+		WHERE failed = 1;
+		""",
+		(int(datetime.utcnow().timestamp()),)
+	)
+	# The handler uses its own connection, so it has to see the change
+	cursor.connection.commit()
+	DeliveryHandler().wake()
+	return
+
+
+def delete_failed_deliveries() -> None:
+	"""Delete all deliveries that have exceeded the max amount of attempts.
+	"""
+	LOGGER.info('Deleting failed deliveries')
+	get_db().execute("DELETE FROM outbox WHERE failed = 1;")
+	return
+
+
+def get_delivery_queue() -> List[dict]:
+	"""Get the amount of deliveries per notification service that are due but
+	not sent yet, because they're held back by a rate limit or because all
+	workers are busy.
+
+	Returns:
+		List[dict]: The queue depth per notification service.
+	"""
+	result = [
+		dict(q)
+		for q in get_db(dict).execute("""
+			SELECT
+				ns.id AS notification_service_id,
+				ns.title AS notification_service,
+				u.username,
+				ns.rate_limit,
+				COUNT(*) AS queued
+			FROM outbox o
+			INNER JOIN notification_services ns
+			ON o.notification_service_id = ns.id
+			INNER JOIN users u
+			ON ns.user_id = u.id
+			WHERE
+				o.failed = 0
+				AND o.next_attempt <= ?
+			GROUP BY ns.id
+			ORDER BY queued DESC, ns.id;
+			""",
+			(int(datetime.utcnow().timestamp()),)
+		)
+	]
+	return result
+
+
+class TokenBucket:
+	"""Rate limiter that allows a certain amount of actions per minute, with
+	short bursts.
+	"""
+	def __init__(self, rate: int) -> None:
+		"""Create a rate limiter.
+
+		Args:
+			rate (int): The amount of actions allowed per minute.
+		"""
+		self.rate = rate
+		self.capacity = min(RATE_LIMIT_BURST, rate)
+		self.tokens = float(self.capacity)
+		self.updated = monotonic()
+		return
+
+	def __refill(self) -> None:
+		"""Add the tokens that were earned since the last update.
+		"""
+		now = monotonic()
+		self.tokens = min(
+			self.capacity,
+			self.tokens + (now - self.updated) * self.rate / 60
+		)
+		self.updated = now
+		return
+
+	def take(self) -> bool:
+		"""Try to do an action.
+
+		Returns:
+			bool: Whether or not the action is allowed now.
+		"""
+		self.__refill()
+		if self.tokens >= 1:
+			self.tokens -= 1
+			return True
+		return False
+
+	def wait_time(self) -> float:
+		"""Get how long to wait until the next action is allowed.
+
+		Returns:
+			float: The amount of seconds.
+		"""
+		self.__refill()
+		return max(0.0, (1 - self.tokens) * 60 / self.rate)
+
+
+class DeliveryHandler(metaclass=Singleton):
+	"""Deliver the notifications in the outbox.
+
+	Notifications are sent by a pool of workers. When sending fails, it's
+	retried with exponential backoff up to `MAX_ATTEMPTS` times. Services
+	with a rate limit get a token bucket; notifications that exceed the limit
+	stay in the outbox until the bucket allows them.
+
+	Note: Singleton.
+	"""
+	def __init__(
+		self,
+		context: Callable[[], AppContext]
+	) -> None:
+		"""Create instance of handler.
+
+		Args:
+			context (Callable[[], AppContext]): `Flask.app_context`.
+		"""
+		self.context = context
+		self.condition = Condition()
+		self.thread: Union[Thread, None] = None
+		self.executor: Union[ThreadPoolExecutor, None] = None
+		self.executor_workers = 0
+		self.running = False
+		self.woken = False
+
+		self.in_flight: Set[int] = set()
+		"ID's of the deliveries that are being sent"
+
+		self.results: List[Tuple[int, Union[str, None]]] = []
+		"Finished deliveries with their error, or `None` if successful"
+
+		self.buckets: Dict[int, TokenBucket] = {}
+		"The rate limiter of each notification service that has a rate limit"
+		return
+
+	def wake(self) -> None:
+		"""Let the handler check the outbox for new deliveries.
+		"""
+		with self.condition:
+			self.woken = True
+			self.condition.notify()
+		return
+
+	def __get_executor(self, workers: int) -> ThreadPoolExecutor:
+		"""Get the pool that sends the notifications, resizing it if the
+		setting changed.
+
+		Args:
+			workers (int): The desired amount of worker threads.
+
+		Returns:
+			ThreadPoolExecutor: The pool.
+		"""
+		if self.executor is None or self.executor_workers != workers:
+			if self.executor is not None:
+				self.executor.shutdown(wait=False)
+			self.executor = ThreadPoolExecutor(
+				max_workers=workers,
+				thread_name_prefix="DeliverySender"
+			)
+			self.executor_workers = workers
+		return self.executor
+
+	@staticmethod
+	def _deliver(
+		url: str,
+		title: str,
+		text: str,
+		timeout: int
+	) -> bool:
+		"""Send a notification and record how long it took and whether it
+		succeeded. Intended to be run in a worker thread.
+
+		Args:
+			url (str): The Apprise URL to send the notification to.
+			title (str): The title of the notification.
+			text (str): The body of the notification.
+			timeout (int): The connect and read timeout, in seconds.
+
+		Returns:
+			bool: Whether or not sending the notification succeeded.
+		"""
+		service = url.split('://', 1)[0].lower()
+		start = perf_counter()
+		try:
+			success = send_notification(url, title, text, timeout)
+
+		except Exception:
+			NOTIFICATIONS_SENT.increase(service, 'error')
+			raise
+
+		finally:
+			NOTIFICATION_SEND_DURATION.observe(perf_counter() - start, service)
+
+		NOTIFICATIONS_SENT.increase(service, 'success' if success else 'failure')
+		return success
+
+	def __on_done(self, delivery_id: int, future: Future) -> None:
+		"""Register the result of sending a delivery.
+
+		Args:
+			delivery_id (int): The ID of the delivery.
+			future (Future): The future of the send.
+		"""
+		try:
+			error = (
+				None
+				if future.result() else
+				'The notification service reported a failure'
+			)
+		except Exception as e:
+			error = f'{type(e).__name__}: {e}'
+
+		with self.condition:
+			self.results.append((delivery_id, error))
+			self.condition.notify()
+		return
+
+	def __process_results(
+		self,
+		results: List[Tuple[int, Union[str, None]]],
+		now: int
+	) -> None:
+		"""Remove sent deliveries from the outbox and schedule retries for the
+		failed ones.
+
+		Args:
+			results (List[Tuple[int, Union[str, None]]]): The finished
+			deliveries.
+			now (int): The current UTC epoch timestamp.
+		"""
+		cursor = get_db()
+		failed = [(i, error) for i, error in results if error is not None]
+		try:
+			cursor.executemany(
+				"DELETE FROM outbox WHERE id = ?;",
+				((i,) for i, error in results if error is None)
+			)
+			cursor.executemany("""
+				UPDATE outbox
+				SET
+					attempts = attempts + 1,
+					failed = attempts + 1 >= ?,
+					last_attempt = ?,
+					last_error = ?,
+					next_attempt = ? + MIN(?, ? << attempts)
+				WHERE id = ?;
+				""",
+				(
+					(MAX_ATTEMPTS, now, error, now, BACKOFF_MAX, BACKOFF_BASE, i)
+					for i, error in failed
+				)
+			)
+
+		except BaseException:
+			# Either all results are processed or none are, so that they can
+			# be processed again
+			cursor.connection.rollback()
+			raise
+
+		for i, error in failed:
+			LOGGER.warning(f'Failed to send delivery {i}: {error}')
+
+		with self.condition:
+			self.in_flight.difference_update(i for i, _ in results)
+		return
+
+	def __take_token(self, service_id: int, rate_limit: int) -> bool:
+		"""Try to get permission to send a notification using a service,
+		according to the rate limit of the service.
+
+		Args:
+			service_id (int): The ID of the notification service.
+			rate_limit (int): The rate limit of the service. 0 for no limit.
+
+		Returns:
+			bool: Whether or not the notification can be sent now.
+		"""
+		if not rate_limit:
+			self.buckets.pop(service_id, None)
+			return True
+
+		bucket = self.buckets.get(service_id)
+		if bucket is None or bucket.rate != rate_limit:
+			bucket = self.buckets[service_id] = TokenBucket(rate_limit)
+
+		return bucket.take()
+
+	def __claim_deliveries(self, now: int) -> Union[float, None]:
+		"""Submit due deliveries to the workers, as far as the rate limits of
+		the notification services allow it.
+
+		Args:
+			now (int): The current UTC epoch timestamp.
+
+		Returns:
+			Union[float, None]: The time of the soonest delivery that isn't
+			being sent and isn't held back by a rate limit, or `None` if there
+			are none or all workers are busy.
+		"""
+		workers = get_setting('notification_workers')
+		timeout = get_setting('notification_timeout')
+		executor = self.__get_executor(workers)
+		cursor = get_db(dict)
+
+		with self.condition:
+			in_flight = list(self.in_flight)
+
+		free_workers = workers - len(in_flight)
+		if free_workers <= 0:
+			return None
+
+		deliveries = []
+		# Services that hit their rate limit, with the seconds until they can
+		# send again
+		throttled: Dict[int, float] = {}
+		while len(deliveries) < free_workers:
+			skip = [*in_flight, *(d['id'] for d in deliveries)]
+			rows = cursor.execute(f"""
+				SELECT
+					o.id, o.notification_service_id,
+					o.title, o.text,
+					ns.url, ns.rate_limit
+				FROM outbox o
+				INNER JOIN notification_services ns
+				ON o.notification_service_id = ns.id
+				WHERE
+					o.failed = 0
+					AND o.next_attempt <= ?
+					AND o.id NOT IN ({','.join('?' * len(skip))})
+					AND o.notification_service_id
+						NOT IN ({','.join('?' * len(throttled))})
+				ORDER BY o.next_attempt
+				LIMIT ?;
+				""",
+				(now, *skip, *throttled, free_workers - len(deliveries))
+			).fetchall()
+			if not rows:
+				break
+
+			for d in rows:
+				service_id = d['notification_service_id']
+				if service_id in throttled:
+					continue
+
+				if self.__take_token(service_id, d['rate_limit']):
+					deliveries.append(d)
+				else:
+					throttled[service_id] = self.buckets[service_id].wait_time()
+
+		# Don't let the delivery be picked up again while it's being sent,
+		# also not when MIND stops while sending.
+		lease = now + max(60, timeout * 3)
+		cursor.executemany(
+			"UPDATE outbox SET next_attempt = ? WHERE id = ?;",
+			((lease, d['id']) for d in deliveries)
+		)
+
+		for d in deliveries:
+			with self.condition:
+				self.in_flight.add(d['id'])
+			future = executor.submit(
+				self._deliver,
+				d['url'], d['title'], d['text'], timeout
+			)
+			future.add_done_callback(
+				lambda f, i=d['id']: self.__on_done(i, f)
+			)
+
+		if len(deliveries) == free_workers:
+			return None
+
+		next_attempt = cursor.execute(f"""
+			SELECT MIN(next_attempt)
+			FROM outbox
+			WHERE
+				failed = 0
+				AND notification_service_id
+					NOT IN ({','.join('?' * len(throttled))});
+			""",
+			tuple(throttled)
+		).fetchone()[0]
+
+		if throttled:
+			next_token = datetime.utcnow().timestamp() + min(throttled.values())
+			if next_attempt is None or next_token < next_attempt:
+				next_attempt = next_token
+
+		return next_attempt
+
+	def __dispatch(self) -> None:
+		"""Send due deliveries and process the results, until stopped.
+		Intended to be run in a thread.
+		"""
+		while True:
+			with self.condition:
+				if not self.running:
+					return
+				results, self.results = self.results, []
+				self.woken = False
+
+			failed = False
+			try:
+				with self.context():
+					now = int(datetime.utcnow().timestamp())
+					try:
+						self.__process_results(results, now)
+					except Exception:
+						# The deliveries stay claimed until their results
+						# are stored, so keep the results for the next try
+						with self.condition:
+							self.results[:0] = results
+						raise
+
+					next_attempt = self.__claim_deliveries(now)
+
+			except Exception:
+				LOGGER.exception('Failed to handle deliveries')
+				failed = True
+				next_attempt = int(datetime.utcnow().timestamp()) + BACKOFF_BASE
+
+			with self.condition:
+				if (
+					self.running
+					and (failed or not self.results)
+					and not self.woken
+				):
+					if next_attempt is None:
+						self.condition.wait()
+					else:
+						delay = next_attempt - datetime.utcnow().timestamp()
+						if delay > 0:
+							self.condition.wait(delay)
+
+	def start_handling(self) -> None:
+		"""Start the thread that handles the deliveries
+		"""
+		with self.condition:
+			self.running = True
+
+		self.thread = Thread(
+			target=self.__dispatch,
+			name="DeliveryHandler",
+			daemon=True
+		)
+		self.thread.start()
+		return
+
+	def stop_handling(self) -> None:
+		"""Stop the thread that handles the deliveries
+		"""
+		with self.condition:
+			self.running = False
+			self.condition.notify()
+
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+
+		if self.executor is not None:
+			self.executor.shutdown(wait=False)
+			self.executor = None
+		return
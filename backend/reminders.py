@@ -2,55 +2,129 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+from calendar import isleap, monthrange
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from heapq import heapify, heappop, heappush
+from math import gcd
 from sqlite3 import IntegrityError
-from threading import Timer
-from typing import TYPE_CHECKING, Callable, List, Optional, Tuple, Union
+from threading import Condition, Thread, local
+from time import monotonic, perf_counter
+from typing import (TYPE_CHECKING, Callable, Dict, Iterator, List, Tuple,
+                    Union)
 
 from apprise import Apprise
-from dateutil.relativedelta import relativedelta
-from dateutil.relativedelta import weekday as du_weekday
 
 from backend.custom_exceptions import (InvalidKeyValue, InvalidTime,
                                        NotificationServiceNotFound,
                                        ReminderNotFound)
-from backend.db import get_db
-from backend.helpers import (RepeatQuantity, Singleton, SortingMethod,
-                             search_filter, when_not_none)
+from backend.db import get_db, get_page_sql
+from backend.helpers import (MissedReminderPolicy, RepeatQuantity, Singleton,
+                             SortingMethod, ids_from_concat, search_filter,
+                             when_not_none)
 from backend.logging import LOGGER
+from backend.metrics import (REMINDER_BATCH_SIZE, REMINDER_FIRE_LAG,
+                             REMINDER_TRIGGER_DURATION)
+from backend.outbox import DeliveryHandler
+from backend.settings import get_setting
 
 if TYPE_CHECKING:
 	from flask.ctx import AppContext
 
-
-def __next_selected_day(
-	weekdays: List[int],
+CATCH_UP_BATCH_SIZE = 500
+"Amount of missed reminders that are handled per transaction on startup"
+MAX_QUERY_IDS = 500
+"Max amount of ID's passed to one query, to stay below the parameter limit"
+MAX_MISSED_OCCURRENCES = 100
+"Max amount of notifications sent for a repeating reminder that was missed"
+MAX_DISPATCH_WAIT = 60.0
+"Max amount of seconds the dispatcher sleeps before re-checking the clock"
+CLOCK_JUMP_THRESHOLD = 5.0
+"""Amount of seconds the wall clock may deviate from the monotonic clock
+during a wait before it's considered a clock jump"""
+
+_DAYS_TO_NEXT_WEEKDAY = tuple(
+	tuple(
+		# Rotate the mask so that the day after the weekday is the lowest bit,
+		# then find the lowest set bit
+		(lambda r: (r & -r).bit_length())(
+			(mask >> (weekday + 1) | mask << (6 - weekday)) & 0b1111111
+		)
+		for mask in range(128)
+	)
+	for weekday in range(7)
+)
+"""The amount of days from a weekday (first index) to the next weekday that is
+selected in a weekday mask (second index). Between 1 and 7, or 0 for an empty
+mask."""
+
+def __days_to_next_selected_day(
+	weekdays: int,
 	weekday: int
 ) -> int:
-	"""Find the next allowed day in the week.
+	"""Find the amount of days until the next allowed day in the week.
 
 	Args:
-		weekdays (List[int]): The days of the week that are allowed.
-		Monday is 0, Sunday is 6.
+		weekdays (int): The bitmask of the days of the week that are allowed.
+		Monday is bit 0, Sunday is bit 6.
 		weekday (int): The current weekday.
 
 	Returns:
-		int: The next allowed weekday.
+		int: The amount of days until the next allowed day, between 1 and 7.
 	"""
-	return (
-		# Get all days later than current, then grab first one.
-		[d for d in weekdays if weekday < d]
-		or
-		# weekday is last allowed day, so it should grab the first
-		# allowed day of the week.
-		weekdays
-	)[0]
+	return _DAYS_TO_NEXT_WEEKDAY[weekday][weekdays]
+
+def __clipped_day(
+	year_month: int,
+	day: int,
+	step: int,
+	steps: int
+) -> int:
+	"""Find the day of the month after adding a relativedelta of `step`
+	months `steps` times, one at a time. Every addition clips the day to the
+	last day of the month, and the clipped day is carried over to the next
+	addition (Jan 31 -> Feb 28 -> Mar 28).
+
+	Args:
+		year_month (int): The starting month as `year * 12 + month - 1`.
+		day (int): The starting day of the month.
+		step (int): The amount of months that is added each time.
+		steps (int): How often `step` is added.
+
+	Returns:
+		int: The day of the month.
+	"""
+	if day <= 28:
+		return day
+
+	# All months of the year that can be reached are reached within 12 steps
+	for k in range(1, min(steps, 12) + 1):
+		year, month = divmod(year_month + k * step, 12)
+		day = min(day, monthrange(year, month + 1)[1])
+
+	if day != 29 or steps <= 12:
+		return day
+
+	# Only a February in a common year can still clip the day further
+	period = 12 // gcd(step, 12)
+	for k in range(1, period + 1):
+		if (year_month + k * step) % 12 == 1:
+			break
+	else:
+		return day
+
+	for k in range(k, steps + 1, period):
+		if not isleap((year_month + k * step) // 12):
+			return 28
+
+	return day
 
 def _find_next_time(
 	original_time: int,
 	repeat_quantity: Union[RepeatQuantity, None],
 	repeat_interval: Union[int, None],
-	weekdays: Union[List[int], None]
+	weekdays: Union[int, None],
+	after: Union[int, None] = None
 ) -> int:
 	"""Calculate the next timestep based on original time and repeat/interval
 	values.
@@ -63,39 +137,81 @@ def _find_next_time(
 
 		repeat_interval (Union[int, None]): If set, the value of the repetition.
 
-		weekdays (Union[List[int], None]): If set, on which days the time can
-		continue. Monday is 0, Sunday is 6.
+		weekdays (Union[int, None]): If set, the bitmask of the days on which
+		the time can continue. Monday is bit 0, Sunday is bit 6.
+
+		after (Union[int, None], optional): The UTC epoch timestamp after which
+		the next timestep should be. `None` for the current time.
+			Defaults to None.
 
 	Returns:
-		int: The next timestamp in the future.
+		int: The next timestamp after `after`.
 	"""
-	if weekdays is not None:
-		weekdays.sort()
-
 	new_time = datetime.fromtimestamp(original_time)
-	current_time = datetime.fromtimestamp(datetime.utcnow().timestamp())
+	current_time = datetime.fromtimestamp(
+		after
+		if after is not None else
+		datetime.utcnow().timestamp()
+	)
+
+	if repeat_quantity in (RepeatQuantity.YEARS, RepeatQuantity.MONTHS):
+		step = repeat_interval
+		if repeat_quantity == RepeatQuantity.YEARS:
+			step *= 12
+
+		# Start at the first step that lands in the current month or later
+		year_month = new_time.year * 12 + new_time.month - 1
+		current_year_month = current_time.year * 12 + current_time.month - 1
+		steps = max(0, -((year_month - current_year_month) // step))
+
+		while True:
+			if steps == 0:
+				proposed_time = new_time
+			else:
+				year, month = divmod(year_month + steps * step, 12)
+				proposed_time = new_time.replace(
+					year=year,
+					month=month + 1,
+					day=__clipped_day(year_month, new_time.day, step, steps),
+					fold=0
+				)
+
+			if proposed_time > current_time:
+				break
+			steps += 1
 
-	if repeat_quantity is not None:
-		td = relativedelta(**{repeat_quantity.value: repeat_interval})
-		while new_time <= current_time:
-			new_time += td
+		new_time = proposed_time
+
+	elif repeat_quantity is not None:
+		td = timedelta(**{repeat_quantity.value: repeat_interval})
+		if new_time <= current_time:
+			new_time += td * ((current_time - new_time) // td + 1)
 
 	elif weekdays is not None:
-		# We run the loop contents at least once and then actually use the cond.
-		# This is because we need to force the 'free' date to go to one of the
-		# selected weekdays.
+		# The first notification needs to go on one of the selected weekdays
+		# after the original time, even when the original time itself is on a
+		# selected weekday.
 		# Say it's Monday, we set a reminder for Wednesday and make it repeat
 		# on Tuesday and Thursday. Then the first notification needs to go on
-		# Thurday, not Wednesday. So run code at least once to force that.
-		# Afterwards, it can run normally to push the timestamp into the future.
-		one_to_go = True
-		while one_to_go or new_time <= current_time:
-			next_day = __next_selected_day(weekdays, new_time.weekday())
-			proposed_time = new_time + relativedelta(weekday=du_weekday(next_day))
-			if proposed_time == new_time:
-				proposed_time += relativedelta(weekday=du_weekday(next_day, 2))
-			new_time = proposed_time
-			one_to_go = False
+		# Thurday, not Wednesday.
+		new_time += timedelta(
+			days=__days_to_next_selected_day(weekdays, new_time.weekday())
+		)
+
+		if new_time <= current_time:
+			# Jump to the current day and continue to the first selected
+			# weekday from there that is in the future.
+			new_time = datetime.combine(current_time.date(), new_time.time())
+			if (
+				new_time <= current_time
+				or not weekdays >> new_time.weekday() & 1
+			):
+				new_time += timedelta(
+					days=__days_to_next_selected_day(
+						weekdays,
+						new_time.weekday()
+					)
+				)
 
 	result = int(new_time.timestamp())
 	LOGGER.debug(
@@ -171,12 +287,6 @@ class Reminder:
 			(self.id,)
 		).fetchone()
 		reminder = dict(reminder)
-
-		reminder["weekdays"] = [
-			int(n)
-			for n in reminder["weekdays"].split(",")
-			if n
-		] if reminder["weekdays"] else None
 		reminder['notification_services'] = self._get_notification_services()
 
 		return reminder
@@ -189,7 +299,7 @@ class Reminder:
 		text: Union[None, str] = None,
 		repeat_quantity: Union[None, RepeatQuantity] = None,
 		repeat_interval: Union[None, int] = None,
-		weekdays: Union[None, List[int]] = None,
+		weekdays: Union[None, int] = None,
 		color: Union[None, str] = None
 	) -> dict:
 		"""Edit the reminder.
@@ -217,8 +327,8 @@ class Reminder:
 			repeat_quantity, like "5" (hours).
 				Defaults to None.
 
-			weekdays (Union[None, List[int]], optional): The new indexes of
-			the days of the week that the reminder should run.
+			weekdays (Union[None, int], optional): The new bitmask of the days
+			of the week that the reminder should run. Monday is bit 0.
 				Defaults to None.
 
 			color (Union[None, str], optional): The new hex code of the color
@@ -271,10 +381,7 @@ class Reminder:
 			'text': text,
 			'repeat_quantity': repeat_quantity,
 			'repeat_interval': repeat_interval,
-			'weekdays': when_not_none(
-				weekdays,
-				lambda w: ",".join(map(str, sorted(w)))
-			),
+			'weekdays': weekdays,
 			'color': color
 		}
 		for k, v in new_values.items():
@@ -369,7 +476,9 @@ class Reminder:
 			finally:
 				cursor.connection.isolation_level = ""
 
-		ReminderHandler().find_next_reminder(next_time)
+		# Commit first, so the dispatcher can't fire it based on the old data
+		cursor.connection.commit()
+		ReminderHandler().schedule(self.id, next_time)
 		return self.get()
 
 	def delete(self) -> None:
@@ -377,7 +486,7 @@ class Reminder:
 		"""
 		LOGGER.info(f'Deleting reminder {self.id}')
 		get_db().execute("DELETE FROM reminders WHERE id = ?", (self.id,))
-		ReminderHandler().find_next_reminder()
+		ReminderHandler().unschedule(self.id)
 		return
 
 class Reminders:
@@ -395,7 +504,10 @@ class Reminders:
 
 	def fetchall(
 		self,
-		sort_by: SortingMethod = SortingMethod.TIME
+		sort_by: SortingMethod = SortingMethod.TIME,
+		include_services: bool = False,
+		limit: Union[int, None] = None,
+		cursor: Union[str, None] = None
 	) -> List[dict]:
 		"""Get all reminders
 
@@ -403,12 +515,36 @@ class Reminders:
 			sort_by (SortingMethod, optional): How to sort the result.
 				Defaults to SortingMethod.TIME.
 
+			include_services (bool, optional): Also get the ID's of the
+			notification services of each reminder, in the same query.
+				Defaults to False.
+
+			limit (Union[int, None], optional): The max amount of reminders
+			to get, or `None` for all of them.
+				Defaults to None.
+
+			cursor (Union[str, None], optional): Continue after the reminder
+			of the cursor from `backend.db.get_page_cursor()`.
+				Defaults to None.
+
+		Raises:
+			InvalidKeyValue: The cursor is invalid.
+
 		Returns:
-			List[dict]: The id, title, text, time and color of each reminder
+			List[dict]: The id, title, text, time and color of each reminder,
+			and the notification services if requested.
 		"""
+		services_column = """,
+					(
+						SELECT group_concat(notification_service_id)
+						FROM reminder_services
+						WHERE reminder_id = reminders.id
+					) AS notification_services""" if include_services else ''
+
+		condition, order_by, params = get_page_sql(sort_by, cursor)
 		reminders = [
 			dict(r)
-			for r in get_db(dict).execute("""
+			for r in get_db(dict).execute(f"""
 				SELECT
 					id,
 					title, text,
@@ -416,41 +552,43 @@ class Reminders:
 					repeat_quantity,
 					repeat_interval,
 					weekdays,
-					color
+					color{services_column}
 				FROM reminders
-				WHERE user_id = ?;
+				WHERE user_id = ? {condition}
+				{order_by}
+				LIMIT ?;
 				""",
-				(self.user_id,)
+				(self.user_id, *params, -1 if limit is None else limit)
 			)
 		]
-		for r in reminders:
-			r["weekdays"] = [
-				int(n)
-				for n in r["weekdays"].split(",")
-				if n
-			] if r["weekdays"] else None
-
-		# Sort result
-		reminders.sort(key=sort_by.value[0], reverse=sort_by.value[1])
+		if include_services:
+			for r in reminders:
+				r['notification_services'] = ids_from_concat(
+					r['notification_services']
+				)
 
 		return reminders
 
 	def search(
 		self,
 		query: str,
-		sort_by: SortingMethod = SortingMethod.TIME) -> List[dict]:
+		sort_by: SortingMethod = SortingMethod.TIME,
+		include_services: bool = False) -> List[dict]:
 		"""Search for reminders
 
 		Args:
 			query (str): The term to search for.
 			sort_by (SortingMethod, optional): How to sort the result.
 				Defaults to SortingMethod.TIME.
+			include_services (bool, optional): Also get the ID's of the
+				notification services of each reminder.
+				Defaults to False.
 
 		Returns:
 			List[dict]: All reminders that match. Similar output to self.fetchall
 		"""
 		reminders = [
-			r for r in self.fetchall(sort_by)
+			r for r in self.fetchall(sort_by, include_services)
 			if search_filter(query, r)
 		]
 		return reminders
@@ -474,7 +612,7 @@ class Reminders:
 		text: str = '',
 		repeat_quantity: Union[None, RepeatQuantity] = None,
 		repeat_interval: Union[None, int] = None,
-		weekdays: Union[None, List[int]] = None,
+		weekdays: Union[None, int] = None,
 		color: Union[None, str] = None
 	) -> Reminder:
 		"""Add a reminder
@@ -498,8 +636,8 @@ class Reminders:
 			like "5" (hours).
 				Defaults to None.
 
-			weekdays (Union[None, List[int]], optional): The indexes of the days
-			of the week that the reminder should run.
+			weekdays (Union[None, int], optional): The bitmask of the days of
+			the week that the reminder should run. Monday is bit 0.
 				Defaults to None.
 
 			color (Union[None, str], optional): The hex code of the color of the
@@ -552,7 +690,7 @@ class Reminders:
 				raise NotificationServiceNotFound
 
 		# Prepare args
-		if any((repeat_quantity, weekdays)):
+		if repeat_quantity is not None or weekdays is not None:
 			original_time = time
 			time = _find_next_time(
 				original_time,
@@ -563,10 +701,6 @@ class Reminders:
 		else:
 			original_time = None
 
-		weekdays_str = when_not_none(
-			weekdays,
-			lambda w: ",".join(map(str, sorted(w)))
-		)
 		repeat_quantity_str = when_not_none(
 			repeat_quantity,
 			lambda q: q.value
@@ -592,7 +726,7 @@ class Reminders:
 				time,
 				repeat_quantity_str,
 				repeat_interval,
-				weekdays_str,
+				weekdays,
 				original_time,
 				color
 		)).lastrowid
@@ -615,7 +749,7 @@ class Reminders:
 		finally:
 			cursor.connection.isolation_level = ''
 		
-		ReminderHandler().find_next_reminder(time)
+		ReminderHandler().schedule(id, time)
 
 		return self.fetchone(id)
 
@@ -660,9 +794,16 @@ class Reminders:
 
 class ReminderHandler(metaclass=Singleton):
 	"""Handle set reminders.
-	
+
+	The times of all pending reminders are kept in an in-memory min-heap.
+	One long-lived dispatcher thread sleeps until the soonest time and then
+	triggers all reminders that are due. It wakes up at least every
+	`MAX_DISPATCH_WAIT` seconds to re-check the wall clock, so that clock
+	jumps don't delay reminders. Changes to the schedule are applied
+	to the heap directly instead of re-querying the database.
+
 	Note: Singleton.
-	"""	
+	"""
 	def __init__(
 		self,
 		context: Callable[[], AppContext]
@@ -670,127 +811,488 @@ class ReminderHandler(metaclass=Singleton):
 		"""Create instance of handler.
 
 		Args:
-			context (Optional[AppContext], optional): `Flask.app_context`.
-				Defaults to None.
+			context (Callable[[], AppContext]): `Flask.app_context`.
 		"""
 		self.context = context
-		self.thread: Union[Timer, None] = None
-		self.time: Union[int, None] = None
+		self.condition = Condition()
+		self.thread: Union[Thread, None] = None
+		self.running = False
+
+		self.heap: List[Tuple[int, int]] = []
+		"Entries of (time, reminder_id). Can contain outdated entries."
+
+		self.times: Dict[int, int] = {}
+		"The currently scheduled time of each reminder id"
+
+		self.batches = local()
+		"Per thread, the schedule changes collected by an active `batch()`"
+		return
+
+	def __clean_top(self) -> None:
+		"""Pop outdated entries off the top of the heap. Lock must be held.
+		"""
+		heap, times = self.heap, self.times
+		while heap and times.get(heap[0][1]) != heap[0][0]:
+			heappop(heap)
+		return
+
+	def __compact(self) -> None:
+		"""Rebuild the heap without outdated entries when they start to
+		dominate it. Lock must be held.
+		"""
+		if len(self.heap) > 2 * len(self.times) + 64:
+			self.heap = [(t, i) for i, t in self.times.items()]
+			heapify(self.heap)
+		return
+
+	def __apply(self, changes: Dict[int, Union[int, None]]) -> None:
+		"""Apply schedule changes under one lock and wake the dispatcher at
+		most once.
+
+		Args:
+			changes (Dict[int, Union[int, None]]): The new time of each
+			reminder id, or `None` to remove it from the schedule.
+		"""
+		with self.condition:
+			times = self.times
+			added = []
+			for reminder_id, time in changes.items():
+				if time is None:
+					times.pop(reminder_id, None)
+				elif times.get(reminder_id) != time:
+					times[reminder_id] = time
+					added.append((time, reminder_id))
+
+			if not added:
+				# The heap entries are skipped lazily once they reach the top
+				self.__compact()
+				return
+
+			old_top = self.heap[0] if self.heap else None
+			if len(added) > len(self.heap) // 8:
+				self.heap.extend(added)
+				heapify(self.heap)
+			else:
+				for entry in added:
+					heappush(self.heap, entry)
+			self.__compact()
+
+			if self.heap[0] != old_top:
+				# New soonest reminder, so dispatcher has to wake up earlier
+				self.condition.notify()
+		return
+
+	def schedule(self, reminder_id: int, time: int) -> None:
+		"""Set or change the time at which a reminder should be triggered.
+
+		Args:
+			reminder_id (int): The ID of the reminder.
+			time (int): The UTC epoch timestamp to trigger the reminder at.
+		"""
+		changes = getattr(self.batches, 'changes', None)
+		if changes is not None:
+			changes[reminder_id] = time
+			return
+
+		self.__apply({reminder_id: time})
+		return
+
+	def unschedule(self, reminder_id: int) -> None:
+		"""Remove a reminder from the schedule.
+
+		Args:
+			reminder_id (int): The ID of the reminder.
+		"""
+		changes = getattr(self.batches, 'changes', None)
+		if changes is not None:
+			changes[reminder_id] = None
+			return
+
+		self.__apply({reminder_id: None})
+		return
+
+	@contextmanager
+	def batch(self) -> Iterator[None]:
+		"""Collect the schedule changes made by this thread inside the
+		with-block and apply them at once when it exits. Can be nested.
+
+		```
+		with ReminderHandler().batch():
+			for reminder_id in ids:
+				ReminderHandler().unschedule(reminder_id)
+		```
+		"""
+		if getattr(self.batches, 'changes', None) is not None:
+			yield
+			return
+
+		self.batches.changes = {}
+		try:
+			yield
+		finally:
+			changes = self.batches.changes
+			self.batches.changes = None
+			self.__apply(changes)
+		return
+
+	@staticmethod
+	def __queue_digests(notifications: List[Tuple[int, int, int]]) -> None:
+		"""Queue notifications, combining the ones of the same user that go to
+		the same URL into one notification.
+
+		Args:
+			notifications (List[Tuple[int, int, int]]): The notifications to
+			queue, as tuples of the time to send, the current time and the ID
+			of the reminder.
+		"""
+		cursor = get_db(dict)
+		reminder_ids = list({n[2] for n in notifications})
+		services: Dict[int, List[dict]] = {}
+		for start in range(0, len(reminder_ids), MAX_QUERY_IDS):
+			batch = reminder_ids[start:start + MAX_QUERY_IDS]
+			for r in cursor.execute(f"""
+				SELECT
+					r.id, r.user_id,
+					r.title, r.text,
+					ns.id AS notification_service_id,
+					ns.url
+				FROM reminders r
+				INNER JOIN reminder_services rs
+				ON r.id = rs.reminder_id
+				INNER JOIN notification_services ns
+				ON rs.notification_service_id = ns.id
+				WHERE r.id IN ({','.join('?' * len(batch))});
+				""",
+				batch
+			):
+				services.setdefault(r['id'], []).append(dict(r))
+
+		groups: Dict[Tuple[int, str], List[dict]] = {}
+		for next_attempt, created, reminder_id in notifications:
+			for r in services.get(reminder_id, ()):
+				groups.setdefault((r['user_id'], r['url']), []).append(
+					dict(r, next_attempt=next_attempt, created=created)
+				)
+
+		entries = []
+		for group in groups.values():
+			first = group[0]
+			# Occurrences of the same reminder are listed separately, but
+			# counted once
+			reminder_count = len({r['id'] for r in group})
+			if len(group) == 1:
+				entries.append((
+					first['id'], first['notification_service_id'],
+					first['title'], first['text'],
+					first['next_attempt'], first['created']
+				))
+
+			else:
+				entries.append((
+					first['id'] if reminder_count == 1 else None,
+					first['notification_service_id'],
+					(
+						f'{reminder_count} reminders'
+						if reminder_count > 1 else
+						first['title']
+					),
+					'\n\n'.join(
+						r['title'] + (f'\n{r["text"]}' if r['text'] else '')
+						for r in group
+					),
+					first['next_attempt'], first['created']
+				))
+
+		cursor.executemany("""
+			INSERT INTO outbox(
+				reminder_id,
+				notification_service_id,
+				title, text,
+				next_attempt,
+				created
+			)
+			VALUES (?, ?, ?, ?, ?, ?);
+			""",
+			entries
+		)
+		return
+
+	def __fire_reminders(
+		self,
+		reminders: List[dict],
+		now: int,
+		policy: MissedReminderPolicy
+	) -> None:
+		"""Queue the notifications of reminders that are due, and delete or
+		reschedule the reminders, in bulk.
+
+		Args:
+			reminders (List[dict]): The due reminders.
+
+			now (int): The current UTC epoch timestamp.
+
+			policy (MissedReminderPolicy): What to do with the occurrences of
+			repeating reminders that were missed, and with reminders that were
+			missed in general.
+		"""
+		notifications: List[Tuple[int, int, int]] = []
+		to_delete: List[int] = []
+		to_reschedule: List[Tuple[int, int]] = []
+
+		fired_at = datetime.utcnow().timestamp()
+		REMINDER_BATCH_SIZE.observe(len(reminders))
+
+		for reminder in reminders:
+			REMINDER_FIRE_LAG.observe(fired_at - reminder['time'])
+			if (reminder['repeat_quantity'], reminder['weekdays']) == (None, None):
+				to_delete.append(reminder['id'])
+				occurrences = 1
+
+			else:
+				args = (
+					reminder['original_time'],
+					when_not_none(
+						reminder["repeat_quantity"],
+						lambda q: RepeatQuantity(q)
+					),
+					reminder['repeat_interval'],
+					reminder['weekdays']
+				)
+				new_time = _find_next_time(*args)
+				to_reschedule.append((new_time, reminder['id']))
+
+				occurrences = 1
+				if policy == MissedReminderPolicy.EACH:
+					next_time = _find_next_time(*args, after=reminder['time'])
+					while (
+						next_time <= now
+						and occurrences < MAX_MISSED_OCCURRENCES
+					):
+						occurrences += 1
+						next_time = _find_next_time(*args, after=next_time)
+
+			if policy != MissedReminderPolicy.SKIP:
+				notifications += [(now, now, reminder['id'])] * occurrences
+
+		# Queue the notifications. They're sent by the DeliveryHandler.
+		if get_setting('notification_digest'):
+			self.__queue_digests(notifications)
+
+		else:
+			get_db().executemany("""
+				INSERT INTO outbox(
+					reminder_id,
+					notification_service_id,
+					title, text,
+					next_attempt,
+					created
+				)
+				SELECT
+					r.id,
+					rs.notification_service_id,
+					r.title, r.text,
+					?, ?
+				FROM reminders r
+				INNER JOIN reminder_services rs
+				ON r.id = rs.reminder_id
+				WHERE r.id = ?;
+				""",
+				notifications
+			)
+
+		cursor = get_db()
+		cursor.executemany(
+			"DELETE FROM reminders WHERE id = ?;",
+			((i,) for i in to_delete)
+		)
+		cursor.executemany(
+			"UPDATE reminders SET time = ? WHERE id = ?;",
+			to_reschedule
+		)
+
+		with self.batch():
+			for reminder_id in to_delete:
+				self.unschedule(reminder_id)
+			for new_time, reminder_id in to_reschedule:
+				self.schedule(reminder_id, new_time)
 		return
 
 	def __trigger_reminders(self, time: int) -> None:
-		"""Trigger all reminders that are set for a certain time
+		"""Trigger all reminders that are set for a certain time or earlier.
 
 		Args:
-			time (int): The time of the reminders to trigger
+			time (int): The time up to which to trigger the reminders.
 		"""
+		start = perf_counter()
 		with self.context():
-			cursor = get_db(dict)
 			reminders = [
 				dict(r)
-				for r in cursor.execute("""
+				for r in get_db(dict).execute("""
 					SELECT
-						id, user_id,
-						title, text,
+						id, time,
 						repeat_quantity, repeat_interval,
 						weekdays,
 						original_time
 					FROM reminders
-					WHERE time = ?;
+					WHERE time <= ?;
 					""",
 					(time,)
 				)
 			]
-			
-			for reminder in reminders:
-				cursor.execute("""
-					SELECT url
-					FROM reminder_services rs
-					INNER JOIN notification_services ns
-					ON rs.notification_service_id = ns.id
-					WHERE rs.reminder_id = ?;
+			self.__fire_reminders(
+				reminders,
+				int(datetime.utcnow().timestamp()),
+				MissedReminderPolicy.COLLAPSE
+			)
+
+		REMINDER_TRIGGER_DURATION.observe(perf_counter() - start)
+
+		# Only now the queued notifications are committed
+		DeliveryHandler().wake()
+		return
+
+	def __catch_up(self) -> None:
+		"""Handle all reminders that were missed while MIND was not running,
+		following the missed reminder policy.
+		"""
+		with self.context():
+			policy = MissedReminderPolicy(get_setting('missed_reminder_policy'))
+			now = int(datetime.utcnow().timestamp())
+			cursor = get_db(dict)
+			reminders = [
+				dict(r)
+				for r in cursor.execute("""
+					SELECT
+						id, time,
+						repeat_quantity, repeat_interval,
+						weekdays,
+						original_time
+					FROM reminders
+					WHERE time <= ?
+					ORDER BY time;
 					""",
-					(reminder['id'],)
+					(now,)
 				)
+			]
+			if not reminders:
+				return
 
-				# Send reminder
-				a = Apprise()
-				for url in cursor:
-					a.add(url['url'])
-				a.notify(title=reminder["title"], body=reminder["text"] or '\u200B')
-
-				self.thread = None
-				self.time = None
-
-				if (reminder['repeat_quantity'], reminder['weekdays']) == (None, None):
-					# Delete the reminder from the database
-					Reminder(reminder["user_id"], reminder["id"]).delete()
-
-				else:
-					# Set next time
-					new_time = _find_next_time(
-						reminder['original_time'],
-						when_not_none(
-							reminder["repeat_quantity"],
-							lambda q: RepeatQuantity(q)
-						),
-						reminder['repeat_interval'],
-						when_not_none(
-							reminder["weekdays"],
-							lambda w: [int(d) for d in w.split(',')]
-						)
-					)
-					cursor.execute(
-						"UPDATE reminders SET time = ? WHERE id = ?;",
-						(new_time, reminder['id'])
-					)
+			LOGGER.info(
+				f'Catching up on {len(reminders)} missed reminders ' +
+				f'with policy {policy.value}'
+			)
+			for start in range(0, len(reminders), CATCH_UP_BATCH_SIZE):
+				self.__fire_reminders(
+					reminders[start:start + CATCH_UP_BATCH_SIZE],
+					now,
+					policy
+				)
+				cursor.connection.commit()
+				DeliveryHandler().wake()
+		return
 
-				self.find_next_reminder()
-			return
+	def __wait(self, timeout: Union[float, None]) -> None:
+		"""Wait on the condition for at most `MAX_DISPATCH_WAIT` seconds and
+		log when the wall clock jumped in the meantime. Lock must be held.
 
-	def find_next_reminder(self, time: Optional[int] = None) -> None:
-		"""Determine when the soonest reminder is and set the timer to that time
+		Waits are measured with the monotonic clock, while reminder times are
+		wall-clock timestamps. A suspend or a step of the system clock makes
+		them drift apart, so the wait is bounded and the caller re-checks the
+		wall clock after it.
 
 		Args:
-			time (Optional[int], optional): The timestamp to check for.
-			Otherwise check soonest in database.
-				Defaults to None.
+			timeout (Union[float, None]): The max amount of seconds to wait,
+			or `None` to wait until notified.
 		"""
-		if time is None:
-			with self.context():
-				soonest_time: Union[Tuple[int], None] = get_db().execute("""
-					SELECT DISTINCT r1.time
-					FROM reminders r1
-					LEFT JOIN reminders r2
-					ON r1.time > r2.time
-					WHERE r2.id IS NULL;
-				""").fetchone()
-				if soonest_time is None:
-					return
-				time = soonest_time[0]
-
-		if (
-			self.thread is None
-			or time < self.time
-		):
-			if self.thread is not None:
-				self.thread.cancel()
-
-			t = time - datetime.utcnow().timestamp()
-			self.thread = Timer(
-				t,
-				self.__trigger_reminders,
-				(time,)
+		if timeout is None or timeout > MAX_DISPATCH_WAIT:
+			timeout = MAX_DISPATCH_WAIT
+
+		wall_start = datetime.utcnow().timestamp()
+		mono_start = monotonic()
+		self.condition.wait(timeout)
+		drift = (
+			(datetime.utcnow().timestamp() - wall_start)
+			- (monotonic() - mono_start)
+		)
+		if abs(drift) >= CLOCK_JUMP_THRESHOLD:
+			LOGGER.warning(
+				f'System clock jumped {drift:+.0f} seconds, rechecking schedule'
 			)
-			self.thread.name = "ReminderHandler"
-			self.thread.start()
-			self.time = time
+		return
 
+	def __dispatch(self) -> None:
+		"""Wait for the soonest reminder and trigger it, until stopped.
+		Intended to be run in a thread.
+		"""
+		while True:
+			with self.condition:
+				while True:
+					if not self.running:
+						return
+
+					self.__clean_top()
+					if not self.heap:
+						self.__wait(None)
+						continue
+
+					delay = self.heap[0][0] - datetime.utcnow().timestamp()
+					if delay > 0:
+						self.__wait(delay)
+						continue
+
+					# Reminders are due. Take all of them off the schedule;
+					# repeating ones get re-added when triggered.
+					now = datetime.utcnow().timestamp()
+					due_time = self.heap[0][0]
+					while self.heap and self.heap[0][0] <= now:
+						t, reminder_id = heappop(self.heap)
+						if self.times.get(reminder_id) == t:
+							del self.times[reminder_id]
+							due_time = t
+					break
+
+			try:
+				self.__trigger_reminders(due_time)
+			except Exception:
+				LOGGER.exception('Failed to trigger reminders')
+
+	def start_handling(self) -> None:
+		"""Catch up on missed reminders, load the times of all reminders and
+		start the dispatcher thread
+		"""
+		self.__catch_up()
+
+		with self.context():
+			# Sorted the same way as the heap entries, so the result is
+			# already a valid heap. The time index already has its entries
+			# sorted by rowid within a time, so this doesn't need a sort.
+			reminders = get_db().execute(
+				"SELECT time, id FROM reminders ORDER BY time, id;"
+			).fetchall()
+
+		with self.condition:
+			self.times = {i: t for t, i in reminders}
+			self.heap = reminders
+			self.running = True
+
+		LOGGER.debug(f'Scheduled {len(reminders)} reminders')
+
+		self.thread = Thread(
+			target=self.__dispatch,
+			name="ReminderHandler",
+			daemon=True
+		)
+		self.thread.start()
 		return
-	
+
 	def stop_handling(self) -> None:
-		"""Stop the timer if it's active
+		"""Stop the dispatcher thread if it's active
 		"""
+		with self.condition:
+			self.running = False
+			self.condition.notify()
+
 		if self.thread is not None:
-			self.thread.cancel()
+			self.thread.join()
+			self.thread = None
 		return
@@ -2,17 +2,19 @@
 
 from __future__ import annotations
 
-from os import execv, urandom
+from os import execv, remove, urandom
+from os.path import isfile
 from sys import argv
-from threading import Timer, current_thread
-from typing import TYPE_CHECKING, List, NoReturn, Union
+from tempfile import NamedTemporaryFile
+from threading import Timer
+from typing import IO, TYPE_CHECKING, Any, List, NoReturn, Union
 
-from flask import Flask, render_template, request
+from flask import Flask, Request, render_template, request
 from waitress import create_server
 from waitress.task import ThreadedTaskDispatcher as TTD
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
-from backend.db import DB_Singleton, DBConnection, close_db, revert_db_import
+from backend.db import MAX_IMPORT_SIZE, close_db, revert_db_import
 from backend.helpers import RestartVars, Singleton, folder_path
 from backend.logging import LOGGER
 from backend.settings import restore_hosting_settings
@@ -21,21 +23,54 @@ if TYPE_CHECKING:
 	from waitress.server import TcpWSGIServer
 
 THREADS = 10
+MAX_FORM_OVERHEAD = 1024 * 1024
+"Bytes allowed in a request on top of the max size of an uploaded file"
+
+class UploadRequest(Request):
+	"""Request that writes uploaded files directly into the database folder,
+	so that an imported database doesn't have to be copied there again.
+	The files are removed at the end of the request, unless they're taken
+	out of `self.uploads`.
+	"""
+	def __init__(self, *args: Any, **kwargs: Any) -> None:
+		super().__init__(*args, **kwargs)
+		self.uploads: List[str] = []
+		"The filepaths of the uploaded files"
+		return
 
-class ThreadedTaskDispatcher(TTD):
-	def handler_thread(self, thread_no: int) -> None:
-		super().handler_thread(thread_no)
-		i = f'{DBConnection}{current_thread()}'
-		if i in DB_Singleton._instances and not DB_Singleton._instances[i].closed:
-			DB_Singleton._instances[i].close()
+	def _get_file_stream(self, *args: Any, **kwargs: Any) -> IO[bytes]:
+		f = NamedTemporaryFile(
+			'w+b',
+			prefix='MIND_upload_',
+			suffix='.db',
+			dir=folder_path('db'),
+			delete=False
+		)
+		self.uploads.append(f.name)
+		return f
+
+
+def remove_uploads(e=None) -> None:
+	"""Remove the files uploaded in the request that weren't taken out of
+	`UploadRequest.uploads`.
+	"""
+	if not request.uploads:
 		return
 
+	for f in request.files.values():
+		f.close()
+
+	for filename in request.uploads:
+		if isfile(filename):
+			remove(filename)
+	return
+
+
+class ThreadedTaskDispatcher(TTD):
 	def shutdown(self, cancel_pending: bool = True, timeout: int = 5) -> bool:
 		print()
 		LOGGER.info('Shutting down MIND')
-		result = super().shutdown(cancel_pending, timeout)
-		DBConnection(timeout=20.0).close()
-		return result
+		return super().shutdown(cancel_pending, timeout)
 
 
 class Server(metaclass=Singleton):
@@ -73,15 +108,22 @@ class Server(metaclass=Singleton):
 			static_folder=folder_path('frontend','static'),
 			static_url_path='/static'
 		)
+		app.request_class = UploadRequest
 		app.config['SECRET_KEY'] = urandom(32)
 		app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
 		app.config['JSON_SORT_KEYS'] = False
+		# Refused before the body is read
+		app.config['MAX_CONTENT_LENGTH'] = MAX_IMPORT_SIZE + MAX_FORM_OVERHEAD
 
 		# Add error handlers
 		@app.errorhandler(400)
 		def bad_request(e):
 			return {'error': 'Bad request', 'result': {}}, 400
 
+		@app.errorhandler(413)
+		def request_too_large(e):
+			return {'error': 'Request too large', 'result': {}}, 413
+
 		@app.errorhandler(405)
 		def method_not_allowed(e):
 			return {'error': 'Method not allowed', 'result': {}}, 405
@@ -102,6 +144,7 @@ class Server(metaclass=Singleton):
 
 		# Setup closing database
 		app.teardown_appcontext(close_db)
+		app.teardown_request(remove_uploads)
 
 		self.app = app
 		return
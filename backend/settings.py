@@ -6,11 +6,13 @@ Getting and setting settings
 
 import logging
 from json import dump, load
-from typing import Any
+from typing import Any, Dict
 
 from backend.custom_exceptions import InvalidKeyValue, KeyNotFound
-from backend.db import __DATABASE_VERSION__, get_db
-from backend.helpers import folder_path
+from backend.db import (DATABASE_PROFILES, DEFAULT_POOL_SIZE,
+                        __DATABASE_VERSION__, get_db, set_connection_pragmas,
+                        set_pool_size)
+from backend.helpers import DatabaseProfile, MissedReminderPolicy, folder_path
 from backend.logging import set_log_level
 
 default_settings = {
@@ -24,9 +26,46 @@ default_settings = {
 	'port': 8080,
 	'url_prefix': '',
 
-	'log_level': logging.INFO
+	'log_level': logging.INFO,
+
+	'notification_workers': 10,
+	'notification_timeout': 10,
+	'notification_digest': False,
+	'missed_reminder_policy': MissedReminderPolicy.COLLAPSE.value,
+
+	'database_pool_size': DEFAULT_POOL_SIZE,
+	'database_profile': DatabaseProfile.DURABLE.value,
+	'database_synchronous': 'full',
+	'database_cache_size': 2,
+	'database_mmap_size': 0,
+	'database_temp_store': 'default',
+	'database_busy_timeout': 20,
+	'database_wal_autocheckpoint': 1000,
+	'database_maintenance_hour': 3
 }
 
+DATABASE_PROFILE_SETTINGS = (
+	'database_profile', 'database_synchronous', 'database_cache_size',
+	'database_mmap_size', 'database_temp_store', 'database_busy_timeout',
+	'database_wal_autocheckpoint'
+)
+"The settings that determine the PRAGMA's of database connections"
+
+ADMIN_SETTINGS = (
+	'allow_new_accounts', 'login_time', 'login_time_reset',
+	'host', 'port', 'url_prefix',
+	'log_level',
+	'notification_workers', 'notification_timeout', 'notification_digest',
+	'missed_reminder_policy',
+	'database_pool_size', *DATABASE_PROFILE_SETTINGS,
+	'database_maintenance_hour'
+)
+"The settings that are editable from the admin panel"
+
+_settings_cache: Dict[str, Any] = {}
+"""The (python) values of all settings in the config. Filled by
+`load_settings()` and kept up to date by `set_setting()`."""
+
 def _format_setting(key: str, value):
 	"""Turn python value in to database value.
 
@@ -46,7 +85,9 @@ def _format_setting(key: str, value):
 		except ValueError:
 			raise InvalidKeyValue(key, value)
 
-	elif key in ('allow_new_accounts', 'login_time_reset'):
+	elif key in (
+		'allow_new_accounts', 'login_time_reset', 'notification_digest'
+	):
 		if not isinstance(value, bool):
 			raise InvalidKeyValue(key, value)
 		value = int(value)
@@ -76,6 +117,54 @@ def _format_setting(key: str, value):
 	elif key == 'log_level' and not value in (logging.INFO, logging.DEBUG):
 		raise InvalidKeyValue(key, value)
 
+	elif key == 'notification_workers':
+		if not isinstance(value, int) or not 1 <= value <= 100:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'notification_timeout':
+		if not isinstance(value, int) or not 1 <= value <= 300:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'missed_reminder_policy':
+		if not value in [p.value for p in MissedReminderPolicy]:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_pool_size':
+		if not isinstance(value, int) or not 2 <= value <= 100:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_profile':
+		if not value in [p.value for p in DatabaseProfile]:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_synchronous':
+		if not value in ('off', 'normal', 'full', 'extra'):
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_temp_store':
+		if not value in ('default', 'file', 'memory'):
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_cache_size':
+		if not isinstance(value, int) or not 1 <= value <= 4096:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_mmap_size':
+		if not isinstance(value, int) or not 0 <= value <= 16384:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_busy_timeout':
+		if not isinstance(value, int) or not 0 <= value <= 300:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_wal_autocheckpoint':
+		if not isinstance(value, int) or not 0 <= value <= 100000:
+			raise InvalidKeyValue(key, value)
+
+	elif key == 'database_maintenance_hour':
+		if not isinstance(value, int) or not 0 <= value <= 23:
+			raise InvalidKeyValue(key, value)
+
 	return value
 
 def _reverse_format_setting(key: str, value: Any) -> Any:
@@ -88,14 +177,35 @@ def _reverse_format_setting(key: str, value: Any) -> Any:
 	Returns:
 		Any: The converted value.
 	"""
-	if key in ('allow_new_accounts', 'login_time_reset'):
+	if key in (
+		'allow_new_accounts', 'login_time_reset', 'notification_digest'
+	):
 		value = value == 1
 
-	elif key in ('log_level', 'database_version', 'login_time'):
+	elif key in (
+		'log_level', 'database_version', 'login_time',
+		'notification_workers', 'notification_timeout', 'database_pool_size',
+		'database_cache_size', 'database_mmap_size', 'database_busy_timeout',
+		'database_wal_autocheckpoint', 'database_maintenance_hour'
+	):
 		value = int(value)
 
 	return value
 
+def load_settings() -> None:
+	"""Read all settings from the database into the cache. Needs to happen
+	when the config is changed other than with `set_setting()`.
+	"""
+	settings = {
+		key: _reverse_format_setting(key, value)
+		for key, value in get_db().execute(
+			"SELECT key, value FROM config;"
+		)
+	}
+	_settings_cache.clear()
+	_settings_cache.update(settings)
+	return
+
 def get_setting(key: str) -> Any:
 	"""Get a value from the config.
 
@@ -108,6 +218,12 @@ def get_setting(key: str) -> Any:
 	Returns:
 		Any: The value of the key.
 	"""
+	try:
+		return _settings_cache[key]
+	except KeyError:
+		pass
+
+	# Settings haven't been loaded yet
 	result = get_db().execute(
 		"SELECT value FROM config WHERE key = ? LIMIT 1;",
 		(key,)
@@ -125,22 +241,7 @@ def get_admin_settings() -> dict:
 	Returns:
 		dict: The admin settings
 	"""
-	return dict((
-		(key, _reverse_format_setting(key, value))
-		for key, value in get_db().execute("""
-			SELECT key, value
-			FROM config
-			WHERE
-				key = 'allow_new_accounts'
-				OR key = 'login_time'
-				OR key = 'login_time_reset'
-				OR key = 'host'
-				OR key = 'port'
-				OR key = 'url_prefix'
-				OR key = 'log_level';
-			"""
-		)
-	))
+	return {key: get_setting(key) for key in ADMIN_SETTINGS}
 
 def set_setting(key: str, value: Any) -> None:
 	"""Set a value in the config
@@ -162,6 +263,7 @@ def set_setting(key: str, value: Any) -> None:
 		"UPDATE config SET value = ? WHERE key = ?;",
 		(value, key)
 	)
+	_settings_cache[key] = _reverse_format_setting(key, value)
 
 	if key == 'url_prefix':
 		update_manifest(value)
@@ -169,6 +271,32 @@ def set_setting(key: str, value: Any) -> None:
 	elif key == 'log_level':
 		set_log_level(value)
 
+	elif key == 'database_pool_size':
+		set_pool_size(value)
+
+	elif key in DATABASE_PROFILE_SETTINGS:
+		apply_database_profile()
+
+	return
+
+def apply_database_profile() -> None:
+	"""Set the PRAGMA's of the selected database profile on all (new)
+	database connections. The 'custom' profile uses the individual settings.
+	"""
+	profile = get_setting('database_profile')
+	if profile != DatabaseProfile.CUSTOM:
+		set_connection_pragmas(DATABASE_PROFILES[profile])
+		return
+
+	set_connection_pragmas({
+		'synchronous': get_setting('database_synchronous').upper(),
+		# Negative value is in KiB instead of pages
+		'cache_size': -get_setting('database_cache_size') * 1024,
+		'mmap_size': get_setting('database_mmap_size') * 1024 * 1024,
+		'temp_store': get_setting('database_temp_store').upper(),
+		'busy_timeout': get_setting('database_busy_timeout') * 1000,
+		'wal_autocheckpoint': get_setting('database_wal_autocheckpoint')
+	})
 	return
 
 def update_manifest(url_base: str) -> None:
@@ -214,6 +342,7 @@ def backup_hosting_settings() -> None:
 		""",
 		((k, v, v) for k, v in hosting_settings.items())
 	)
+	load_settings()
 
 	return
 
@@ -240,6 +369,7 @@ def restore_hosting_settings() -> None:
 		((v, k) for k, v in hosting_settings.items())
 	)
 
+	load_settings()
 	update_manifest(hosting_settings['url_prefix'])
 
 	return
@@ -7,8 +7,9 @@ from apprise import Apprise
 
 from backend.custom_exceptions import (NotificationServiceNotFound,
                                        ReminderNotFound)
-from backend.db import get_db
-from backend.helpers import TimelessSortingMethod, search_filter
+from backend.db import get_db, get_page_sql
+from backend.helpers import (TimelessSortingMethod, ids_from_concat,
+                             search_filter)
 from backend.logging import LOGGER
 
 
@@ -187,7 +188,10 @@ class StaticReminders:
 		
 	def fetchall(
 		self,
-		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE
+		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE,
+		include_services: bool = False,
+		limit: Union[int, None] = None,
+		cursor: Union[str, None] = None
 	) -> List[dict]:
 		"""Get all static reminders
 
@@ -195,33 +199,61 @@ class StaticReminders:
 			sort_by (TimelessSortingMethod, optional): How to sort the result.
 				Defaults to TimelessSortingMethod.TITLE.
 
+			include_services (bool, optional): Also get the ID's of the
+			notification services of each static reminder, in the same query.
+				Defaults to False.
+
+			limit (Union[int, None], optional): The max amount of static reminders
+			to get, or `None` for all of them.
+				Defaults to None.
+
+			cursor (Union[str, None], optional): Continue after the
+			static reminder of the cursor from `backend.db.get_page_cursor()`.
+				Defaults to None.
+
+		Raises:
+			InvalidKeyValue: The cursor is invalid.
+
 		Returns:
-			List[dict]: The id, title, text and color of each static reminder.
+			List[dict]: The id, title, text and color of each static reminder,
+			and the notification services if requested.
 		"""
+		services_column = """,
+					(
+						SELECT group_concat(notification_service_id)
+						FROM reminder_services
+						WHERE static_reminder_id = static_reminders.id
+					) AS notification_services""" if include_services else ''
+
+		condition, order_by, params = get_page_sql(sort_by, cursor)
 		reminders = [
 			dict(r)
-			for r in get_db(dict).execute("""
+			for r in get_db(dict).execute(f"""
 				SELECT
 					id,
 					title, text,
-					color
+					color{services_column}
 				FROM static_reminders
-				WHERE user_id = ?
-				ORDER BY title, id;
+				WHERE user_id = ? {condition}
+				{order_by}
+				LIMIT ?;
 				""",
-				(self.user_id,)
+				(self.user_id, *params, -1 if limit is None else limit)
 			)
 		]
-
-		# Sort result
-		reminders.sort(key=sort_by.value[0], reverse=sort_by.value[1])
+		if include_services:
+			for r in reminders:
+				r['notification_services'] = ids_from_concat(
+					r['notification_services']
+				)
 
 		return reminders
 
 	def search(
 		self,
 		query: str,
-		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE
+		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE,
+		include_services: bool = False
 	) -> List[dict]:
 		"""Search for static reminders
 
@@ -232,12 +264,16 @@ class StaticReminders:
 			the resulting list.
 				Defaults to TimelessSortingMethod.TITLE.
 
+			include_services (bool, optional): Also get the ID's of the
+			notification services of each static reminder.
+				Defaults to False.
+
 		Returns:
 			List[dict]: All static reminders that match.
 			Similar output to `self.fetchall`
 		"""
 		static_reminders = [
-			r for r in self.fetchall(sort_by)
+			r for r in self.fetchall(sort_by, include_services)
 			if search_filter(query, r)
 		]
 		return static_reminders
@@ -5,8 +5,9 @@ from typing import List, Optional, Union
 
 from backend.custom_exceptions import (NotificationServiceNotFound,
                                        TemplateNotFound)
-from backend.db import get_db
-from backend.helpers import TimelessSortingMethod, search_filter
+from backend.db import get_db, get_page_sql
+from backend.helpers import (TimelessSortingMethod, ids_from_concat,
+                             search_filter)
 from backend.logging import LOGGER
 
 
@@ -181,7 +182,10 @@ class Templates:
 		
 	def fetchall(
 		self,
-		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE
+		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE,
+		include_services: bool = False,
+		limit: Union[int, None] = None,
+		cursor: Union[str, None] = None
 	) -> List[dict]:
 		"""Get all templates of the user.
 
@@ -190,33 +194,61 @@ class Templates:
 			the resulting list.
 				Defaults to TimelessSortingMethod.TITLE.
 
+			include_services (bool, optional): Also get the ID's of the
+			notification services of each template, in the same query.
+				Defaults to False.
+
+			limit (Union[int, None], optional): The max amount of templates
+			to get, or `None` for all of them.
+				Defaults to None.
+
+			cursor (Union[str, None], optional): Continue after the
+			template of the cursor from `backend.db.get_page_cursor()`.
+				Defaults to None.
+
+		Raises:
+			InvalidKeyValue: The cursor is invalid.
+
 		Returns:
-			List[dict]: The id, title, text and color of each template.
+			List[dict]: The id, title, text and color of each template, and
+			the notification services if requested.
 		"""
+		services_column = """,
+					(
+						SELECT group_concat(notification_service_id)
+						FROM reminder_services
+						WHERE template_id = templates.id
+					) AS notification_services""" if include_services else ''
+
+		condition, order_by, params = get_page_sql(sort_by, cursor)
 		templates = [
 			dict(r)
-			for r in get_db(dict).execute("""
+			for r in get_db(dict).execute(f"""
 				SELECT
 					id,
 					title, text,
-					color
+					color{services_column}
 				FROM templates
-				WHERE user_id = ?
-				ORDER BY title, id;
+				WHERE user_id = ? {condition}
+				{order_by}
+				LIMIT ?;
 				""",
-				(self.user_id,)
+				(self.user_id, *params, -1 if limit is None else limit)
 			)
 		]
-
-		# Sort result
-		templates.sort(key=sort_by.value[0], reverse=sort_by.value[1])
+		if include_services:
+			for r in templates:
+				r['notification_services'] = ids_from_concat(
+					r['notification_services']
+				)
 
 		return templates
 
 	def search(
 		self,
 		query: str,
-		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE
+		sort_by: TimelessSortingMethod = TimelessSortingMethod.TITLE,
+		include_services: bool = False
 	) -> List[dict]:
 		"""Search for templates
 
@@ -227,11 +259,15 @@ class Templates:
 			the resulting list.
 				Defaults to TimelessSortingMethod.TITLE.
 
+			include_services (bool, optional): Also get the ID's of the
+			notification services of each template.
+				Defaults to False.
+
 		Returns:
 			List[dict]: All templates that match. Similar output to `self.fetchall`
 		"""		
 		templates = [
-			r for r in self.fetchall(sort_by)
+			r for r in self.fetchall(sort_by, include_services)
 			if search_filter(query, r)
 		]
 		return templates
@@ -8,7 +8,7 @@ from backend.custom_exceptions import (AccessUnauthorized,
 from backend.db import get_db
 from backend.logging import LOGGER
 from backend.notification_service import NotificationServices
-from backend.reminders import Reminders
+from backend.reminders import ReminderHandler, Reminders
 from backend.security import generate_salt_hash, get_hash
 from backend.settings import get_setting
 from backend.static_reminders import StaticReminders
@@ -109,26 +109,18 @@ class User:
 		LOGGER.info(f'Deleting the user {self.username} ({self.user_id})')
 		
 		cursor = get_db()
-		cursor.execute(
-			"DELETE FROM reminders WHERE user_id = ?", 
-			(self.user_id,)
-		)
-		cursor.execute(
-			"DELETE FROM templates WHERE user_id = ?",
-			(self.user_id,)
-		)
-		cursor.execute(
-			"DELETE FROM static_reminders WHERE user_id = ?",
-			(self.user_id,)
-		)
-		cursor.execute(
-			"DELETE FROM notification_services WHERE user_id = ?",
+		reminder_ids = cursor.execute(
+			"SELECT id FROM reminders WHERE user_id = ?;",
 			(self.user_id,)
-		)
+		).fetchall()
+		# Everything of the user is deleted with it by the foreign keys
 		cursor.execute(
 			"DELETE FROM users WHERE id = ?",
 			(self.user_id,)
 		)
+		with ReminderHandler().batch():
+			for (reminder_id,) in reminder_ids:
+				ReminderHandler().unschedule(reminder_id)
 		return
 
 class Users:
@@ -203,6 +195,48 @@ class Users:
 		LOGGER.debug(f'Newly registered user has id {user_id}')
 		return user_id
 
+	def delete(self, user_ids: List[int]) -> None:
+		"""Delete multiple user accounts at once. Either all or none of them
+		are deleted.
+
+		Args:
+			user_ids (List[int]): The id's of the user accounts.
+
+		Raises:
+			UserNotFound: One of the users doesn't exist or is the admin
+		"""
+		user_ids = list(dict.fromkeys(user_ids))
+		LOGGER.info(f'Deleting the users {user_ids}')
+
+		cursor = get_db()
+		reminder_ids: List[int] = []
+		cursor.connection.isolation_level = None
+		cursor.execute("BEGIN TRANSACTION;")
+		try:
+			for user_id in user_ids:
+				reminder_ids += (r[0] for r in cursor.execute(
+					"SELECT id FROM reminders WHERE user_id = ?;",
+					(user_id,)
+				))
+				if not cursor.execute(
+					"DELETE FROM users WHERE id = ? AND username != 'admin';",
+					(user_id,)
+				).rowcount:
+					raise UserNotFound
+			cursor.execute("COMMIT;")
+
+		except BaseException:
+			cursor.execute("ROLLBACK;")
+			raise
+
+		finally:
+			cursor.connection.isolation_level = ""
+
+		with ReminderHandler().batch():
+			for reminder_id in reminder_ids:
+				ReminderHandler().unschedule(reminder_id)
+		return
+
 	def get_all(self) -> List[dict]:
 		"""Get all user info for the admin
 
@@ -4,13 +4,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from io import BytesIO
-from os import remove, urandom
-from os.path import basename, exists
+from os import close, remove, urandom
+from os.path import exists, getsize
+from tempfile import mkstemp
 from time import time as epoch_time
-from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Optional,
+                    Tuple, Union)
 
-from flask import g, request, send_file
+from flask import Response, g, request, send_file
 
 from backend.custom_exceptions import (AccessUnauthorized, APIKeyExpired,
                                        APIKeyInvalid, InvalidDatabaseFile,
@@ -22,32 +23,59 @@ from backend.custom_exceptions import (AccessUnauthorized, APIKeyExpired,
                                        ReminderNotFound, TemplateNotFound,
                                        UsernameInvalid, UsernameTaken,
                                        UserNotFound)
-from backend.db import get_db, import_db, revert_db_import
-from backend.helpers import RestartVars, folder_path
+from backend.db import (backup_db, get_import_status, get_page_cursor,
+                        import_db, revert_db_import)
+from backend.helpers import (RestartVars, SortingMethod,
+                             TimelessSortingMethod, folder_path,
+                             mask_to_weekdays, weekdays_to_mask,
+                             when_not_none)
 from backend.logging import LOGGER, get_debug_log_filepath
+from backend.maintenance import MaintenanceHandler
+from backend.metrics import QUERY_STATS, get_metrics
 from backend.notification_service import get_apprise_services
+from backend.outbox import (delete_failed_deliveries, get_deliveries,
+                            get_delivery_queue, retry_failed_deliveries)
 from backend.server import SERVER
 from backend.settings import (backup_hosting_settings, get_admin_settings,
                               get_setting, set_setting)
 from backend.users import Users
 from frontend.input_validation import (AllowNewAccountsVariable, ColorVariable,
                                        CopyHostingSettingsVariable,
+                                       CursorVariable,
+                                       DatabaseBusyTimeoutVariable,
+                                       DatabaseCacheSizeVariable,
                                        DatabaseFileVariable,
+                                       DatabaseMaintenanceHourVariable,
+                                       DatabaseMmapSizeVariable,
+                                       DatabasePoolSizeVariable,
+                                       DatabaseProfileVariable,
+                                       DatabaseSynchronousVariable,
+                                       DatabaseTempStoreVariable,
+                                       DatabaseWalAutocheckpointVariable,
                                        DeleteRemindersUsingVariable,
                                        EditNotificationServicesVariable,
+                                       EditRateLimitVariable,
                                        EditTimeVariable, EditTitleVariable,
                                        EditURLVariable, HostVariable,
-                                       LoginTimeResetVariable,
+                                       IncludeServicesVariable,
+                                       LimitVariable, LoginTimeResetVariable,
                                        LoginTimeVariable, LogLevelVariable,
-                                       Method, Methods, NewPasswordVariable,
+                                       Method, Methods,
+                                       MissedReminderPolicyVariable,
+                                       NewPasswordVariable,
+                                       NotificationDigestVariable,
                                        NotificationServicesVariable,
+                                       NotificationTimeoutVariable,
+                                       NotificationWorkersVariable,
                                        PasswordCreateVariable,
                                        PasswordVariable, PortVariable,
-                                       QueryVariable, RepeatIntervalVariable,
+                                       QueryVariable, RateLimitVariable,
+                                       RepeatIntervalVariable,
                                        RepeatQuantityVariable, SortByVariable,
                                        TextVariable, TimelessSortByVariable,
                                        TimeVariable, TitleVariable,
                                        UrlPrefixVariable, URLVariable,
+                                       UserIdsVariable,
                                        UsernameCreateVariable,
                                        UsernameVariable, WeekDaysVariable,
                                        admin_api, api, get_api_docs,
@@ -69,6 +97,9 @@ class ApiKeyEntry:
 users = Users()
 api_key_map: Dict[int, ApiKeyEntry] = {}
 
+BACKUP_CHUNK_SIZE = 1024 * 1024
+"Amount of bytes of a database backup that is sent at once"
+
 def return_api(
 	result: Any,
 	error: Optional[str] = None,
@@ -76,6 +107,54 @@ def return_api(
 ) -> Tuple[dict, int]:
 	return {'error': error, 'result': result}, code
 
+def reminder_to_api(reminder: dict) -> dict:
+	"""Turn the weekday bitmask of a reminder into the list of weekdays that
+	the API uses.
+
+	Args:
+		reminder (dict): The info about the reminder.
+
+	Returns:
+		dict: The same dict, with the weekdays converted.
+	"""
+	reminder['weekdays'] = when_not_none(
+		reminder['weekdays'],
+		mask_to_weekdays
+	)
+	return reminder
+
+def page_to_api(
+	entries: List[dict],
+	sort_by: Union[SortingMethod, TimelessSortingMethod],
+	limit: Union[int, None]
+) -> Union[List[dict], Dict[str, Any]]:
+	"""Add the cursor of the next page to a list of entries, if the list is
+	a page.
+
+	Args:
+		entries (List[dict]): The entries.
+		sort_by (Union[SortingMethod, TimelessSortingMethod]): How the entries
+		are sorted.
+		limit (Union[int, None]): The max size of the page, or `None` if the
+		entries aren't a page.
+
+	Returns:
+		Union[List[dict], Dict[str, Any]]: The entries when they aren't a page.
+		Otherwise the entries and the cursor of the next page, which is `None`
+		on the last page.
+	"""
+	if limit is None:
+		return entries
+
+	return {
+		'entries': entries,
+		'next_cursor': (
+			get_page_cursor(sort_by, entries[-1])
+			if len(entries) == limit else
+			None
+		)
+	}
+
 def auth() -> None:
 	"""Checks if the client is logged in
 
@@ -278,7 +357,7 @@ def api_manage_user(inputs: Dict[str, str]):
 			description='Get a list of all notification services'
 		),
 		post=Method(
-			vars=[TitleVariable, URLVariable],
+			vars=[TitleVariable, URLVariable, RateLimitVariable],
 			description='Add a notification service'
 		)
 	),
@@ -294,7 +373,8 @@ def api_notification_services_list(inputs: Dict[str, str]):
 		
 	elif request.method == 'POST':
 		result = services.add(title=inputs['title'],
-							url=inputs['url']).get()
+							url=inputs['url'],
+							rate_limit=inputs['rate_limit']).get()
 		return return_api(result, code=201)
 
 @api.route(
@@ -330,7 +410,7 @@ def api_test_service(inputs: Dict[str, Any]):
 	'Manage a specific notification service',
 	Methods(
 		put=Method(
-			vars=[EditTitleVariable, EditURLVariable],
+			vars=[EditTitleVariable, EditURLVariable, EditRateLimitVariable],
 			description='Edit the notification service'
 		),
 		delete=Method(
@@ -353,7 +433,8 @@ def api_notification_service(inputs: Dict[str, str], n_id: int):
 
 	elif request.method == 'PUT':
 		result = service.update(title=inputs['title'],
-						url=inputs['url'])
+						url=inputs['url'],
+						rate_limit=inputs['rate_limit'])
 		return return_api(result)
 
 	elif request.method == 'DELETE':
@@ -371,8 +452,9 @@ def api_notification_service(inputs: Dict[str, str], n_id: int):
 	'Manage the reminders',
 	Methods(
 		get=Method(
-			vars=[SortByVariable],
-			description='Get a list of all reminders'
+			vars=[SortByVariable, IncludeServicesVariable,
+				LimitVariable, CursorVariable],
+			description='Get a list of all reminders. With a limit, get a page of them: {"entries": [...], "next_cursor": ...}, where next_cursor is null on the last page'
 		),
 		post=Method(
 			vars=[TitleVariable, TimeVariable,
@@ -390,8 +472,16 @@ def api_reminders_list(inputs: Dict[str, Any]):
 	reminders = api_key_map[g.hashed_api_key].user_data.reminders
 	
 	if request.method == 'GET':
-		result = reminders.fetchall(inputs['sort_by'])
-		return return_api(result)
+		result = reminders.fetchall(
+			inputs['sort_by'], inputs['include_services'],
+			inputs['limit'], inputs['cursor']
+		)
+		return return_api(
+			page_to_api(
+				[reminder_to_api(r) for r in result],
+				inputs['sort_by'], inputs['limit']
+			)
+		)
 
 	elif request.method == 'POST':
 		result = reminders.add(title=inputs['title'],
@@ -400,16 +490,16 @@ def api_reminders_list(inputs: Dict[str, Any]):
 								text=inputs['text'],
 								repeat_quantity=inputs['repeat_quantity'],
 								repeat_interval=inputs['repeat_interval'],
-								weekdays=inputs['weekdays'],
+								weekdays=when_not_none(inputs['weekdays'], weekdays_to_mask),
 								color=inputs['color'])
-		return return_api(result.get(), code=201)
+		return return_api(reminder_to_api(result.get()), code=201)
 
 @api.route(
 	'/reminders/search',
 	'Search through the list of reminders',
 	Methods(
 		get=Method(
-			vars=[SortByVariable, QueryVariable]
+			vars=[SortByVariable, QueryVariable, IncludeServicesVariable]
 		)
 	),
 	methods=['GET']
@@ -419,8 +509,10 @@ def api_reminders_query(inputs: Dict[str, str]):
 	result = (api_key_map[g.hashed_api_key]
 		.user_data
 		.reminders
-		.search(inputs['query'], inputs['sort_by']))
-	return return_api(result)
+		.search(
+			inputs['query'], inputs['sort_by'], inputs['include_services']
+		))
+	return return_api([reminder_to_api(r) for r in result])
 
 @api.route(
 	'/reminders/test',
@@ -466,7 +558,7 @@ def api_get_reminder(inputs: Dict[str, Any], r_id: int):
 
 	if request.method == 'GET':
 		result = reminders.fetchone(r_id).get()
-		return return_api(result)
+		return return_api(reminder_to_api(result))
 
 	elif request.method == 'PUT':
 		result = reminders.fetchone(r_id).update(title=inputs['title'],
@@ -475,9 +567,9 @@ def api_get_reminder(inputs: Dict[str, Any], r_id: int):
 												text=inputs['text'],
 												repeat_quantity=inputs['repeat_quantity'],
 												repeat_interval=inputs['repeat_interval'],
-												weekdays=inputs['weekdays'],
+												weekdays=when_not_none(inputs['weekdays'], weekdays_to_mask),
 												color=inputs['color'])
-		return return_api(result)
+		return return_api(reminder_to_api(result))
 
 	elif request.method == 'DELETE':
 		reminders.fetchone(r_id).delete()
@@ -492,8 +584,9 @@ def api_get_reminder(inputs: Dict[str, Any], r_id: int):
 	'Manage the templates',
 	Methods(
 		get=Method(
-			vars=[TimelessSortByVariable],
-			description='Get a list of all templates'
+			vars=[TimelessSortByVariable, IncludeServicesVariable,
+				LimitVariable, CursorVariable],
+			description='Get a list of all templates. With a limit, get a page of them: {"entries": [...], "next_cursor": ...}, where next_cursor is null on the last page'
 		),
 		post=Method(
 			vars=[TitleVariable, NotificationServicesVariable,
@@ -508,8 +601,13 @@ def api_get_templates(inputs: Dict[str, Any]):
 	templates = api_key_map[g.hashed_api_key].user_data.templates
 	
 	if request.method == 'GET':
-		result = templates.fetchall(inputs['sort_by'])
-		return return_api(result)
+		result = templates.fetchall(
+			inputs['sort_by'], inputs['include_services'],
+			inputs['limit'], inputs['cursor']
+		)
+		return return_api(
+			page_to_api(result, inputs['sort_by'], inputs['limit'])
+		)
 	
 	elif request.method == 'POST':
 		result = templates.add(title=inputs['title'],
@@ -523,7 +621,8 @@ def api_get_templates(inputs: Dict[str, Any]):
 	'Search through the list of templates',
 	Methods(
 		get=Method(
-			vars=[TimelessSortByVariable, QueryVariable]
+			vars=[TimelessSortByVariable, QueryVariable,
+				IncludeServicesVariable]
 		)
 	),
 	methods=['GET']
@@ -533,7 +632,9 @@ def api_templates_query(inputs: Dict[str, str]):
 	result = (api_key_map[g.hashed_api_key]
 		.user_data
 		.templates
-		.search(inputs['query'], inputs['sort_by']))
+		.search(
+			inputs['query'], inputs['sort_by'], inputs['include_services']
+		))
 	return return_api(result)
 
 @api.route(
@@ -582,8 +683,9 @@ def api_get_template(inputs: Dict[str, Any], t_id: int):
 	'Manage the static reminders',
 	Methods(
 		get=Method(
-			vars=[TimelessSortByVariable],
-			description='Get a list of all static reminders'
+			vars=[TimelessSortByVariable, IncludeServicesVariable,
+				LimitVariable, CursorVariable],
+			description='Get a list of all static reminders. With a limit, get a page of them: {"entries": [...], "next_cursor": ...}, where next_cursor is null on the last page'
 		),
 		post=Method(
 			vars=[TitleVariable, NotificationServicesVariable,
@@ -598,8 +700,13 @@ def api_static_reminders_list(inputs: Dict[str, Any]):
 	reminders = api_key_map[g.hashed_api_key].user_data.static_reminders
 	
 	if request.method == 'GET':
-		result = reminders.fetchall(inputs['sort_by'])
-		return return_api(result)
+		result = reminders.fetchall(
+			inputs['sort_by'], inputs['include_services'],
+			inputs['limit'], inputs['cursor']
+		)
+		return return_api(
+			page_to_api(result, inputs['sort_by'], inputs['limit'])
+		)
 	
 	elif request.method == 'POST':
 		result = reminders.add(title=inputs['title'],
@@ -613,7 +720,8 @@ def api_static_reminders_list(inputs: Dict[str, Any]):
 	'Search through the list of staticreminders',
 	Methods(
 		get=Method(
-			vars=[TimelessSortByVariable, QueryVariable]
+			vars=[TimelessSortByVariable, QueryVariable,
+				IncludeServicesVariable]
 		)
 	),
 	methods=['GET']
@@ -623,7 +731,9 @@ def api_static_reminders_query(inputs: Dict[str, str]):
 	result = (api_key_map[g.hashed_api_key]
 		.user_data
 		.static_reminders
-		.search(inputs['query'], inputs['sort_by']))
+		.search(
+			inputs['query'], inputs['sort_by'], inputs['include_services']
+		))
 	return return_api(result)
 
 @api.route(
@@ -711,7 +821,14 @@ def api_settings():
 		put=Method(
 			vars=[AllowNewAccountsVariable, LoginTimeVariable,
 				LoginTimeResetVariable, HostVariable, PortVariable,
-				UrlPrefixVariable, LogLevelVariable],
+				UrlPrefixVariable, LogLevelVariable,
+				NotificationWorkersVariable, NotificationTimeoutVariable,
+				NotificationDigestVariable, MissedReminderPolicyVariable,
+				DatabasePoolSizeVariable, DatabaseProfileVariable,
+				DatabaseSynchronousVariable, DatabaseCacheSizeVariable,
+				DatabaseMmapSizeVariable, DatabaseTempStoreVariable,
+				DatabaseBusyTimeoutVariable, DatabaseWalAutocheckpointVariable,
+				DatabaseMaintenanceHourVariable],
 			description='Edit the admin settings. Supplying a hosting setting will automatically restart MIND.'
 		)
 	),
@@ -737,6 +854,9 @@ def api_admin_settings(inputs: Dict[str, Any]):
 			if v is not None:
 				set_setting(k, v)
 
+		if inputs['database_maintenance_hour'] is not None:
+			MaintenanceHandler().wake()
+
 		if hosting_changes:
 			SERVER.restart([RestartVars.HOST_CHANGE.value])
 		
@@ -755,9 +875,78 @@ def api_admin_logs():
 
 	return send_file(file), 200
 
+@admin_api.route(
+	'/deliveries',
+	'Manage the notifications that failed to be delivered',
+	Methods(
+		get=Method(
+			description='Get the notifications that failed to be delivered at least once'
+		),
+		post=Method(
+			description='Retry sending the notifications that exceeded the max amount of attempts'
+		),
+		delete=Method(
+			description='Delete the notifications that exceeded the max amount of attempts'
+		)
+	),
+	methods=['GET', 'POST', 'DELETE']
+)
+@endpoint_wrapper
+def api_admin_deliveries():
+	if request.method == 'GET':
+		return return_api(get_deliveries())
+
+	elif request.method == 'POST':
+		retry_failed_deliveries()
+		return return_api({}, code=201)
+
+	elif request.method == 'DELETE':
+		delete_failed_deliveries()
+		return return_api({})
+
+@admin_api.route(
+	'/deliveries/queue',
+	'Get the amount of notifications per notification service that are due but not sent yet, because of a rate limit or busy workers',
+	methods=['GET']
+)
+@endpoint_wrapper
+def api_admin_delivery_queue():
+	return return_api(get_delivery_queue())
+
+@admin_api.route(
+	'/metrics',
+	'Get measurements about how fast reminders are triggered and notifications are sent',
+	methods=['GET']
+)
+@endpoint_wrapper
+def api_admin_metrics():
+	return return_api(get_metrics())
+
+@admin_api.route(
+	'/queries',
+	'Interact with the statistics of database queries',
+	Methods(
+		get=Method(
+			description='Get the duration of the database queries per statement and calling function, and the most recent slow queries with their query plan'
+		),
+		delete=Method(
+			description='Reset the statistics'
+		)
+	),
+	methods=['GET', 'DELETE']
+)
+@endpoint_wrapper
+def api_admin_queries():
+	if request.method == 'GET':
+		return return_api(QUERY_STATS.get())
+
+	elif request.method == 'DELETE':
+		QUERY_STATS.clear()
+		return return_api({})
+
 @admin_api.route(
 	'/users',
-	'Get all users or add one',
+	'Get all users, add one or delete multiple',
 	Methods(
 		get=Method(
 			description='Get all users'
@@ -765,9 +954,13 @@ def api_admin_logs():
 		post=Method(
 			vars=[UsernameCreateVariable, PasswordCreateVariable],
 			description='Add a new user'
+		),
+		delete=Method(
+			vars=[UserIdsVariable],
+			description='Delete multiple user accounts at once. If one of them can not be deleted, none are.'
 		)
 	),
-	methods=['GET', 'POST']
+	methods=['GET', 'POST', 'DELETE']
 )
 @endpoint_wrapper
 def api_admin_users(inputs: Dict[str, Any]):
@@ -779,6 +972,15 @@ def api_admin_users(inputs: Dict[str, Any]):
 		users.add(inputs['username'], inputs['password'], True)
 		return return_api({}, code=201)
 
+	elif request.method == 'DELETE':
+		users.delete(inputs['user_ids'])
+		for key in [
+			k for k, v in api_key_map.items()
+			if v.user_data.user_id in inputs['user_ids']
+		]:
+			del api_key_map[key]
+		return return_api({})
+
 @admin_api.route(
 	'/users/<int:u_id>',
 	'Manage a specific user',
@@ -817,7 +1019,7 @@ def api_admin_user(inputs: Dict[str, Any], u_id: int):
 		),
 		post=Method(
 			vars=[DatabaseFileVariable, CopyHostingSettingsVariable],
-			description="Upload and apply a database file. Will automatically restart MIND."
+			description="Upload and apply a database file. The file is checked and migrated in the background, after which MIND automatically restarts. Follow the progress using `/database/import`."
 		)
 	),
 	methods=['GET', 'POST']
@@ -826,25 +1028,71 @@ def api_admin_user(inputs: Dict[str, Any], u_id: int):
 def api_admin_database(inputs: Dict[str, Any]):
 	if request.method == "GET":
 		current_date = datetime.now().strftime(r"%Y_%m_%d_%H_%M")
-		filename = folder_path(
-			'db', f'MIND_{current_date}.db'
-		)
-		get_db().execute(
-			"VACUUM INTO ?;",
-			(filename,)
+		fd, filename = mkstemp(
+			prefix='MIND_backup_', suffix='.db', dir=folder_path('db')
 		)
-
-		with open(filename, 'rb') as database_file:
-			bi = BytesIO(database_file.read())
-
-		remove(filename)
-
-		return send_file(
-			bi,
+		close(fd)
+		try:
+			backup_db(filename)
+			size = getsize(filename)
+		except BaseException:
+			remove(filename)
+			raise
+
+		def stream_file():
+			try:
+				with open(filename, 'rb') as database_file:
+					while True:
+						chunk = database_file.read(BACKUP_CHUNK_SIZE)
+						if not chunk:
+							break
+						yield chunk
+			finally:
+				remove(filename)
+
+		return Response(
+			stream_file(),
 			mimetype='application/x-sqlite3',
-			download_name=basename(filename)
+			headers={
+				'Content-Disposition':
+					f'attachment; filename=MIND_{current_date}.db',
+				'Content-Length': str(size)
+			}
 		), 200
 
 	elif request.method == "POST":
 		import_db(inputs['file'], inputs['copy_hosting_settings'])
-		return return_api({})
+		# The import has taken over the file, so it isn't removed after
+		# the request
+		request.uploads.remove(inputs['file'])
+		return return_api({}, code=202)
+
+@admin_api.route(
+	'/database/import',
+	'Get the status of the last database import. The uploaded database is checked and migrated before MIND restarts to use it.',
+	methods=['GET']
+)
+@endpoint_wrapper
+def api_admin_database_import():
+	return return_api(get_import_status())
+
+@admin_api.route(
+	'/database/maintenance',
+	'Interact with the database maintenance. It runs daily at the hour of the `database_maintenance_hour` setting.',
+	Methods(
+		get=Method(
+			description='Get when the maintenance runs next, and when it last ran with the size of the database and write-ahead log before and after'
+		),
+		post=Method(
+			description='Run the maintenance now'
+		)
+	),
+	methods=['GET', 'POST']
+)
+@endpoint_wrapper
+def api_admin_database_maintenance():
+	if request.method == 'GET':
+		return return_api(MaintenanceHandler().get_status())
+
+	elif request.method == 'POST':
+		return return_api(MaintenanceHandler().run())
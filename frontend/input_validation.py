@@ -9,6 +9,7 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 import logging
+from os import SEEK_END
 from os.path import splitext
 from re import compile
 from typing import TYPE_CHECKING, Any, Callable, Dict, List, Type, Union
@@ -23,8 +24,10 @@ from backend.custom_exceptions import (AccessUnauthorized, InvalidDatabaseFile,
                                        NotificationServiceNotFound,
                                        UsernameInvalid, UsernameTaken,
                                        UserNotFound)
-from backend.helpers import (RepeatQuantity, SortingMethod,
-                             TimelessSortingMethod, folder_path)
+from backend.db import MAX_IMPORT_SIZE
+from backend.helpers import (DatabaseProfile, MissedReminderPolicy,
+                             RepeatQuantity, SortingMethod,
+                             TimelessSortingMethod)
 from backend.server import SERVER
 from backend.settings import _format_setting
 
@@ -32,6 +35,7 @@ if TYPE_CHECKING:
 	from flask import Request
 
 color_regex = compile(r'#[0-9a-f]{6}')
+SQLITE_HEADER = b'SQLite format 3\x00'
 
 api_docs: Dict[str, ApiDocEntry] = {}
 
@@ -212,6 +216,23 @@ class NewPasswordVariable(BaseInputVariable):
 	related_exceptions = [KeyNotFound]
 
 
+class UserIdsVariable(BaseInputVariable):
+	name = 'user_ids'
+	description = "Array of the id's of the user accounts"
+	data_type = [DataType.INT_ARRAY]
+	related_exceptions = [KeyNotFound, InvalidKeyValue, UserNotFound]
+
+	def validate(self) -> bool:
+		if not isinstance(self.value, list):
+			return False
+		if not self.value:
+			return False
+		for v in self.value:
+			if not isinstance(v, int):
+				return False
+		return True
+
+
 class TitleVariable(BaseInputVariable):
 	name = 'title'
 	description = 'The title of the entry'
@@ -225,6 +246,28 @@ class URLVariable(BaseInputVariable):
 		return super().validate() and Apprise().add(self.value)
 
 
+class RateLimitVariable(NonRequiredVersion, BaseInputVariable):
+	name = 'rate_limit'
+	description = ('The max amount of notifications sent per minute. '
+	+ 'Notifications over the limit are delayed. 0 for no limit.')
+	data_type = [DataType.INT]
+	default = 0
+
+	def validate(self) -> bool:
+		return (
+			isinstance(self.value, int)
+			and not isinstance(self.value, bool)
+			and 0 <= self.value <= 10000
+		)
+
+
+class EditRateLimitVariable(RateLimitVariable):
+	default = None
+
+	def validate(self) -> bool:
+		return self.value is None or super().validate()
+
+
 class EditTitleVariable(NonRequiredVersion, TitleVariable):
 	pass
 
@@ -395,6 +438,51 @@ class QueryVariable(BaseInputVariable):
 	source = DataSource.VALUES
 
 
+class IncludeServicesVariable(NonRequiredVersion, BaseInputVariable):
+	name = 'include_services'
+	description = "Include the id's of the notification services of each entry."
+	source = DataSource.VALUES
+	default = 'false'
+	data_type = [DataType.BOOL]
+
+	def validate(self) -> bool:
+		if self.value == 'true':
+			self.value = True
+			return True
+
+		elif self.value == 'false':
+			self.value = False
+			return True
+
+		else:
+			return False
+
+
+class LimitVariable(NonRequiredVersion, BaseInputVariable):
+	name = 'limit'
+	description = ('Get a page of at most this many entries (1-1000), '
+	+ 'together with the cursor of the next page.')
+	source = DataSource.VALUES
+	data_type = [DataType.INT]
+
+	def validate(self) -> bool:
+		if self.value is None:
+			return True
+
+		if not (isinstance(self.value, str) and self.value.isdigit()):
+			return False
+
+		self.value = int(self.value)
+		return 1 <= self.value <= 1000
+
+
+class CursorVariable(NonRequiredVersion, BaseInputVariable):
+	name = 'cursor'
+	description = ('The `next_cursor` of the previous page, '
+	+ 'requested with the same sort_by.')
+	source = DataSource.VALUES
+
+
 class DeleteRemindersUsingVariable(NonRequiredVersion, BaseInputVariable):
 	name = 'delete_reminders_using'
 	description = 'Instead of throwing an error when there are still reminders using the service, delete the reminders.'
@@ -476,25 +564,165 @@ class LogLevelVariable(NonRequiredVersion, AdminSettingsVariable):
 		)
 
 
+class NotificationWorkersVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'notification_workers'
+	description = ('The maximum amount of notifications that are sent at the '
+	+ 'same time. Between 1 and 100.')
+	data_type = [DataType.INT]
+
+
+class NotificationTimeoutVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'notification_timeout'
+	description = ('How long to wait for a notification service to respond, '
+	+ 'in seconds. Between 1 and 300.')
+	data_type = [DataType.INT]
+
+
+class NotificationDigestVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'notification_digest'
+	description = ('Whether or not to combine the notifications of reminders '
+	+ 'of a user that are due at the same time and go to the same URL into '
+	+ 'one notification.')
+	data_type = [DataType.BOOL]
+
+
+class MissedReminderPolicyVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'missed_reminder_policy'
+	description = ('What to do with reminders that were missed while MIND '
+	+ 'was not running.')
+	data_type = [DataType.STR]
+	_options = [p.value for p in MissedReminderPolicy]
+
+	def __repr__(self) -> str:
+		return '| {n} | {r} | {t} | {d} | {v} |'.format(
+			n=self.name,
+			r="Yes" if self.required else "No",
+			t=",".join(self.data_type),
+			d=self.description,
+			v=", ".join(f'`{o}`' for o in self._options)
+		)
+
+
+class DatabasePoolSizeVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_pool_size'
+	description = ('The maximum amount of database connections that are open '
+	+ 'at the same time, for both reading and writing. Between 2 and 100.')
+	data_type = [DataType.INT]
+
+
+class DatabaseProfileVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_profile'
+	description = ('The performance profile of the database. Trades '
+	+ 'durability for speed. The individual database settings are only used '
+	+ 'with the `custom` profile.')
+	data_type = [DataType.STR]
+	_options = [p.value for p in DatabaseProfile]
+
+	def __repr__(self) -> str:
+		return '| {n} | {r} | {t} | {d} | {v} |'.format(
+			n=self.name,
+			r="Yes" if self.required else "No",
+			t=",".join(self.data_type),
+			d=self.description,
+			v=", ".join(f'`{o}`' for o in self._options)
+		)
+
+
+class DatabaseSynchronousVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_synchronous'
+	description = 'The value of the SQLite `synchronous` PRAGMA.'
+	data_type = [DataType.STR]
+	_options = ['off', 'normal', 'full', 'extra']
+
+	def __repr__(self) -> str:
+		return '| {n} | {r} | {t} | {d} | {v} |'.format(
+			n=self.name,
+			r="Yes" if self.required else "No",
+			t=",".join(self.data_type),
+			d=self.description,
+			v=", ".join(f'`{o}`' for o in self._options)
+		)
+
+
+class DatabaseCacheSizeVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_cache_size'
+	description = ('The size of the page cache per database connection, in '
+	+ 'MiB. Between 1 and 4096.')
+	data_type = [DataType.INT]
+
+
+class DatabaseMmapSizeVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_mmap_size'
+	description = ('The max amount of the database that is memory-mapped, in '
+	+ 'MiB. Between 0 (disabled) and 16384.')
+	data_type = [DataType.INT]
+
+
+class DatabaseTempStoreVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_temp_store'
+	description = 'Where temporary tables and indexes are stored.'
+	data_type = [DataType.STR]
+	_options = ['default', 'file', 'memory']
+
+	def __repr__(self) -> str:
+		return '| {n} | {r} | {t} | {d} | {v} |'.format(
+			n=self.name,
+			r="Yes" if self.required else "No",
+			t=",".join(self.data_type),
+			d=self.description,
+			v=", ".join(f'`{o}`' for o in self._options)
+		)
+
+
+class DatabaseBusyTimeoutVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_busy_timeout'
+	description = ('How long to wait for a lock on the database, in seconds. '
+	+ 'Between 0 and 300.')
+	data_type = [DataType.INT]
+
+
+class DatabaseWalAutocheckpointVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_wal_autocheckpoint'
+	description = ('The size of the write-ahead log, in pages, after which it '
+	+ 'is written to the database. Between 0 (disabled) and 100000.')
+	data_type = [DataType.INT]
+
+
+class DatabaseMaintenanceHourVariable(NonRequiredVersion, AdminSettingsVariable):
+	name = 'database_maintenance_hour'
+	description = ('The hour of the day, in the local time of the server, at '
+	+ 'which the database maintenance runs. Between 0 and 23.')
+	data_type = [DataType.INT]
+
+
 class DatabaseFileVariable(BaseInputVariable):
 	name = 'file'
-	description = 'The MIND database file'
+	description = 'The MIND database file. At most 4 GiB.'
 	data_type = [DataType.NA]
 	source = DataSource.FILES
 	related_exceptions = [KeyNotFound, InvalidDatabaseFile]
 
 	def validate(self) -> bool:
-		if (
+		if not (
 			self.value.filename
 			and splitext(self.value.filename)[1] == '.db'
 		):
-			path = folder_path('db', 'MIND_upload.db')
-			self.value.save(path)
-			self.value = path
-			return True
-		else:
 			return False
 
+		# The file is already written to the database folder by
+		# `backend.server.UploadRequest`, which also removes it again when it
+		# isn't imported
+		stream = self.value.stream
+		header = stream.read(len(SQLITE_HEADER))
+		size = stream.seek(0, SEEK_END)
+		stream.close()
+
+		if header != SQLITE_HEADER or size > MAX_IMPORT_SIZE:
+			return False
+
+		self.value = stream.name
+		return True
+
 
 class CopyHostingSettingsVariable(BaseInputVariable):
 	name = 'copy_hosting_settings'
@@ -2,7 +2,20 @@ const setting_inputs = {
 	allow_new_accounts: document.querySelector('#allow-new-accounts-input'),
 	login_time: document.querySelector('#login-time-input'),
 	login_time_reset: document.querySelector('#login-time-reset-input'),
-	log_level: document.querySelector('#log-level-input')
+	log_level: document.querySelector('#log-level-input'),
+	notification_workers: document.querySelector('#notification-workers-input'),
+	notification_timeout: document.querySelector('#notification-timeout-input'),
+	notification_digest: document.querySelector('#notification-digest-input'),
+	missed_reminder_policy: document.querySelector('#missed-reminder-policy-input'),
+	database_pool_size: document.querySelector('#database-pool-size-input'),
+	database_profile: document.querySelector('#database-profile-input'),
+	database_synchronous: document.querySelector('#database-synchronous-input'),
+	database_cache_size: document.querySelector('#database-cache-size-input'),
+	database_mmap_size: document.querySelector('#database-mmap-size-input'),
+	database_temp_store: document.querySelector('#database-temp-store-input'),
+	database_busy_timeout: document.querySelector('#database-busy-timeout-input'),
+	database_wal_autocheckpoint: document.querySelector('#database-wal-autocheckpoint-input'),
+	database_maintenance_hour: document.querySelector('#database-maintenance-hour-input')
 };
 
 const hosting_inputs = {
@@ -55,18 +68,52 @@ function loadSettings() {
 		setting_inputs.login_time.value = Math.round(json.result.login_time / 60);
 		setting_inputs.login_time_reset.value = json.result.login_time_reset.toString();
 		setting_inputs.log_level.value = json.result.log_level;
+		setting_inputs.notification_workers.value = json.result.notification_workers;
+		setting_inputs.notification_timeout.value = json.result.notification_timeout;
+		setting_inputs.notification_digest.checked = json.result.notification_digest;
+		setting_inputs.missed_reminder_policy.value = json.result.missed_reminder_policy;
+		setting_inputs.database_pool_size.value = json.result.database_pool_size;
+		setting_inputs.database_profile.value = json.result.database_profile;
+		setting_inputs.database_synchronous.value = json.result.database_synchronous;
+		setting_inputs.database_cache_size.value = json.result.database_cache_size;
+		setting_inputs.database_mmap_size.value = json.result.database_mmap_size;
+		setting_inputs.database_temp_store.value = json.result.database_temp_store;
+		setting_inputs.database_busy_timeout.value = json.result.database_busy_timeout;
+		setting_inputs.database_wal_autocheckpoint.value = json.result.database_wal_autocheckpoint;
+		setting_inputs.database_maintenance_hour.value = json.result.database_maintenance_hour;
+		toggleDatabaseInputs();
 		hosting_inputs.host.value = json.result.host;
 		hosting_inputs.port.value = json.result.port;
 		hosting_inputs.url_prefix.value = json.result.url_prefix;
 	});
 };
 
+function toggleDatabaseInputs() {
+	const custom = setting_inputs.database_profile.value === 'custom';
+	document.querySelectorAll('.database-custom-input').forEach(
+		i => i.disabled = !custom
+	);
+};
+
 function submitSettings() {
 	const data = {
 		'allow_new_accounts': setting_inputs.allow_new_accounts.checked,
 		'login_time': setting_inputs.login_time.value * 60,
 		'login_time_reset': setting_inputs.login_time_reset.value === 'true',
-		'log_level': parseInt(setting_inputs.log_level.value)
+		'log_level': parseInt(setting_inputs.log_level.value),
+		'notification_workers': parseInt(setting_inputs.notification_workers.value),
+		'notification_timeout': parseInt(setting_inputs.notification_timeout.value),
+		'notification_digest': setting_inputs.notification_digest.checked,
+		'missed_reminder_policy': setting_inputs.missed_reminder_policy.value,
+		'database_pool_size': parseInt(setting_inputs.database_pool_size.value),
+		'database_profile': setting_inputs.database_profile.value,
+		'database_synchronous': setting_inputs.database_synchronous.value,
+		'database_cache_size': parseInt(setting_inputs.database_cache_size.value),
+		'database_mmap_size': parseInt(setting_inputs.database_mmap_size.value),
+		'database_temp_store': setting_inputs.database_temp_store.value,
+		'database_busy_timeout': parseInt(setting_inputs.database_busy_timeout.value),
+		'database_wal_autocheckpoint': parseInt(setting_inputs.database_wal_autocheckpoint.value),
+		'database_maintenance_hour': parseInt(setting_inputs.database_maintenance_hour.value)
 	};
 	fetch(`${url_prefix}/api/admin/settings?api_key=${api_key}`, {
 		'method': 'PUT',
@@ -251,24 +298,49 @@ function upload_database() {
 	})
 	.then(response => {
 		if (!response.ok) return Promise.reject(response.status);
-		setTimeout(
-			() => window.location.reload(),
-			1000
-		);
+		checkImport();
 	})
 	.catch(e => {
-		if (e === 400) {
-			import_inputs.file.value = '';
-			import_inputs.button.innerText = 'Import Database';
-			setTimeout(
-				() => alert('Invalid database file'),
-				10
-			);
-		 } else
+		if (e === 400)
+			importFailed('Invalid database file');
+		else
 			console.log(e);
 	});
 };
 
+function checkImport() {
+	fetch(`${url_prefix}/api/admin/database/import?api_key=${api_key}`)
+	.then(response => response.json())
+	.then(json => {
+		if (json.result.state === 'failed')
+			importFailed(json.result.error);
+		else if (json.result.state === 'restarting')
+			setTimeout(
+				() => window.location.reload(),
+				1000
+			);
+		else {
+			import_inputs.button.innerText =
+				json.result.state === 'migrating' ? 'Migrating' : 'Checking';
+			setTimeout(checkImport, 1000);
+		};
+	})
+	// MIND is already restarting
+	.catch(e => setTimeout(
+		() => window.location.reload(),
+		1000
+	));
+};
+
+function importFailed(message) {
+	import_inputs.file.value = '';
+	import_inputs.button.innerText = 'Import Database';
+	setTimeout(
+		() => alert(message),
+		10
+	);
+};
+
 function restart_app() {
 	power_buttons.restart.innerText = 'Restarting...';
 	fetch(`${url_prefix}/api/admin/restart?api_key=${api_key}`, {
@@ -304,6 +376,7 @@ loadUsers();
 document.querySelector('#logout-button').onclick = e => logout();
 document.querySelector('#settings-form').action = 'javascript:submitSettings();';
 document.querySelector('#download-logs-button').onclick = e => downloadLogFile();
+setting_inputs.database_profile.onchange = e => toggleDatabaseInputs();
 hosting_inputs.form.action = 'javascript:submitHostingSettings();';
 document.querySelector('#add-user-button').onclick = e => toggleAddUser();
 document.querySelector('#add-user-form').action = 'javascript:addUser()';
@@ -66,7 +66,7 @@ function fillTable(table, results) {
 		const entry = document.createElement('button');
 		entry.classList.add('entry');
 		entry.dataset.id = r.id;
-		entry.onclick = e => showEdit(r.id, table);
+		entry.onclick = e => showEdit(r.id, table, r);
 		if (r.color !== null)
 			entry.style.setProperty('--color', r.color);
 
@@ -117,9 +117,9 @@ function fillLibrary(type=null) {
 	const sorting = getSorting(tab_type);
 	const query = LibEls.search_bar.input.value;
 	if (query)
-		url = `${url}/search?api_key=${api_key}&sort_by=${sorting}&query=${query}`;
+		url = `${url}/search?api_key=${api_key}&sort_by=${sorting}&query=${query}&include_services=true`;
 	else
-		url = `${url}?api_key=${api_key}&sort_by=${sorting}`;
+		url = `${url}?api_key=${api_key}&sort_by=${sorting}&include_services=true`;
 
 	fetch(url)
 	.then(response => {
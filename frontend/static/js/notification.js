@@ -29,6 +29,10 @@ function fillNotificationTable(json) {
 				saveService(service.id);
 		};
 
+		const rate_limit_input = entry.querySelector('.rate-limit-column input');
+		rate_limit_input.value = service.rate_limit;
+		rate_limit_input.onkeydown = url_input.onkeydown;
+
 		entry.querySelector('button[data-type="edit"]').onclick = e =>
 			document.querySelectorAll(`tr[data-id="${service.id}"] input`).forEach(
 				e => e.removeAttribute('readonly')
@@ -130,7 +134,8 @@ function saveService(id) {
 	const save_button = row.querySelector('button[data-type="save"]');
 	const data = {
 		'title': row.querySelector(`td.title-column > input`).value,
-		'url': row.querySelector(`td.url-column > input`).value
+		'url': row.querySelector(`td.url-column > input`).value,
+		'rate_limit': parseInt(row.querySelector(`td.rate-limit-column > input`).value) || 0
 	};
 	fetch(`${url_prefix}/api/notificationservices/${id}?api_key=${api_key}`, {
 		'method': 'PUT',
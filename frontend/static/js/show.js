@@ -41,7 +41,7 @@ function showAdd(type) {
 	showWindow('info');
 };
 
-function showEdit(id, type) {
+function showEdit(id, type, entry=null) {
 	let url;
 	if (type === Types.reminder) {
 		url = `${url_prefix}/api/reminders/${id}?api_key=${api_key}`;
@@ -57,11 +57,15 @@ function showEdit(id, type) {
 		type_buttons.repeat_interval.removeAttribute('required');
 	} else return;
 	
-	fetch(url)
-	.then(response => {
-		if (!response.ok) return Promise.reject(response.status);
-		return response.json();
-	})
+	// The library already has the entry, including its notification services
+	(entry !== null
+		? Promise.resolve({result: entry})
+		: fetch(url)
+		.then(response => {
+			if (!response.ok) return Promise.reject(response.status);
+			return response.json();
+		})
+	)
 	.then(json => {
 		document.getElementById('info').dataset.id = id;
 		inputs.color_toggle.checked = false;
@@ -4,6 +4,7 @@ from flask import Blueprint
 
 from backend.custom_exceptions import *
 from frontend.api import api, return_api
+from frontend.input_validation import CursorVariable, LimitVariable
 
 class Test_API(unittest.TestCase):
 	def test_blueprint(self):
@@ -22,4 +23,18 @@ class Test_API(unittest.TestCase):
 				self.assertEqual(result[1], case['code'])
 			else:
 				self.assertEqual(result[1], 200)
-	
\ No newline at end of file
+	
+	def test_page_variables(self):
+		for value, valid in (
+			(None, True), ('1', True), ('1000', True),
+			('0', False), ('1001', False), ('-1', False), ('a', False)
+		):
+			self.assertEqual(bool(LimitVariable(value).validate()), valid, value)
+
+		limit = LimitVariable('20')
+		limit.validate()
+		self.assertEqual(limit.value, 20)
+
+		self.assertTrue(CursorVariable(None).validate())
+		self.assertTrue(CursorVariable('WyJUSU1FIiwxXQ').validate())
+		self.assertFalse(CursorVariable('').validate())
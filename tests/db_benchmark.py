@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""
+Benchmark of the queries used to find the soonest reminder, with and without
+the time indexes added in database version 11.
+
+Run from the root of the project:
+	python3 tests/db_benchmark.py [ROWS ...]
+"""
+
+from argparse import ArgumentParser
+from random import randint, seed
+from sqlite3 import Connection, connect
+from time import perf_counter
+from typing import Callable, List, Union
+
+LEGACY_SOONEST_QUERY = """
+	SELECT DISTINCT r1.time
+	FROM reminders r1
+	LEFT JOIN reminders r2
+	ON r1.time > r2.time
+	WHERE r2.id IS NULL;
+"""
+SOONEST_QUERY = "SELECT time FROM reminders ORDER BY time LIMIT 1;"
+SCHEDULE_QUERY = "SELECT time, id FROM reminders ORDER BY time;"
+DUE_QUERY = "SELECT id FROM reminders WHERE time <= ?;"
+
+START_TIME = 1_700_000_000
+
+
+def create_database(rows: int) -> Connection:
+	"""Create an in-memory database with a reminders table filled with
+	random reminders.
+
+	Args:
+		rows (int): The amount of reminders to insert.
+
+	Returns:
+		Connection: The connection to the database.
+	"""
+	seed(rows)
+	db = connect(':memory:')
+	db.execute("""
+		CREATE TABLE reminders(
+			id INTEGER PRIMARY KEY,
+			user_id INTEGER NOT NULL,
+			title VARCHAR(255) NOT NULL,
+			text TEXT,
+			time INTEGER NOT NULL
+		);
+	""")
+	db.executemany(
+		"INSERT INTO reminders(user_id, title, text, time) VALUES (?, ?, ?, ?);",
+		(
+			(randint(1, 100), 'Title', 'Text', randint(START_TIME, START_TIME + 31_536_000))
+			for _ in range(rows)
+		)
+	)
+	db.commit()
+	return db
+
+
+def create_indexes(db: Connection) -> None:
+	"""Create the indexes of database version 11 that affect the reminders
+	table.
+
+	Args:
+		db (Connection): The connection to the database.
+	"""
+	db.executescript("""
+		CREATE INDEX reminders_time_index
+			ON reminders(time);
+		CREATE INDEX reminders_user_time_index
+			ON reminders(user_id, time);
+	""")
+	return
+
+
+def measure(to_run: Callable[[], object], repeat: int = 3) -> float:
+	"""Run a function multiple times and get the fastest run.
+
+	Args:
+		to_run (Callable[[], object]): The function to measure.
+		repeat (int, optional): How often to run the function.
+			Defaults to 3.
+
+	Returns:
+		float: The fastest run in milliseconds.
+	"""
+	result = float('inf')
+	for _ in range(repeat):
+		start = perf_counter()
+		to_run()
+		result = min(result, perf_counter() - start)
+	return result * 1000
+
+
+def run(rows: int, legacy_limit: int) -> List[Union[str, float]]:
+	"""Benchmark the queries on a database of a certain size.
+
+	Args:
+		rows (int): The amount of reminders in the database.
+		legacy_limit (int): Above this amount of rows, the legacy query is
+		not run, as it's quadratic in time.
+
+	Returns:
+		List[Union[str, float]]: The row of the result table.
+	"""
+	db = create_database(rows)
+	soonest = lambda q: lambda: db.execute(q).fetchone()
+	due = lambda: db.execute(DUE_QUERY, (START_TIME + 60,)).fetchall()
+	schedule = lambda: db.execute(SCHEDULE_QUERY).fetchall()
+
+	result: List[Union[str, float]] = [str(rows)]
+	if rows <= legacy_limit:
+		result.append(measure(soonest(LEGACY_SOONEST_QUERY), 1))
+	else:
+		result.append('skipped')
+	result.append(measure(soonest(SOONEST_QUERY)))
+	result.append(measure(due))
+	result.append(measure(schedule, 1))
+
+	create_indexes(db)
+	if rows <= legacy_limit:
+		result.append(measure(soonest(LEGACY_SOONEST_QUERY), 1))
+	else:
+		result.append('skipped')
+	result.append(measure(soonest(SOONEST_QUERY)))
+	result.append(measure(due))
+	result.append(measure(schedule, 1))
+
+	db.close()
+	return result
+
+
+def main() -> None:
+	parser = ArgumentParser(
+		description='Benchmark the soonest reminder lookup'
+	)
+	parser.add_argument(
+		'rows', type=int, nargs='*', default=[10_000, 100_000, 1_000_000],
+		help='The amount of reminders to benchmark with'
+	)
+	parser.add_argument(
+		'--legacy-limit', type=int, default=10_000,
+		help='Max amount of rows to run the legacy query on'
+	)
+	args = parser.parse_args()
+
+	header = (
+		'rows',
+		'self-join', 'soonest', 'due', 'load',
+		'self-join (idx)', 'soonest (idx)', 'due (idx)', 'load (idx)'
+	)
+	print('Time in ms')
+	print(' | '.join(f'{h:>15}' for h in header))
+	for rows in args.rows:
+		print(' | '.join(
+			f'{c:>15.3f}' if isinstance(c, float) else f'{c:>15}'
+			for c in run(rows, args.legacy_limit)
+		))
+	return
+
+if __name__ == '__main__':
+	main()
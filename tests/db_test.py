@@ -1,7 +1,16 @@
 import unittest
+from os.path import join
+from sqlite3 import Connection, OperationalError
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
-from backend.db import DB_FILENAME, DBConnection
-from backend.helpers import folder_path
+import backend.db
+from backend.custom_exceptions import InvalidKeyValue
+from backend.db import (DB_FILENAME, MIGRATIONS, ConnectionPool, DBConnection,
+                        __DATABASE_VERSION__, _import_db, get_import_status,
+                        get_page_cursor, get_page_sql)
+from backend.helpers import SortingMethod, folder_path
+from backend.server import SERVER
 
 
 class Test_DB(unittest.TestCase):
@@ -9,3 +18,150 @@ class Test_DB(unittest.TestCase):
 		DBConnection.file = folder_path(*DB_FILENAME)
 		instance = DBConnection(timeout=20.0)
 		self.assertEqual(instance.cursor().execute("PRAGMA foreign_keys;").fetchone()[0], 1)
+
+	def test_pool(self):
+		DBConnection.file = ':memory:'
+		pool = ConnectionPool('test', 1, 0.05)
+		db = pool.acquire()
+		self.assertRaises(OperationalError, pool.acquire)
+
+		pool.release(db)
+		self.assertIs(pool.acquire(), db)
+		pool.release(db)
+
+		db.close()
+		self.assertIsNot(pool.acquire(), db)
+
+	def test_migrations(self):
+		self.assertEqual(
+			sorted(MIGRATIONS),
+			list(range(1, __DATABASE_VERSION__))
+		)
+
+	def test_import_old_database(self):
+		SERVER.create_app()
+		with TemporaryDirectory() as folder:
+			file = join(folder, 'upload.db')
+			db = Connection(file)
+			db.executescript("""
+				CREATE TABLE users(
+					id INTEGER PRIMARY KEY,
+					username VARCHAR(255) UNIQUE NOT NULL,
+					salt VARCHAR(40) NOT NULL,
+					hash VARCHAR(100) NOT NULL
+				);
+				CREATE TABLE notification_services(
+					id INTEGER PRIMARY KEY,
+					user_id INTEGER NOT NULL,
+					title VARCHAR(255),
+					url TEXT
+				);
+				CREATE TABLE reminders(
+					id INTEGER PRIMARY KEY,
+					user_id INTEGER NOT NULL,
+					title VARCHAR(255) NOT NULL,
+					text TEXT,
+					time INTEGER NOT NULL,
+					notification_service INTEGER NOT NULL,
+					repeat_quantity VARCHAR(15),
+					repeat_interval INTEGER,
+					original_time INTEGER,
+					color VARCHAR(7)
+				);
+				CREATE TABLE templates(
+					id INTEGER PRIMARY KEY,
+					user_id INTEGER NOT NULL,
+					title VARCHAR(255) NOT NULL,
+					notification_service INTEGER NOT NULL,
+					text TEXT,
+					color VARCHAR(7)
+				);
+				CREATE TABLE config(
+					key VARCHAR(255) PRIMARY KEY,
+					value BLOB NOT NULL
+				);
+				INSERT INTO config VALUES ('database_version', 4);
+				INSERT INTO users VALUES (1, 'user', 'salt', 'hash');
+				INSERT INTO notification_services VALUES (1, 1, 'service', 'json://localhost');
+				INSERT INTO reminders VALUES (1, 1, 'reminder', '', 2000000000, 1, NULL, NULL, NULL, NULL);
+				INSERT INTO templates VALUES (1, 1, 'template', 1, '', NULL);
+			""")
+			db.close()
+
+			with patch.object(SERVER, 'restart') as restart:
+				_import_db(file, None)
+
+			self.assertEqual(get_import_status()['state'], 'restarting')
+			restart.assert_called_once()
+			backend.db._pending_import = None
+			backend.db._import_status.update(state='idle', error=None)
+
+			db = Connection(file)
+			self.assertEqual(
+				db.execute(
+					"SELECT value FROM config WHERE key = 'database_version';"
+				).fetchone()[0],
+				__DATABASE_VERSION__
+			)
+			self.assertEqual(
+				db.execute("""
+					SELECT reminder_id, template_id, notification_service_id
+					FROM reminder_services
+					ORDER BY reminder_id IS NULL;
+				""").fetchall(),
+				[(1, None, 1), (None, 1, 1)]
+			)
+			db.close()
+
+	def test_page_sql(self):
+		db = Connection(':memory:')
+		db.row_factory = lambda c, r: dict(zip((d[0] for d in c.description), r))
+		db.execute("CREATE TABLE entries(id INTEGER PRIMARY KEY, title, time);")
+		# Lots of ties, so that pages have to be split by the later columns
+		db.executemany(
+			"INSERT INTO entries(title, time) VALUES (?, ?);",
+			((f'title {i % 3}', i % 2) for i in range(11))
+		)
+
+		for sort_by in SortingMethod:
+			expected = [
+				r['id']
+				for r in db.execute(
+					"SELECT id FROM entries " + get_page_sql(sort_by)[1]
+				)
+			]
+			ids, cursor = [], None
+			while True:
+				condition, order_by, params = get_page_sql(sort_by, cursor)
+				page = db.execute(
+					f"SELECT * FROM entries WHERE 1 {condition} {order_by} LIMIT 2;",
+					params
+				).fetchall()
+				if not page:
+					break
+				ids += [r['id'] for r in page]
+				cursor = get_page_cursor(sort_by, page[-1])
+
+			self.assertEqual(ids, expected, sort_by.name)
+		db.close()
+
+	def test_page_sql_invalid_cursor(self):
+		for cursor in ('zzz', 'W10', '!!', 'e30', 'WyJUSU1FIiwxXQ'):
+			self.assertRaises(
+				InvalidKeyValue,
+				get_page_sql, SortingMethod.TIME, cursor
+			)
+
+		# Cursor of another sorting method
+		cursor = get_page_cursor(
+			SortingMethod.TIME, {'time': 1, 'title': 'a', 'id': 1}
+		)
+		self.assertEqual(get_page_sql(SortingMethod.TIME, cursor)[2], [1, 'a', 1])
+		self.assertRaises(
+			InvalidKeyValue,
+			get_page_sql, SortingMethod.TITLE, cursor
+		)
+		self.assertRaises(
+			InvalidKeyValue,
+			get_page_sql, SortingMethod.TIME_REVERSED, cursor
+		)
@@ -0,0 +1,46 @@
+import time
+import unittest
+from datetime import datetime
+from os import environ
+
+from backend.maintenance import _next_run
+
+
+@unittest.skipUnless(hasattr(time, 'tzset'), 'Requires time.tzset')
+class Test_Maintenance(unittest.TestCase):
+	def setUp(self):
+		self.tz = environ.get('TZ')
+		environ['TZ'] = 'Europe/Amsterdam'
+		time.tzset()
+
+	def tearDown(self):
+		if self.tz is None:
+			del environ['TZ']
+		else:
+			environ['TZ'] = self.tz
+		time.tzset()
+
+	def test_next_run(self):
+		now = datetime(2024, 6, 1, 12, 30).timestamp()
+		self.assertEqual(
+			datetime.fromtimestamp(_next_run(3, now)),
+			datetime(2024, 6, 2, 3)
+		)
+		self.assertEqual(
+			datetime.fromtimestamp(_next_run(13, now)),
+			datetime(2024, 6, 1, 13)
+		)
+
+	def test_next_run_dst(self):
+		# 02:00 doesn't exist on 31 March 2024
+		self.assertEqual(
+			datetime.fromtimestamp(
+				_next_run(2, datetime(2024, 3, 30, 12).timestamp())
+			),
+			datetime(2024, 3, 31, 3)
+		)
+
+		# 02:00 happens twice on 27 October 2024, only the first one counts
+		first = _next_run(2, datetime(2024, 10, 26, 12).timestamp())
+		second = _next_run(2, first)
+		self.assertEqual(second - first, 25 * 3600)
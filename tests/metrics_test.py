@@ -0,0 +1,71 @@
+import unittest
+from types import SimpleNamespace
+
+from backend.db import _get_caller, _normalise_statement
+from backend.metrics import Counter, Histogram, QueryStats
+
+
+class Test_Metrics(unittest.TestCase):
+	def test_histogram(self):
+		h = Histogram('test_histogram', '', (1, 5, 10), ('service',))
+		for v in (0.5, 1, 3, 7, 20):
+			h.observe(v, 'json')
+		h.observe(2, 'ntfy')
+
+		result = {v['labels']['service']: v for v in h.get()}
+		self.assertEqual(
+			[b['count'] for b in result['json']['buckets']],
+			[2, 3, 4, 5]
+		)
+		self.assertEqual(result['json']['buckets'][-1]['le'], '+Inf')
+		self.assertEqual(result['json']['count'], 5)
+		self.assertEqual(result['json']['sum'], 31.5)
+		self.assertEqual(result['json']['max'], 20)
+		self.assertEqual(result['ntfy']['count'], 1)
+
+	def test_counter(self):
+		c = Counter('test_counter', '', ('service', 'outcome'))
+		c.increase('json', 'success')
+		c.increase('json', 'success', amount=2)
+		c.increase('json', 'failure')
+		self.assertEqual(
+			sorted((v['labels']['outcome'], v['value']) for v in c.get()),
+			[('failure', 1), ('success', 3)]
+		)
+
+	def test_query_stats(self):
+		stats = QueryStats(10, 2)
+		for length in (1, 2, 3):
+			stats.observe(
+				'caller',
+				_normalise_statement(
+					f"SELECT id FROM outbox WHERE id NOT IN ({','.join('?' * length)});"
+				),
+				1.0
+			)
+		stats.observe('caller', 'SELECT 1;', 1.0)
+		stats.observe('caller', 'SELECT 2;', 1.0)
+
+		result = {
+			(s['caller'], s['statement']): s['count']
+			for s in stats.get()['statements']
+		}
+		self.assertEqual(result, {
+			('caller', 'SELECT id FROM outbox WHERE id NOT IN (?, ...);'): 3,
+			('caller', 'SELECT 1;'): 1,
+			QueryStats.OTHER: 1
+		})
+
+	def test_caller(self):
+		class Reminders:
+			pass
+
+		# Frames of Python 3.10 and lower don't have co_qualname
+		frame = SimpleNamespace(
+			f_code=SimpleNamespace(co_name='fetchall'),
+			f_locals={'self': Reminders()}
+		)
+		self.assertEqual(_get_caller(frame), 'Reminders.fetchall')
+
+		frame.f_locals = {}
+		self.assertEqual(_get_caller(frame), 'fetchall')
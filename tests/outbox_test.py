@@ -0,0 +1,152 @@
+import unittest
+from os.path import join
+from sqlite3 import OperationalError
+from tempfile import TemporaryDirectory
+from time import sleep
+from unittest.mock import patch
+
+from backend.db import DBConnection, close_db, close_pools, get_db, setup_db
+from backend.outbox import (BACKOFF_BASE, BACKOFF_MAX, MAX_ATTEMPTS,
+                            RATE_LIMIT_BURST, DeliveryHandler, TokenBucket)
+from backend.server import SERVER
+
+
+class Test_Outbox(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.folder = TemporaryDirectory()
+		close_pools()
+		DBConnection.file = join(cls.folder.name, 'MIND.db')
+		SERVER.create_app()
+		cls.context = SERVER.app.app_context
+		cls.handler = DeliveryHandler(cls.context)
+		cls.handler.context = cls.context
+		with cls.context():
+			setup_db()
+			cursor = get_db()
+			cursor.execute("""
+				INSERT INTO users(id, username, salt, hash)
+				VALUES (100, 'outbox', 'salt', 'hash');
+			""")
+			cursor.execute("""
+				INSERT INTO notification_services(id, user_id, title, url)
+				VALUES (100, 100, 'service', 'json://localhost');
+			""")
+			close_db()
+
+	@classmethod
+	def tearDownClass(cls):
+		close_pools()
+		cls.folder.cleanup()
+
+	def tearDown(self):
+		with self.context():
+			get_db().execute("DELETE FROM outbox;")
+			close_db()
+
+	def add_delivery(self, attempts: int = 0) -> int:
+		return get_db().execute("""
+			INSERT INTO outbox(
+				notification_service_id,
+				title, text,
+				attempts,
+				next_attempt,
+				created
+			)
+			VALUES (100, 'Title', '', ?, 0, 0);
+			""",
+			(attempts,)
+		).lastrowid
+
+	def process_results(self, results: list, now: int) -> None:
+		with self.context():
+			self.handler._DeliveryHandler__process_results(results, now)
+			close_db()
+
+	def get_delivery(self, delivery_id: int) -> tuple:
+		with self.context():
+			result = get_db().execute("""
+				SELECT attempts, failed, next_attempt, last_attempt, last_error
+				FROM outbox
+				WHERE id = ?;
+				""",
+				(delivery_id,)
+			).fetchone()
+			close_db()
+		return result and tuple(result)
+
+	def test_results_kept_on_failure(self):
+		self.handler.results = [(1, None), (2, 'error')]
+		with patch.object(
+			self.handler,
+			'_DeliveryHandler__process_results',
+			side_effect=OperationalError('database is locked')
+		):
+			self.handler.start_handling()
+			sleep(0.2)
+			self.handler.stop_handling()
+
+		self.assertEqual(self.handler.results, [(1, None), (2, 'error')])
+		self.handler.results = []
+
+	def test_retry_backoff(self):
+		with self.context():
+			delivery_id = self.add_delivery()
+			close_db()
+
+		now = 1_000_000
+		for attempt in range(1, MAX_ATTEMPTS + 1):
+			self.process_results([(delivery_id, 'error')], now)
+			self.assertEqual(
+				self.get_delivery(delivery_id),
+				(
+					attempt,
+					int(attempt == MAX_ATTEMPTS),
+					now + (BACKOFF_BASE << (attempt - 1)),
+					now,
+					'error'
+				)
+			)
+
+		# Backoff is capped
+		with self.context():
+			delivery_id = self.add_delivery(attempts=20)
+			close_db()
+		self.process_results([(delivery_id, 'error')], now)
+		self.assertEqual(
+			self.get_delivery(delivery_id)[:3],
+			(21, 1, now + BACKOFF_MAX)
+		)
+
+		# Successful deliveries are removed
+		with self.context():
+			delivery_id = self.add_delivery(attempts=2)
+			close_db()
+		self.process_results([(delivery_id, None)], now)
+		self.assertIsNone(self.get_delivery(delivery_id))
+
+	def test_token_bucket(self):
+		clock = [100.0]
+		with patch('backend.outbox.monotonic', side_effect=lambda: clock[0]):
+			bucket = TokenBucket(2)
+			self.assertEqual(bucket.capacity, 2)
+			self.assertTrue(bucket.take())
+			self.assertTrue(bucket.take())
+			self.assertFalse(bucket.take())
+			self.assertEqual(bucket.wait_time(), 30.0)
+
+			clock[0] += 15
+			self.assertFalse(bucket.take())
+			self.assertEqual(bucket.wait_time(), 15.0)
+
+			clock[0] += 15
+			self.assertTrue(bucket.take())
+			self.assertFalse(bucket.take())
+
+			# Tokens don't pile up beyond the burst size
+			clock[0] += 3600
+			for _ in range(bucket.capacity):
+				self.assertTrue(bucket.take())
+			self.assertFalse(bucket.take())
+
+			self.assertEqual(TokenBucket(60).capacity, RATE_LIMIT_BURST)
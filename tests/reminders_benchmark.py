@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""
+Micro-benchmark of `_find_next_time`, compared to the loop based
+implementation it replaced, for reminders of different ages and intervals.
+
+Run from the root of the project:
+	python3 tests/reminders_benchmark.py
+"""
+
+from os.path import dirname
+from sys import path
+
+path.insert(0, dirname(path[0]))
+
+from argparse import ArgumentParser
+from datetime import datetime
+from time import perf_counter
+from typing import Callable
+
+from backend.helpers import RepeatQuantity
+from backend.logging import LOGGER
+from backend.reminders import _find_next_time
+from reminders_test import legacy_find_next_time
+
+DAY = 86_400
+AGES = (
+	('1 day', DAY),
+	('30 days', 30 * DAY),
+	('1 year', 365 * DAY),
+	('5 years', 5 * 365 * DAY)
+)
+INTERVALS = (
+	(RepeatQuantity.MINUTES, 1),
+	(RepeatQuantity.MINUTES, 30),
+	(RepeatQuantity.HOURS, 1),
+	(RepeatQuantity.DAYS, 1),
+	(RepeatQuantity.WEEKS, 1),
+	(RepeatQuantity.MONTHS, 1),
+	(RepeatQuantity.YEARS, 1)
+)
+
+
+def measure(to_run: Callable[[], object], max_time: float) -> float:
+	"""Run a function repeatedly and get the average duration of a run.
+
+	Args:
+		to_run (Callable[[], object]): The function to measure.
+		max_time (float): Stop repeating after this many seconds.
+
+	Returns:
+		float: The average run in microseconds.
+	"""
+	runs = 0
+	start = perf_counter()
+	while True:
+		to_run()
+		runs += 1
+		duration = perf_counter() - start
+		if duration >= max_time or runs >= 10_000:
+			break
+	return duration / runs * 1_000_000
+
+
+def main() -> None:
+	parser = ArgumentParser(
+		description='Benchmark the calculation of the next time of a repeating reminder'
+	)
+	parser.add_argument(
+		'--max-time', type=float, default=0.5,
+		help='Max amount of seconds to spend per measurement'
+	)
+	args = parser.parse_args()
+
+	# Don't let debug logging influence the result
+	LOGGER.disabled = True
+	now = int(datetime.utcnow().timestamp())
+
+	print('Time in µs')
+	print(' | '.join(
+		f'{h:>12}'
+		for h in ('interval', 'age', 'loop', 'closed-form', 'speedup')
+	))
+	for quantity, interval in INTERVALS:
+		for age_name, age in AGES:
+			original_time = now - age
+			legacy = measure(
+				lambda: legacy_find_next_time(original_time, quantity, interval, None),
+				args.max_time
+			)
+			new = measure(
+				lambda: _find_next_time(original_time, quantity, interval, None),
+				args.max_time
+			)
+			print(' | '.join((
+				f'{f"{interval} {quantity.value}":>12}',
+				f'{age_name:>12}',
+				f'{legacy:>12.1f}',
+				f'{new:>12.1f}',
+				f'{legacy / new:>11.0f}x'
+			)))
+
+	for age_name, age in AGES:
+		original_time = now - age
+		legacy = measure(
+			lambda: legacy_find_next_time(original_time, None, None, [0, 3]),
+			args.max_time
+		)
+		new = measure(
+			lambda: _find_next_time(original_time, None, None, 0b1001),
+			args.max_time
+		)
+		print(' | '.join((
+			f'{"mon, thu":>12}',
+			f'{age_name:>12}',
+			f'{legacy:>12.1f}',
+			f'{new:>12.1f}',
+			f'{legacy / new:>11.0f}x'
+		)))
+	return
+
+if __name__ == '__main__':
+	main()
@@ -1,6 +1,67 @@
 import unittest
+from datetime import datetime
+from os.path import join
+from sqlite3 import connect
+from random import Random
+from tempfile import TemporaryDirectory
+from typing import List, Union
+from unittest.mock import patch
+
+from dateutil.relativedelta import relativedelta
+from dateutil.relativedelta import weekday as du_weekday
+
+from backend.db import DBConnection, close_db, close_pools, get_db, setup_db
+from backend.helpers import (MissedReminderPolicy, RepeatQuantity,
+                             mask_to_weekdays, search_filter,
+                             weekdays_to_mask)
+from backend.outbox import DeliveryHandler
+from backend.reminders import Reminder, ReminderHandler, _find_next_time
+from backend.server import SERVER
+from backend.settings import set_setting
+
+
+def legacy_find_next_time(
+	original_time: int,
+	repeat_quantity: Union[RepeatQuantity, None],
+	repeat_interval: Union[int, None],
+	weekdays: Union[List[int], None]
+) -> int:
+	"""The loop based implementation of `_find_next_time`, used as reference.
+	"""
+	if weekdays is not None:
+		weekdays.sort()
+
+	new_time = datetime.fromtimestamp(original_time)
+	current_time = datetime.fromtimestamp(datetime.utcnow().timestamp())
+
+	if repeat_quantity is not None:
+		td = relativedelta(**{repeat_quantity.value: repeat_interval})
+		while new_time <= current_time:
+			new_time += td
+
+	elif weekdays is not None:
+		one_to_go = True
+		while one_to_go or new_time <= current_time:
+			next_day = (
+				[d for d in weekdays if new_time.weekday() < d]
+				or weekdays
+			)[0]
+			proposed_time = new_time + relativedelta(weekday=du_weekday(next_day))
+			if proposed_time == new_time:
+				proposed_time += relativedelta(weekday=du_weekday(next_day, 2))
+			new_time = proposed_time
+			one_to_go = False
+
+	return int(new_time.timestamp())
+
+
+def frozen_datetime(timestamp: float) -> type:
+	class FrozenDatetime(datetime):
+		@classmethod
+		def utcnow(cls):
+			return cls.fromtimestamp(timestamp)
+	return FrozenDatetime
 
-from backend.helpers import search_filter
 
 class Test_Reminder_Handler(unittest.TestCase):
 	def test_filter_function(self):
@@ -12,3 +73,266 @@ class Test_Reminder_Handler(unittest.TestCase):
 			self.assertTrue(search_filter(test_case, p))
 		for test_case in (' ', 'Hello'):
 			self.assertFalse(search_filter(test_case, p))
+
+	def test_find_next_time(self):
+		rng = Random(0)
+		now = 1_700_000_000.5
+		# The max age of the original time is limited to keep the
+		# legacy loop fast
+		intervals = (
+			(RepeatQuantity.MINUTES, (1, 7, 90), 200_000),
+			(RepeatQuantity.HOURS, (1, 5, 36), 5_000_000),
+			(RepeatQuantity.DAYS, (1, 3, 45), 100_000_000),
+			(RepeatQuantity.WEEKS, (1, 2, 9), 400_000_000),
+			(RepeatQuantity.MONTHS, (1, 2, 5, 12, 13), 1_400_000_000),
+			(RepeatQuantity.YEARS, (1, 3, 4), 1_400_000_000)
+		)
+		with patch('backend.reminders.datetime', frozen_datetime(now)), \
+			patch(__name__ + '.datetime', frozen_datetime(now)):
+			for _ in range(40):
+				for quantity, values, max_age in intervals:
+					for interval in values:
+						original_times = [
+							rng.randint(int(now) - max_age, int(now) + 100_000)
+						]
+						if max_age >= 100_000_000:
+							# Month ends and leap days to test clipping
+							original_times += [
+								int(datetime(
+									rng.randint(1980, 2023),
+									rng.choice((1, 3, 8)),
+									rng.choice((29, 30, 31)),
+									12
+								).timestamp()),
+								int(datetime(
+									rng.choice((1988, 1996, 2000, 2020)),
+									2, 29, 8
+								).timestamp())
+							]
+
+						for original_time in original_times:
+							if now - original_time > max_age:
+								continue
+							self.assertEqual(
+								_find_next_time(original_time, quantity, interval, None),
+								legacy_find_next_time(original_time, quantity, interval, None),
+								(original_time, quantity, interval)
+							)
+
+				original_time = rng.randint(int(now) - 400_000_000, int(now) + 1_000_000)
+				weekdays = rng.sample(range(7), rng.randint(1, 7))
+				self.assertEqual(
+					_find_next_time(original_time, None, None, weekdays_to_mask(weekdays)),
+					legacy_find_next_time(original_time, None, None, list(weekdays)),
+					(original_time, weekdays)
+				)
+
+			# Exactly on the current time and right before and after it
+			for original_time in (int(now) - 86400, int(now), int(now) + 1):
+				for quantity, values, _ in intervals:
+					self.assertEqual(
+						_find_next_time(original_time, quantity, values[0], None),
+						legacy_find_next_time(original_time, quantity, values[0], None)
+					)
+				for weekday in range(7):
+					self.assertEqual(
+						_find_next_time(original_time, None, None, 1 << weekday),
+						legacy_find_next_time(original_time, None, None, [weekday])
+					)
+
+	def test_weekday_mask(self):
+		for weekdays in ([0], [6], [0, 3], [1, 2, 4, 5, 6], list(range(7))):
+			self.assertEqual(mask_to_weekdays(weekdays_to_mask(weekdays)), weekdays)
+		self.assertEqual(weekdays_to_mask([0, 3]), 0b1001)
+
+	def test_batch(self):
+		handler = ReminderHandler(None)
+		handler.heap, handler.times = [], {}
+		with patch.object(handler.condition, 'notify') as notify:
+			with handler.batch():
+				for i in range(100):
+					handler.schedule(i, 1000 + i)
+				with handler.batch():
+					handler.unschedule(0)
+				self.assertEqual(handler.times, {})
+			self.assertEqual(notify.call_count, 1)
+
+		self.assertNotIn(0, handler.times)
+		self.assertEqual(len(handler.times), 99)
+		self.assertEqual(handler.heap[0], (1001, 1))
+
+
+class Test_Reminder_Firing(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.folder = TemporaryDirectory()
+		close_pools()
+		DBConnection.file = join(cls.folder.name, 'MIND.db')
+		SERVER.create_app()
+		cls.context = SERVER.app.app_context
+		cls.handler = ReminderHandler(cls.context)
+		cls.handler.context = cls.context
+		DeliveryHandler(cls.context)
+		with cls.context():
+			setup_db()
+			cursor = get_db()
+			cursor.execute("""
+				INSERT INTO users(id, username, salt, hash)
+				VALUES (100, 'firing', 'salt', 'hash');
+			""")
+			cursor.execute("""
+				INSERT INTO notification_services(id, user_id, title, url)
+				VALUES (100, 100, 'service', 'json://localhost');
+			""")
+			close_db()
+
+	@classmethod
+	def tearDownClass(cls):
+		close_pools()
+		cls.folder.cleanup()
+
+	def tearDown(self):
+		with self.context():
+			cursor = get_db()
+			cursor.execute("DELETE FROM reminders;")
+			cursor.execute("DELETE FROM outbox;")
+			set_setting('notification_digest', False)
+			set_setting(
+				'missed_reminder_policy',
+				MissedReminderPolicy.COLLAPSE.value
+			)
+			close_db()
+
+	def add_reminder(
+		self,
+		title: str,
+		time: int,
+		repeat_quantity: Union[RepeatQuantity, None] = None
+	) -> int:
+		cursor = get_db()
+		reminder_id = cursor.execute("""
+			INSERT INTO reminders(
+				user_id, title, text, time,
+				repeat_quantity, repeat_interval, original_time
+			)
+			VALUES (100, ?, '', ?, ?, ?, ?);
+			""",
+			(
+				title, time,
+				repeat_quantity and repeat_quantity.value,
+				repeat_quantity and 1,
+				repeat_quantity and time
+			)
+		).lastrowid
+		cursor.execute("""
+			INSERT INTO reminder_services(reminder_id, notification_service_id)
+			VALUES (?, 100);
+			""",
+			(reminder_id,)
+		)
+		return reminder_id
+
+	def catch_up(self) -> List[tuple]:
+		self.handler._ReminderHandler__catch_up()
+		with self.context():
+			result = get_db().execute("""
+				SELECT reminder_id, title, text
+				FROM outbox
+				ORDER BY id;
+			""").fetchall()
+			close_db()
+		return result
+
+	def test_digest(self):
+		now = int(datetime.utcnow().timestamp())
+		with self.context():
+			set_setting('notification_digest', True)
+			set_setting('missed_reminder_policy', MissedReminderPolicy.EACH.value)
+			repeating = self.add_reminder(
+				'Repeating', now - 150, RepeatQuantity.MINUTES
+			)
+			self.add_reminder('Once', now - 10)
+			close_db()
+
+		result = self.catch_up()
+		self.assertEqual(len(result), 1)
+		self.assertEqual(result[0][:2], (None, '2 reminders'))
+		self.assertEqual(
+			result[0][2],
+			'\n\n'.join(('Repeating', 'Repeating', 'Repeating', 'Once'))
+		)
+
+		# Occurrences of one reminder are counted as one reminder
+		with self.context():
+			get_db().execute(
+				"UPDATE reminders SET time = ? WHERE id = ?;",
+				(now - 90, repeating)
+			)
+			get_db().execute("DELETE FROM outbox;")
+			close_db()
+
+		result = self.catch_up()
+		self.assertEqual(len(result), 1)
+		self.assertEqual(result[0][:2], (repeating, 'Repeating'))
+
+	def get_times(self) -> dict:
+		with self.context():
+			result = dict(get_db().execute(
+				"SELECT title, time FROM reminders;"
+			).fetchall())
+			close_db()
+		return result
+
+	def test_catch_up_collapse(self):
+		now = int(datetime.utcnow().timestamp())
+		with self.context():
+			self.add_reminder('Repeating', now - 150, RepeatQuantity.MINUTES)
+			self.add_reminder('Once', now - 10)
+			close_db()
+
+		# Missed occurrences of a repeating reminder are sent once
+		result = self.catch_up()
+		self.assertEqual(
+			[r[1] for r in result],
+			['Repeating', 'Once']
+		)
+		times = self.get_times()
+		self.assertEqual(list(times), ['Repeating'])
+		self.assertGreater(times['Repeating'], now)
+
+	def test_catch_up_skip(self):
+		now = int(datetime.utcnow().timestamp())
+		with self.context():
+			set_setting('missed_reminder_policy', MissedReminderPolicy.SKIP.value)
+			self.add_reminder('Repeating', now - 150, RepeatQuantity.MINUTES)
+			self.add_reminder('Once', now - 10)
+			close_db()
+
+		# Nothing is sent, but the reminders are still moved along
+		self.assertEqual(self.catch_up(), [])
+		times = self.get_times()
+		self.assertEqual(list(times), ['Repeating'])
+		self.assertGreater(times['Repeating'], now)
+
+	def test_update_committed_before_schedule(self):
+		time = int(datetime.utcnow().timestamp()) + 3600
+		with self.context():
+			reminder_id = self.add_reminder('Old', time)
+			close_db()
+
+		seen = []
+		def schedule(reminder_id, time):
+			db = connect(DBConnection.file)
+			seen.extend(db.execute(
+				"SELECT title, time FROM reminders WHERE id = ?;",
+				(reminder_id,)
+			).fetchall())
+			db.close()
+
+		with self.context(), patch.object(
+			self.handler, 'schedule', side_effect=schedule
+		):
+			Reminder(100, reminder_id).update(title='New', time=time + 60)
+			close_db()
+
+		self.assertEqual(seen, [('New', time + 60)])
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""
+Benchmark of the reminder scheduler on a generated database. It fills a
+temporary database with users and a mix of normal, repeating and weekday
+reminders, and measures loading the schedule, changing it, triggering due
+reminders, delivering their notifications and `_find_next_time`.
+Notifications are sent to a local HTTP server that does nothing, using
+json:// URLs.
+
+The results are written as JSON, so that they can be compared between
+versions.
+
+Run from the root of the project:
+	python3 tests/scheduler_benchmark.py --reminders 100000 --output result.json
+"""
+
+from os.path import dirname
+from sys import path
+
+path.insert(0, dirname(path[0]))
+
+from argparse import ArgumentParser
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dump
+from os.path import join
+from platform import platform, python_version
+from random import Random
+from sqlite3 import sqlite_version
+from sys import stdout
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from backend.db import DBConnection, close_db, get_db, setup_db
+from backend.helpers import RepeatQuantity, weekdays_to_mask
+from backend.logging import LOGGER
+from backend.outbox import DeliveryHandler
+from backend.reminders import ReminderHandler, _find_next_time
+from backend.server import SERVER
+from backend.settings import set_setting
+
+YEAR = 31_536_000
+REPEAT_INTERVALS = (
+	(RepeatQuantity.MINUTES, (5, 15, 30)),
+	(RepeatQuantity.HOURS, (1, 2, 12)),
+	(RepeatQuantity.DAYS, (1, 2, 7)),
+	(RepeatQuantity.WEEKS, (1, 2)),
+	(RepeatQuantity.MONTHS, (1, 3, 6)),
+	(RepeatQuantity.YEARS, (1,))
+)
+
+
+class NoOpHandler(BaseHTTPRequestHandler):
+	"""Accept every notification and do nothing with it"""
+	def do_POST(self) -> None:
+		self.rfile.read(int(self.headers.get('Content-Length', 0)))
+		self.send_response(200)
+		self.end_headers()
+		return
+
+	def log_message(self, *args: Any) -> None:
+		return
+
+
+def generate_data(
+	users: int,
+	reminders: int,
+	url: str,
+	rng: Random
+) -> List[Tuple[int, Union[RepeatQuantity, None], Union[int, None], Union[int, None]]]:
+	"""Fill the database with users, a notification service per user and
+	reminders, of which 50% are normal, 30% repeat with an interval and 20%
+	repeat on weekdays.
+
+	Args:
+		users (int): The amount of users to add.
+		reminders (int): The amount of reminders to add.
+		url (str): The Apprise URL of the notification services.
+		rng (Random): The random generator to use.
+
+	Returns:
+		List[Tuple[int, Union[RepeatQuantity, None], Union[int, None], Union[int, None]]]:
+		The arguments for `_find_next_time` of the repeating reminders: the
+		original time, repeat quantity, repeat interval and weekday mask.
+	"""
+	cursor = get_db()
+	now = int(datetime.utcnow().timestamp())
+
+	first_user = cursor.execute("SELECT MAX(id) FROM users;").fetchone()[0] + 1
+	cursor.executemany(
+		"INSERT INTO users(username, salt, hash) VALUES (?, '', '');",
+		((f'benchmark_user_{u}',) for u in range(users))
+	)
+	cursor.executemany(
+		"INSERT INTO notification_services(user_id, title, url) VALUES (?, 'Benchmark', ?);",
+		((u, url) for u in range(first_user, first_user + users))
+	)
+	# Notification service ID's are equal to the user ID's minus this offset
+	service_offset = cursor.execute(
+		"SELECT MIN(id) FROM notification_services WHERE user_id >= ?;",
+		(first_user,)
+	).fetchone()[0] - first_user
+
+	rows = []
+	repeats = []
+	for r in range(reminders):
+		user_id = rng.randrange(first_user, first_user + users)
+		time = now + rng.randint(3600, YEAR)
+		kind = rng.random()
+		if kind < 0.5:
+			rows.append((user_id, f'Reminder {r}', time, None, None, None, None))
+			continue
+
+		original_time = time - rng.randint(0, YEAR)
+		if kind < 0.8:
+			quantity, intervals = rng.choice(REPEAT_INTERVALS)
+			interval = rng.choice(intervals)
+			rows.append((
+				user_id, f'Reminder {r}', time,
+				quantity.value, interval, original_time, None
+			))
+			repeats.append((original_time, quantity, interval, None))
+
+		else:
+			weekdays = weekdays_to_mask(rng.sample(range(7), rng.randint(1, 7)))
+			rows.append((
+				user_id, f'Reminder {r}', time,
+				None, None, original_time, weekdays
+			))
+			repeats.append((original_time, None, None, weekdays))
+
+	first_reminder = (cursor.execute(
+		"SELECT MAX(id) FROM reminders;"
+	).fetchone()[0] or 0) + 1
+	cursor.executemany("""
+		INSERT INTO reminders(
+			user_id, title, time,
+			repeat_quantity, repeat_interval, original_time, weekdays
+		)
+		VALUES (?, ?, ?, ?, ?, ?, ?);
+		""",
+		rows
+	)
+	cursor.executemany("""
+		INSERT INTO reminder_services(reminder_id, notification_service_id)
+		VALUES (?, ?);
+		""",
+		(
+			(first_reminder + i, row[0] + service_offset)
+			for i, row in enumerate(rows)
+		)
+	)
+	return repeats
+
+
+def measure(to_run: Callable[[], object], runs: int = 1) -> Dict[str, float]:
+	"""Run a function and time it.
+
+	Args:
+		to_run (Callable[[], object]): The function to measure.
+		runs (int, optional): The amount of operations that the function does.
+			Defaults to 1.
+
+	Returns:
+		Dict[str, float]: The total time in ms and the time per operation
+		in µs.
+	"""
+	start = perf_counter()
+	to_run()
+	duration = perf_counter() - start
+	return {
+		'operations': runs,
+		'total_ms': round(duration * 1000, 3),
+		'per_operation_us': round(duration / runs * 1_000_000, 3)
+	}
+
+
+def main() -> None:
+	parser = ArgumentParser(
+		description='Benchmark the reminder scheduler on a generated database'
+	)
+	parser.add_argument(
+		'--users', type=int, default=100,
+		help='The amount of users to generate'
+	)
+	parser.add_argument(
+		'--reminders', type=int, default=100_000,
+		help='The amount of reminders to generate'
+	)
+	parser.add_argument(
+		'--due', type=int, default=1000,
+		help='The amount of reminders to trigger at once'
+	)
+	parser.add_argument(
+		'--workers', type=int, default=10,
+		help='The value of the notification_workers setting'
+	)
+	parser.add_argument(
+		'--seed', type=int, default=0,
+		help='The seed of the data generator'
+	)
+	parser.add_argument(
+		'--output', type=str, default=None,
+		help='The file to write the results to. Defaults to stdout.'
+	)
+	args = parser.parse_args()
+
+	# Don't let debug logging influence the result
+	LOGGER.disabled = True
+	rng = Random(args.seed)
+
+	server = ThreadingHTTPServer(('127.0.0.1', 0), NoOpHandler)
+	Thread(target=server.serve_forever, daemon=True).start()
+	url = f'json://127.0.0.1:{server.server_address[1]}/'
+
+	results: Dict[str, Any] = {}
+	with TemporaryDirectory() as folder:
+		DBConnection.file = join(folder, 'MIND.db')
+		SERVER.create_app()
+		context = SERVER.app.app_context
+		reminder_handler = ReminderHandler(context)
+		delivery_handler = DeliveryHandler(context)
+
+		with context():
+			setup_db()
+			set_setting('notification_workers', args.workers)
+			start = perf_counter()
+			repeats = generate_data(args.users, args.reminders, url, rng)
+			results['generate_ms'] = round((perf_counter() - start) * 1000, 3)
+			close_db()
+
+		# Load the schedule
+		results['start_handling'] = measure(
+			reminder_handler.start_handling,
+			args.reminders
+		)
+		reminder_handler.stop_handling()
+
+		# Change the schedule, like adding, editing and deleting reminders
+		now = int(datetime.utcnow().timestamp())
+		ids = rng.sample(range(1, args.reminders + 1), min(10_000, args.reminders))
+		def change_schedule() -> None:
+			for i in ids:
+				reminder_handler.schedule(i, now + rng.randint(3600, YEAR))
+			for i in ids:
+				reminder_handler.unschedule(i)
+		results['schedule_unschedule'] = measure(change_schedule, len(ids) * 2)
+
+		# Trigger due reminders
+		due = min(args.due, args.reminders)
+		with context():
+			cursor = get_db()
+			cursor.executemany(
+				"UPDATE reminders SET time = ? WHERE id = ?;",
+				((now - 1, i) for i in rng.sample(range(1, args.reminders + 1), due))
+			)
+			close_db()
+		trigger = getattr(reminder_handler, '_ReminderHandler__trigger_reminders')
+		results['trigger'] = measure(lambda: trigger(now), due)
+
+		# Deliver the notifications that the trigger queued
+		def deliver() -> None:
+			delivery_handler.start_handling()
+			while True:
+				with context():
+					if not get_db().execute(
+						"SELECT 1 FROM outbox LIMIT 1;"
+					).fetchone():
+						break
+				sleep(0.01)
+			delivery_handler.stop_handling()
+		results['deliver'] = measure(deliver, due)
+
+		# Calculate next times of repeating reminders
+		sample = repeats[:10_000]
+		results['find_next_time'] = measure(
+			lambda: [_find_next_time(*r) for r in sample],
+			max(1, len(sample))
+		)
+
+	server.shutdown()
+
+	output = {
+		'environment': {
+			'python': python_version(),
+			'sqlite': sqlite_version,
+			'platform': platform(),
+			'date': datetime.utcnow().isoformat(timespec='seconds')
+		},
+		'parameters': vars(args),
+		'results': results
+	}
+	if args.output:
+		with open(args.output, 'w') as f:
+			dump(output, f, indent=4)
+	else:
+		dump(output, stdout, indent=4)
+		print()
+	return
+
+if __name__ == '__main__':
+	main()